@@ -1,4 +1,6 @@
 from django.contrib import admin
-from .models import Cita  # o el modelo que hayas creado
+from .models import Cita, Recurso, ReservaTemporal  # o el modelo que hayas creado
 
 admin.site.register(Cita)
+admin.site.register(Recurso)
+admin.site.register(ReservaTemporal)
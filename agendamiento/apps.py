@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AgendamientoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'agendamiento'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (conecta la invalidación del índice de disponibilidad)
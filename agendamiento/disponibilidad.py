@@ -0,0 +1,375 @@
+"""
+Índice en memoria de disponibilidad de la agenda.
+
+Guarda, por cada día local, un bitmap de slots ocupados (09:00–18:00, cada 30')
+**por recurso**, cargado de forma perezosa desde la BD e **invalidado** por las señales
+de `Cita` y `Recurso` (ver `agendamiento/signals.py`). Las reservas temporales vigentes
+cuentan como ocupadas; un día cargado con reservas caduca cuando vence la primera. Así `verificar_disponibilidad`,
+`disponibilidad_rango` y `sugerir_proximo_horario` responden desde memoria en vez de
+consultar en cada request; los días faltantes de un rango se cargan con una sola query.
+"""
+import threading
+import time as _time
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DateTimeField, Exists, OuterRef, Value
+from django.utils import timezone
+
+HORA_INICIO = time(9, 0)
+HORA_FIN = time(18, 0)
+INTERVALO = timedelta(minutes=30)
+
+_INICIO_MIN = HORA_INICIO.hour * 60 + HORA_INICIO.minute
+_FIN_MIN = HORA_FIN.hour * 60 + HORA_FIN.minute
+_INTERVALO_MIN = int(INTERVALO.total_seconds() // 60)
+
+SLOTS_POR_DIA = (_FIN_MIN - _INICIO_MIN) // _INTERVALO_MIN
+MASCARA_DIA = (1 << SLOTS_POR_DIA) - 1
+
+# Horas de la grilla precalculadas (índice -> time)
+HORAS_GRILLA = tuple(
+    time(*divmod(_INICIO_MIN + i * _INTERVALO_MIN, 60)) for i in range(SLOTS_POR_DIA)
+)
+
+
+def indice_de_hora(t):
+    """
+    Índice del slot para una hora local (HH:MM), o None si cae fuera de la grilla.
+    Los segundos se ignoran, igual que en la comparación original por HH:MM.
+    """
+    mins = t.hour * 60 + t.minute - _INICIO_MIN
+    if mins < 0 or mins % _INTERVALO_MIN:
+        return None
+    idx = mins // _INTERVALO_MIN
+    return idx if idx < SLOTS_POR_DIA else None
+
+
+def limites_dia(fecha, tz=None):
+    """Devuelve (inicio, fin) aware del horario de atención de `fecha` en TZ local."""
+    tz = tz or timezone.get_current_timezone()
+    inicio = timezone.make_aware(datetime.combine(fecha, HORA_INICIO), tz)
+    fin = timezone.make_aware(datetime.combine(fecha, HORA_FIN), tz)
+    return inicio, fin
+
+
+def consultar_slots_tomados(ahora=None, **filtro):
+    """
+    Filas (recurso_id, usuario_id, fecha_hora, expira_en) de citas y reservas vigentes
+    que cumplen `filtro` (sobre `fecha_hora`), en **una sola query** (UNION ALL).
+    `expira_en` es None para las citas.
+    """
+    from .models import Cita, ReservaTemporal
+
+    ahora = ahora or timezone.now()
+    citas = (
+        Cita.objects.filter(**filtro).order_by()
+        .annotate(expira=Value(None, output_field=DateTimeField()))
+        .values_list('recurso_id', 'usuario_id', 'fecha_hora', 'expira')
+    )
+    reservas = (
+        ReservaTemporal.objects.filter(expira_en__gt=ahora, **filtro).order_by()
+        .values_list('recurso_id', 'usuario_id', 'fecha_hora', 'expira_en')
+    )
+    return citas.union(reservas, all=True)
+
+
+def _slots_tomados_rango(fecha_desde, fecha_hasta):
+    tz = timezone.get_current_timezone()
+    inicio, _ = limites_dia(fecha_desde, tz)
+    _, fin = limites_dia(fecha_hasta, tz)
+    return consultar_slots_tomados(fecha_hora__gte=inicio, fecha_hora__lt=fin)
+
+
+def consultar_bitmaps_rango(fecha_desde, fecha_hasta):
+    """
+    Bitmaps de ocupación {fecha: {recurso_id: bitmap}} de todos los días entre
+    `fecha_desde` y `fecha_hasta` (inclusive), para todos los recursos, con
+    **una sola query** y una pasada sobre los resultados. Días sin citas => {}.
+    Devuelve también {fecha: primer vencimiento} de los días con reservas vigentes.
+    """
+    return _bitmaps_de_filas(_slots_tomados_rango(fecha_desde, fecha_hasta))
+
+
+async def aconsultar_bitmaps_rango(fecha_desde, fecha_hasta):
+    """Versión async (ORM async) de `consultar_bitmaps_rango`."""
+    return _bitmaps_de_filas([fila async for fila in _slots_tomados_rango(fecha_desde, fecha_hasta)])
+
+
+def _bitmaps_de_filas(filas):
+    tz = timezone.get_current_timezone()
+    bitmaps, vencimientos = {}, {}
+    for recurso_id, _, dt, expira in filas:
+        local = timezone.localtime(dt, tz)
+        idx = indice_de_hora(local.time())
+        if idx is not None:
+            dia = bitmaps.setdefault(local.date(), {})
+            dia[recurso_id] = dia.get(recurso_id, 0) | 1 << idx
+            if expira is not None:
+                previo = vencimientos.get(local.date())
+                vencimientos[local.date()] = expira if previo is None else min(previo, expira)
+    return bitmaps, vencimientos
+
+
+def _recursos_activos_qs():
+    from .models import Recurso
+
+    return Recurso.objects.filter(activo=True).order_by('id').values_list('id', flat=True)
+
+
+def consultar_recursos_activos():
+    return tuple(_recursos_activos_qs())
+
+
+async def aconsultar_recursos_activos():
+    return tuple([recurso_id async for recurso_id in _recursos_activos_qs()])
+
+
+def recurso_libre_en(fecha_hora, excluir_cita_id=None, usuario_id=None, recurso_id=None):
+    """
+    ID del primer recurso activo sin cita ni reserva ajena vigente en `fecha_hora`
+    (consulta autoritativa, una query), o None si todas las agendas están tomadas.
+    Las reservas de `usuario_id` no lo bloquean y su recurso reservado tiene prioridad.
+    Con `recurso_id` solo se verifica esa agenda (devuelve su ID o None).
+    """
+    from .models import Cita, Recurso, ReservaTemporal
+
+    tomadas = Cita.objects.filter(fecha_hora=fecha_hora)
+    if excluir_cita_id is not None:
+        tomadas = tomadas.exclude(id=excluir_cita_id)
+    reservadas = ReservaTemporal.objects.filter(fecha_hora=fecha_hora, expira_en__gt=timezone.now())
+
+    candidatos = Recurso.objects.filter(id=recurso_id) if recurso_id is not None else Recurso.objects.filter(activo=True)
+    candidatos = candidatos.exclude(id__in=tomadas.values('recurso_id'))
+    orden = ['id']
+    if usuario_id is not None:
+        propia = reservadas.filter(usuario_id=usuario_id, recurso_id=OuterRef('pk'))
+        candidatos = candidatos.annotate(reservado=Exists(propia))
+        reservadas = reservadas.exclude(usuario_id=usuario_id)
+        orden = ['-reservado', 'id']
+    return (
+        candidatos.exclude(id__in=reservadas.values('recurso_id'))
+        .order_by(*orden)
+        .values_list('id', flat=True)
+        .first()
+    )
+
+
+def indice_inicio_hoy(ahora=None):
+    """
+    Primer índice de slot aún reservable hoy (redondeo hacia arriba a 30'),
+    o None si ya terminó el horario de atención.
+    """
+    ahora = ahora or timezone.localtime()
+    mins = ahora.hour * 60 + ahora.minute
+    mins = -(-mins // _INTERVALO_MIN) * _INTERVALO_MIN
+    idx = max(0, (mins - _INICIO_MIN) // _INTERVALO_MIN)
+    return idx if idx < SLOTS_POR_DIA else None
+
+
+def _slots_libres(ocupaciones, recursos, desde, limite):
+    """Recorre [(fecha, {recurso_id: bitmap})] y arma [(fecha, time, recurso_id)] libres."""
+    libres = []
+    for n, (fecha, ocupacion) in enumerate(ocupaciones):
+        bitmaps = [ocupacion.get(r, 0) for r in recursos]
+        # Libre en algún recurso = no ocupado en todos
+        ocupado_en_todos = MASCARA_DIA
+        for bm in bitmaps:
+            ocupado_en_todos &= bm
+        mascara = ~ocupado_en_todos & MASCARA_DIA
+        if n == 0:
+            mascara = mascara >> desde << desde
+        while mascara:
+            bit = mascara & -mascara
+            recurso_libre = next(r for r, bm in zip(recursos, bitmaps) if not bm & bit)
+            libres.append((fecha, HORAS_GRILLA[bit.bit_length() - 1], recurso_libre))
+            if limite is not None and len(libres) >= limite:
+                return libres
+            mascara ^= bit
+    return libres
+
+
+class IndiceDisponibilidad:
+    """
+    Cache LRU de ocupación por día local: {recurso_id: bitmap}.
+
+    - bit i encendido => el slot `HORAS_GRILLA[i]` está tomado en ese recurso.
+    - Sin recurso explícito, un slot está libre si **algún** recurso activo lo tiene libre.
+    - `ttl` acota la desincronización entre procesos (cada worker tiene su propio índice);
+      dentro del proceso la invalidación por señales es inmediata.
+    - Un día con reservas temporales caduca además cuando vence la primera de ellas.
+    """
+
+    def __init__(self, max_dias=400, ttl=60):
+        self.max_dias = max_dias
+        self.ttl = ttl
+        self._dias = OrderedDict()      # fecha -> ({recurso_id: bitmap}, cargado_en, vence | None)
+        self._recursos = None           # (ids activos, cargado_en, None)
+        self._lock = threading.Lock()
+        self._generacion = 0            # evita cachear cargas que compitieron con una invalidación
+
+    def _vigente(self, entrada, ahora):
+        if entrada is None or (self.ttl is not None and ahora - entrada[1] >= self.ttl):
+            return False
+        return entrada[2] is None or ahora < entrada[2]
+
+    # --- Lectura ---
+    # Cada lectura tiene su par async (prefijo `a`) para las vistas ASGI: la parte en
+    # memoria es común y solo la carga desde la BD usa el ORM sync o async.
+    def _recursos_en_memoria(self):
+        with self._lock:
+            if self._vigente(self._recursos, _time.monotonic()):
+                return self._recursos[0], None
+            return None, (self._generacion, _time.monotonic())
+
+    def _guardar_recursos(self, ids, generacion, cargado_en):
+        with self._lock:
+            if generacion == self._generacion:
+                self._recursos = (ids, cargado_en, None)
+
+    def recursos_activos(self):
+        """Tupla de IDs de recursos activos (una query solo si no está en memoria)."""
+        ids, pendiente = self._recursos_en_memoria()
+        if pendiente:
+            ids = consultar_recursos_activos()
+            self._guardar_recursos(ids, *pendiente)
+        return ids
+
+    async def arecursos_activos(self):
+        ids, pendiente = self._recursos_en_memoria()
+        if pendiente:
+            ids = await aconsultar_recursos_activos()
+            self._guardar_recursos(ids, *pendiente)
+        return ids
+
+    def _dias_en_memoria(self, fechas):
+        """Devuelve ({fecha: ocupacion} vigentes, fechas faltantes, generacion, ahora)."""
+        ahora = _time.monotonic()
+        resultado, faltantes = {}, []
+        with self._lock:
+            for fecha in fechas:
+                entrada = self._dias.get(fecha)
+                if self._vigente(entrada, ahora):
+                    resultado[fecha] = entrada[0]
+                else:
+                    faltantes.append(fecha)
+            generacion = self._generacion
+        return resultado, faltantes, generacion, ahora
+
+    def _incorporar(self, resultado, faltantes, cargados, generacion, ahora):
+        bitmaps, vencimientos = cargados
+        nuevos = {fecha: bitmaps.get(fecha, {}) for fecha in faltantes}
+        # Vencimiento de reservas (reloj de pared) -> instante monotónico de caducidad
+        ahora_real = timezone.now()
+        vencen = {
+            fecha: ahora + (expira - ahora_real).total_seconds()
+            for fecha, expira in vencimientos.items()
+        }
+        self._guardar(nuevos, generacion, ahora, vencen)
+        resultado.update(nuevos)
+
+    def ocupacion_rango(self, fecha_desde, dias):
+        """
+        Lista [(fecha, {recurso_id: bitmap})] de `dias` días consecutivos desde `fecha_desde`.
+        Los días que no estén en memoria se cargan juntos con una sola query de rango,
+        para todos los recursos a la vez.
+        """
+        fechas = [fecha_desde + timedelta(days=i) for i in range(dias)]
+        resultado, faltantes, generacion, ahora = self._dias_en_memoria(fechas)
+        if faltantes:
+            cargados = consultar_bitmaps_rango(faltantes[0], faltantes[-1])
+            self._incorporar(resultado, faltantes, cargados, generacion, ahora)
+        return [(fecha, resultado[fecha]) for fecha in fechas]
+
+    async def aocupacion_rango(self, fecha_desde, dias):
+        fechas = [fecha_desde + timedelta(days=i) for i in range(dias)]
+        resultado, faltantes, generacion, ahora = self._dias_en_memoria(fechas)
+        if faltantes:
+            cargados = await aconsultar_bitmaps_rango(faltantes[0], faltantes[-1])
+            self._incorporar(resultado, faltantes, cargados, generacion, ahora)
+        return [(fecha, resultado[fecha]) for fecha in fechas]
+
+    def slots_libres(self, fecha_desde, dias, desde=0, limite=None, recurso=None):
+        """
+        Slots libres [(fecha, time, recurso_id)] en `dias` días desde `fecha_desde`,
+        en orden cronológico. Con `recurso` se mira solo esa agenda; sin él, cada slot
+        trae el primer recurso activo libre. `desde` aplica solo al primer día y
+        `limite` corta tras los primeros K slots.
+        """
+        recursos = (recurso,) if recurso is not None else self.recursos_activos()
+        if not recursos:
+            return []
+        return _slots_libres(self.ocupacion_rango(fecha_desde, dias), recursos, desde, limite)
+
+    async def aslots_libres(self, fecha_desde, dias, desde=0, limite=None, recurso=None):
+        recursos = (recurso,) if recurso is not None else await self.arecursos_activos()
+        if not recursos:
+            return []
+        return _slots_libres(await self.aocupacion_rango(fecha_desde, dias), recursos, desde, limite)
+
+    def horas_libres(self, fecha, desde=0, recurso=None):
+        """Lista de `time` libres del día (en `recurso` o en cualquiera) desde el índice `desde`."""
+        return [hora for _, hora, _ in self.slots_libres(fecha, 1, desde, recurso=recurso)]
+
+    async def ahoras_libres(self, fecha, desde=0, recurso=None):
+        return [hora for _, hora, _ in await self.aslots_libres(fecha, 1, desde, recurso=recurso)]
+
+    # --- Escritura / invalidación ---
+    def _guardar(self, ocupaciones, generacion, cargado_en, vencen=None):
+        vencen = vencen or {}
+        with self._lock:
+            if generacion != self._generacion:
+                return
+            for fecha, ocupacion in ocupaciones.items():
+                self._dias[fecha] = (ocupacion, cargado_en, vencen.get(fecha))
+                self._dias.move_to_end(fecha)
+            while len(self._dias) > self.max_dias:
+                self._dias.popitem(last=False)
+
+    def invalidar(self, fecha):
+        with self._lock:
+            self._generacion += 1
+            self._dias.pop(fecha, None)
+
+    def invalidar_fecha_hora(self, fecha_hora):
+        """Invalida el día local correspondiente a un datetime (aware o naive)."""
+        if fecha_hora is None:
+            return
+        if timezone.is_naive(fecha_hora):
+            fecha_hora = timezone.make_aware(fecha_hora, timezone.get_current_timezone())
+        self.invalidar(timezone.localdate(fecha_hora))
+
+    def invalidar_recursos(self):
+        with self._lock:
+            self._generacion += 1
+            self._recursos = None
+
+    def limpiar(self):
+        with self._lock:
+            self._generacion += 1
+            self._dias.clear()
+            self._recursos = None
+
+
+indice_disponibilidad = IndiceDisponibilidad(
+    max_dias=getattr(settings, 'AGENDA_INDICE_MAX_DIAS', 400),
+    ttl=getattr(settings, 'AGENDA_INDICE_TTL', 60),
+)
+
+
+def invalidar_al_confirmar(*fechas_hora):
+    """
+    Invalida los días de `fechas_hora` ahora y de nuevo al confirmar la transacción
+    (evita recachear datos sin commit). Para escrituras que no disparan señales,
+    como `bulk_create`.
+    """
+    for fh in fechas_hora:
+        indice_disponibilidad.invalidar_fecha_hora(fh)
+
+    def _al_confirmar():
+        for fh in fechas_hora:
+            indice_disponibilidad.invalidar_fecha_hora(fh)
+
+    transaction.on_commit(_al_confirmar)
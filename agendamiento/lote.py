@@ -0,0 +1,135 @@
+"""
+Creación masiva de citas (migraciones desde call center).
+
+Todo el lote se valida en memoria, los conflictos de slot por (recurso, fecha_hora)
+se resuelven con una sola query y las filas válidas se insertan con `bulk_create`
+dentro de una transacción. Como en el agendamiento individual, la reserva temporal
+del propio paciente no bloquea su fila y se consume en la misma transacción.
+Cada fila recibe su propio resultado: 'creada', 'conflicto' o 'invalida'.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from usuarios.models import Usuario
+from .models import Cita, ReservaTemporal
+from .serializers import CitaLoteItemSerializer, MSG_CITA_PROPIA, MSG_SLOT_TOMADO as MSG_CONFLICTO
+from .disponibilidad import invalidar_al_confirmar, consultar_recursos_activos, consultar_slots_tomados
+
+LOTE_MAX = 5000
+BATCH_SIZE = 500
+
+
+def _validar_filas(filas, recursos):
+    """Devuelve (resultados, validas) con validas = [(indice, datos_validados)]."""
+    resultados = [None] * len(filas)
+    candidatas = []
+    for i, fila in enumerate(filas):
+        ser = CitaLoteItemSerializer(data=fila)
+        if ser.is_valid():
+            candidatas.append((i, ser.validated_data))
+        else:
+            resultados[i] = {"indice": i, "estado": "invalida", "errores": ser.errors}
+
+    # Usuarios inexistentes: una sola query para todo el lote
+    ids = {datos['usuario'] for _, datos in candidatas}
+    existentes = set(Usuario.objects.filter(id__in=ids).values_list('id', flat=True))
+    validas = []
+    for i, datos in candidatas:
+        if datos['usuario'] not in existentes:
+            resultados[i] = {"indice": i, "estado": "invalida", "errores": {"usuario": ["Usuario no encontrado."]}}
+        elif 'recurso' in datos and datos['recurso'] not in recursos:
+            resultados[i] = {"indice": i, "estado": "invalida", "errores": {"recurso": ["Recurso no encontrado o inactivo."]}}
+        else:
+            validas.append((i, datos))
+    return resultados, validas
+
+
+def _separar_conflictos(validas, resultados, recursos):
+    """
+    Marca conflictos contra la BD (una query) y dentro del lote (gana la primera):
+    slot ya tomado en el recurso (cita o reserva vigente de otro paciente) o paciente con
+    otra cita a esa hora. Las filas sin recurso toman el recurso que el paciente retuvo,
+    o si no el primer recurso activo libre en su horario.
+    Devuelve (libres, reservas a consumir {(usuario_id, fecha_hora)}).
+    """
+    fechas = {datos['fecha_hora'] for _, datos in validas}
+    tomadas, propias, retenidas = set(), set(), {}
+    for recurso_id, usuario_id, fh, expira in consultar_slots_tomados(fecha_hora__in=fechas):
+        if expira is None:
+            tomadas.add((recurso_id, fh))
+            propias.add((usuario_id, fh))
+        else:  # las reservas temporales solo bloquean el recurso, y no a su dueño
+            retenidas[(recurso_id, fh)] = usuario_id
+    con_reserva = {(usuario_id, fh) for (_, fh), usuario_id in retenidas.items()}
+
+    def libre(recurso, fh, usuario):
+        return (recurso, fh) not in tomadas and retenidas.get((recurso, fh), usuario) == usuario
+
+    libres, consumir = [], set()
+    for i, datos in validas:
+        fh, usuario = datos['fecha_hora'], datos['usuario']
+        if (usuario, fh) in propias:
+            resultados[i] = {"indice": i, "estado": "conflicto", "error": MSG_CITA_PROPIA}
+            continue
+        if 'recurso' in datos:
+            recurso = datos['recurso'] if libre(datos['recurso'], fh, usuario) else None
+        else:
+            candidatos = sorted(recursos, key=lambda r: retenidas.get((r, fh)) != usuario)
+            recurso = next((r for r in candidatos if libre(r, fh, usuario)), None)
+        if recurso is None:
+            resultados[i] = {"indice": i, "estado": "conflicto", "error": MSG_CONFLICTO}
+        else:
+            tomadas.add((recurso, fh))
+            propias.add((usuario, fh))
+            libres.append((i, datos, recurso))
+            if (usuario, fh) in con_reserva:
+                consumir.add((usuario, fh))
+    return libres, consumir
+
+
+def crear_citas_en_lote(filas, reintentos=1):
+    """
+    Crea las citas de `filas` (lista de dicts con usuario, recurso?, fecha_hora, motivo, estado).
+    Devuelve la lista de resultados por fila, en el mismo orden de entrada.
+    """
+    recursos = consultar_recursos_activos()
+    resultados, validas = _validar_filas(filas, set(recursos))
+
+    for intento in range(reintentos + 1):
+        try:
+            with transaction.atomic():
+                libres, consumir = _separar_conflictos(validas, resultados, recursos)
+                citas = Cita.objects.bulk_create(
+                    [
+                        Cita(
+                            usuario_id=datos['usuario'],
+                            recurso_id=recurso,
+                            fecha_hora=datos['fecha_hora'],
+                            motivo=datos['motivo'],
+                            estado=datos['estado'],
+                        )
+                        for _, datos, recurso in libres
+                    ],
+                    batch_size=BATCH_SIZE,
+                )
+                # bulk_create no dispara señales: consumir las reservas propias e invalidar a mano
+                if consumir:
+                    ReservaTemporal.objects.filter(
+                        reduce(or_, (Q(usuario_id=u, fecha_hora=fh) for u, fh in consumir))
+                    ).delete()
+                invalidar_al_confirmar(*[c.fecha_hora for c in citas])
+            break
+        except IntegrityError:
+            # Otro request tomó un slot entre la verificación y el INSERT: se recalcula
+            if intento == reintentos:
+                for i, _ in validas:
+                    if resultados[i] is None:
+                        resultados[i] = {"indice": i, "estado": "conflicto", "error": MSG_CONFLICTO}
+                return resultados
+
+    for (i, _, recurso), cita in zip(libres, citas):
+        resultados[i] = {"indice": i, "estado": "creada", "id": cita.id, "recurso": recurso}
+    return resultados
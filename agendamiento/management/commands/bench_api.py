@@ -0,0 +1,281 @@
+import json
+import random
+import subprocess
+from datetime import datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from agendamiento.disponibilidad import HORAS_GRILLA, indice_disponibilidad
+from agendamiento.models import Cita, Recurso
+from chatbot.models import SesionTriaje
+from chatbot.triaje import mascara_de
+from sithcore.carga import bd_de_carga, flujo_asgi, flujo_wsgi, vistas_async
+from usuarios.models import Usuario
+
+PASSWORD = 'bench-1234'
+SINTOMAS = (
+    'dificultadRespirar', 'dolorPecho', 'confusion', 'trauma',
+    'fiebreAlta', 'dolorIntenso', 'vomitosDiarrea', 'enfermedadCronica',
+)
+OPCIONES_BASE = (
+    'concurrencia', 'iteraciones', 'iteraciones_registro', 'hilos_wsgi', 'pacientes', 'sesiones', 'dias', 'seed',
+)
+METRICAS_REGRESION = (('rps', -1), ('p95_ms', 1), ('p99_ms', 1))  # signo: 1 = peor si sube
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Suite de carga de la API: siembra una BD de prueba y ejecuta los escenarios "
+        "registro/login, triaje→agendamiento y listados de administración contra la URL conf "
+        "real (WSGI y ASGI). Reporta req/s, p50/p95/p99 y queries por endpoint; "
+        "--guardar escribe una línea base JSON y --comparar la contrasta con otra."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modos', nargs='+', choices=['wsgi', 'asgi'], default=['wsgi', 'asgi'])
+        parser.add_argument('--escenarios', nargs='+', choices=['registro', 'triaje', 'admin'],
+                            default=['registro', 'triaje', 'admin'])
+        parser.add_argument('--concurrencia', type=int, default=20, help="Clientes concurrentes.")
+        parser.add_argument('--iteraciones', type=int, default=200, help="Flujos completos por escenario y modo.")
+        parser.add_argument('--iteraciones-registro', type=int, default=40,
+                            help="Flujos de registro/login (cada uno hashea la contraseña dos veces).")
+        parser.add_argument('--hilos-wsgi', type=int, default=32, help="Hilos del servidor WSGI simulado.")
+        parser.add_argument('--pacientes', type=int, default=300)
+        parser.add_argument('--sesiones', type=int, default=5000, help="Sesiones de triaje sembradas.")
+        parser.add_argument('--dias', type=int, default=30, help="Días de agenda sembrados.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--guardar', metavar='RUTA', help="Guarda los resultados como línea base JSON.")
+        parser.add_argument('--comparar', metavar='RUTA', help="Compara contra una línea base JSON.")
+        parser.add_argument('--tolerancia', type=float, default=10.0,
+                            help="%% de empeoramiento (req/s, p95, p99) tolerado al comparar.")
+
+    def handle(self, *args, **opts):
+        base = None
+        if opts['comparar']:
+            try:
+                with open(opts['comparar'], encoding='utf-8') as f:
+                    base = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer la línea base {opts['comparar']}: {e}")
+
+        # BD en archivo (WAL + busy timeout): las escrituras concurrentes esperan en vez de dar 500
+        with bd_de_carga():
+            # Como en producción: sin registro de queries ni páginas de error de depuración
+            with override_settings(DEBUG=False):
+                resultados = self._ejecutar(opts)
+
+        # ⛔ Un 500 (p. ej. BD bloqueada) no es una medición del endpoint: no se guarda ni se compara.
+        # Los 503 con Retry-After del pool de hash son rechazo de carga previsto y se reportan como errores.
+        fallidos = [
+            f"{modo}/{endpoint} {r['estados_error']}"
+            for modo, escenarios in resultados.items()
+            for por_endpoint in escenarios.values()
+            for endpoint, r in por_endpoint.items()
+            if any(estado.startswith('5') and estado != '503' for estado in r['estados_error'])
+        ]
+        if fallidos:
+            raise CommandError(f"Errores 5xx durante la carga (no se guarda ni compara): {'; '.join(fallidos)}")
+
+        opciones = {k: opts[k] for k in OPCIONES_BASE}
+        if opts['guardar']:
+            with open(opts['guardar'], 'w', encoding='utf-8') as f:
+                json.dump({
+                    "commit": _commit_actual(),
+                    "fecha": timezone.now().isoformat(timespec='seconds'),
+                    "opciones": opciones,
+                    "resultados": resultados,
+                }, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"\nLínea base guardada en {opts['guardar']}")
+
+        if base is not None:
+            if base.get('opciones') != opciones:
+                self.stdout.write(self.style.WARNING(
+                    f"⚠️ La línea base usó otras opciones ({base.get('opciones')}): la comparación es orientativa."
+                ))
+            regresiones = self._comparar(base, resultados, opts['tolerancia'])
+            if regresiones:
+                raise CommandError(f"{regresiones} métricas empeoraron más de {opts['tolerancia']}%.")
+
+    # ------------------------------------------------------------------
+    # Siembra
+    # ------------------------------------------------------------------
+    def _sembrar(self, opts):
+        rnd = random.Random(opts['seed'])
+        hash_ = make_password(PASSWORD)  # un solo hash: sembrar no debe medir PBKDF2
+        Usuario.objects.bulk_create(
+            Usuario(rut=f'1{i:07d}K', rut_canonico=f'1{i:07d}K', username=f'1{i:07d}K', nombre=f'Paciente {i}',
+                    telefono='+56900000000', password=hash_)
+            for i in range(opts['pacientes'])
+        )
+        pacientes = list(Usuario.objects.order_by('id'))
+        Token.objects.bulk_create(Token(user=u, key=Token.generate_key()) for u in pacientes)
+        admin = Usuario.objects.create_superuser(rut='99999999K', password=None, nombre='Admin', telefono='+56911111111')
+        tokens = {t.user_id: t.key for t in Token.objects.all()}
+        tokens[admin.id] = Token.objects.create(user=admin).key
+
+        recursos = [Recurso.objects.create(nombre=f'Box {i}', tipo='box') for i in range(3)]
+        tz = timezone.get_current_timezone()
+        hoy = timezone.localdate()
+        citas = [
+            Cita(
+                usuario=rnd.choice(pacientes), recurso=recurso, motivo='bench',
+                fecha_hora=timezone.make_aware(datetime.combine(hoy + timedelta(days=d), hora), tz),
+            )
+            for d in range(1, opts['dias'] + 1)
+            for hora in HORAS_GRILLA
+            for recurso in recursos
+            if rnd.random() < 0.5
+        ]
+        Cita.objects.bulk_create(citas)
+
+        sesiones = []
+        for _ in range(opts['sesiones']):
+            respuestas = {clave: rnd.random() < 0.2 for clave in SINTOMAS}
+            sesiones.append(SesionTriaje(
+                usuario=rnd.choice(pacientes), respuestas=respuestas, mascara=mascara_de(respuestas),
+                urgente=any(respuestas[c] for c in SINTOMAS[:4]), score=rnd.randint(0, 15),
+            ))
+        SesionTriaje.objects.bulk_create(sesiones)
+        self.stdout.write(
+            f"Sembrados {len(pacientes)} pacientes, {len(citas)} citas en {len(recursos)} recursos "
+            f"y {len(sesiones)} sesiones de triaje."
+        )
+        return pacientes, admin, tokens
+
+    # ------------------------------------------------------------------
+    # Escenarios: cada uno devuelve los pasos de un flujo para una corrida
+    # ------------------------------------------------------------------
+    def _escenarios(self, opts, pacientes, admin, tokens):
+        hoy = timezone.localdate()
+        auth = lambda usuario: {'Authorization': f'Token {tokens[usuario.id]}'}  # noqa: E731
+        admin_headers = auth(admin)
+        paciente = lambda n: pacientes[n % len(pacientes)]  # noqa: E731
+        respuestas_leves = {clave: clave == 'fiebreAlta' for clave in SINTOMAS}
+
+        def registro(corrida):
+            rut = lambda n: f'2{corrida:02d}{n:05d}K'  # noqa: E731
+            return [
+                ("POST registrar", lambda n, previa: (
+                    'POST', '/api/usuarios/registrar/',
+                    {'rut': rut(n), 'nombre': f'Nuevo {n}', 'telefono': '+56922222222', 'password': PASSWORD},
+                    None,
+                )),
+                ("POST login", lambda n, previa: (
+                    'POST', '/api/usuarios/login/', {'rut': rut(n), 'password': PASSWORD}, None,
+                )),
+            ]
+
+        def triaje(corrida):
+            # Cada iteración agenda un slot propio, en días posteriores a los sembrados
+            inicio = corrida * opts['iteraciones']
+
+            def slot(n):
+                k = inicio + n
+                fecha = hoy + timedelta(days=opts['dias'] + 1 + k // len(HORAS_GRILLA))
+                return fecha.isoformat(), HORAS_GRILLA[k % len(HORAS_GRILLA)].strftime('%H:%M')
+
+            return [
+                ("GET preguntas", lambda n, previa: (
+                    'GET', '/api/chatbot/preguntas/', None, auth(paciente(n)),
+                )),
+                ("POST evaluar", lambda n, previa: (
+                    'POST', '/api/chatbot/evaluar/', {'respuestas': respuestas_leves}, auth(paciente(n)),
+                )),
+                ("POST sesiones/crear", lambda n, previa: (
+                    'POST', '/api/chatbot/sesiones/crear/', {'respuestas': respuestas_leves}, auth(paciente(n)),
+                )),
+                ("POST disponibilidad", lambda n, previa: (
+                    'POST', '/api/agendamiento/citas/disponibilidad/', {'fecha': slot(n)[0]}, auth(paciente(n)),
+                )),
+                ("POST agendar", lambda n, previa: (
+                    'POST', '/api/agendamiento/citas/agendar/',
+                    {'usuario_id': paciente(n).id, 'fecha': slot(n)[0], 'hora': slot(n)[1]}, auth(paciente(n)),
+                )),
+            ]
+
+        def admin_listados(corrida):
+            return [
+                ("GET sesiones/listar", lambda n, previa: (
+                    'GET', '/api/chatbot/sesiones/listar/', None, admin_headers,
+                )),
+                ("GET sesiones/contar", lambda n, previa: (
+                    'GET', '/api/chatbot/sesiones/contar/', None, admin_headers,
+                )),
+                ("GET usuarios", lambda n, previa: (
+                    'GET', '/api/usuarios/', None, admin_headers,
+                )),
+                ("GET citas", lambda n, previa: (
+                    'GET', '/api/agendamiento/citas/?limite=50', None, admin_headers,
+                )),
+            ]
+
+        return {
+            'registro': ("registro y login", registro, opts['iteraciones_registro']),
+            'triaje': ("triaje y agendamiento", triaje, opts['iteraciones']),
+            'admin': ("listados de administración", admin_listados, opts['iteraciones']),
+        }
+
+    def _ejecutar(self, opts):
+        escenarios = self._escenarios(opts, *self._sembrar(opts))
+        modos = {
+            # Bajo ASGI se miden las vistas async nativas (opcionales, ver AGENDA_VISTAS_ASYNC)
+            'wsgi': (False, lambda pasos, n: flujo_wsgi(pasos, n, opts['concurrencia'], opts['hilos_wsgi'])),
+            'asgi': (True, lambda pasos, n: flujo_asgi(pasos, n, opts['concurrencia'])),
+        }
+
+        resultados, corrida = {}, 0
+        for modo in opts['modos']:
+            async_, cargar = modos[modo]
+            self.stdout.write(f"\n=== {modo.upper()}: {opts['concurrencia']} clientes concurrentes ===")
+            for clave in opts['escenarios']:
+                titulo, pasos, iteraciones = escenarios[clave]
+                indice_disponibilidad.limpiar()
+                with vistas_async(async_):
+                    por_endpoint = cargar(pasos(corrida), iteraciones)
+                corrida += 1
+                resultados.setdefault(modo, {})[clave] = por_endpoint
+                self.stdout.write(f"-- {titulo} ({iteraciones} flujos)")
+                for endpoint, r in por_endpoint.items():
+                    self.stdout.write(
+                        f"   {endpoint:<22} {r['rps']:>8,.0f} req/s   p50 {r['p50_ms']:>7.1f}   "
+                        f"p95 {r['p95_ms']:>7.1f}   p99 {r['p99_ms']:>7.1f} ms   "
+                        f"queries {r['queries_media']:>5.1f} (máx {r['queries_max']})   errores {r['errores']}"
+                        + (f" {r['estados_error']}" if r['errores'] else "")
+                    )
+        return resultados
+
+    def _comparar(self, base, resultados, tolerancia):
+        self.stdout.write(f"\n=== Comparación con la línea base (commit {base.get('commit') or '?'}) ===")
+        regresiones = 0
+        for modo, escenarios in resultados.items():
+            for clave, por_endpoint in escenarios.items():
+                for endpoint, actual in por_endpoint.items():
+                    previo = base.get('resultados', {}).get(modo, {}).get(clave, {}).get(endpoint)
+                    if previo is None:
+                        continue
+                    cambios = []
+                    for metrica, signo in METRICAS_REGRESION:
+                        if not previo[metrica]:
+                            continue
+                        delta = (actual[metrica] - previo[metrica]) / previo[metrica] * 100
+                        peor = delta * signo > tolerancia
+                        regresiones += peor
+                        cambios.append(f"{metrica} {delta:+6.1f}%{' ⚠️' if peor else ''}")
+                    if actual['queries_max'] > previo['queries_max']:
+                        regresiones += 1
+                        cambios.append(f"queries {previo['queries_max']}→{actual['queries_max']} ⚠️")
+                    self.stdout.write(f"{modo:<5} {endpoint:<22} " + "   ".join(cambios))
+        return regresiones
@@ -0,0 +1,90 @@
+import random
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from agendamiento.disponibilidad import HORA_INICIO, HORA_FIN, INTERVALO, indice_disponibilidad
+from agendamiento.models import Cita, Recurso
+from sithcore.carga import carga_asgi, carga_wsgi, vistas_async
+from usuarios.models import Usuario
+
+
+class Command(BaseCommand):
+    help = (
+        "Peticiones/s y latencia p50/p99 de disponibilidad y listados bajo WSGI (vistas DRF) "
+        "y ASGI (vistas DRF vs. async nativas), con N clientes concurrentes. Usa una BD de prueba."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrencia', type=int, nargs='+', default=[100, 1000], help="Clientes concurrentes.")
+        parser.add_argument('--peticiones', type=int, default=2000, help="Peticiones por escenario y nivel.")
+        parser.add_argument('--hilos-wsgi', type=int, default=32, help="Hilos del servidor WSGI simulado.")
+        parser.add_argument('--dias', type=int, default=30, help="Días de agenda sembrados.")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **opts):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # Como en producción: sin registro de queries ni páginas de error de depuración
+            with override_settings(DEBUG=False):
+                self._ejecutar(opts)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _sembrar(self, opts):
+        rnd = random.Random(opts['seed'])
+        tz = timezone.get_current_timezone()
+        hoy = timezone.localdate()
+        fechas = [hoy + timedelta(days=d) for d in range(1, opts['dias'] + 1)]
+        usuario = Usuario.objects.create_user(rut='111111111', password=None, nombre='Bench')
+        recursos = [Recurso.objects.create(nombre=f'Box {i}', tipo='box') for i in range(3)]
+        citas = []
+        for fecha in fechas:
+            actual = timezone.make_aware(datetime.combine(fecha, HORA_INICIO), tz)
+            fin = timezone.make_aware(datetime.combine(fecha, HORA_FIN), tz)
+            while actual < fin:
+                for recurso in recursos:
+                    if rnd.random() < 0.6:
+                        citas.append(Cita(usuario=usuario, recurso=recurso, fecha_hora=actual, motivo='bench'))
+                actual += INTERVALO
+        Cita.objects.bulk_create(citas)
+        token = Token.objects.create(user=usuario)
+        self.stdout.write(f"Sembradas {len(citas)} citas en {len(fechas)} días y {len(recursos)} recursos.")
+        return usuario, fechas, {'Authorization': f'Token {token.key}'}
+
+    def _ejecutar(self, opts):
+        usuario, fechas, headers = self._sembrar(opts)
+        rnd = random.Random(opts['seed'])
+        escenarios = {
+            "disponibilidad": lambda n: (
+                'POST', '/api/agendamiento/citas/disponibilidad/',
+                {'fecha': rnd.choice(fechas).isoformat()}, headers,
+            ),
+            "rango 14 días": lambda n: (
+                'GET', '/api/agendamiento/citas/disponibilidad/rango/?dias=14', None, headers,
+            ),
+            "listar citas": lambda n: (
+                'GET', f'/api/agendamiento/citas/usuario/{usuario.id}/?limite=50', None, headers,
+            ),
+        }
+        modos = [
+            ("WSGI  vistas DRF", False, lambda gen, c: carga_wsgi(gen, opts['peticiones'], c, opts['hilos_wsgi'])),
+            ("ASGI  vistas DRF", False, lambda gen, c: carga_asgi(gen, opts['peticiones'], c)),
+            ("ASGI  vistas async", True, lambda gen, c: carga_asgi(gen, opts['peticiones'], c)),
+        ]
+
+        for concurrencia in opts['concurrencia']:
+            self.stdout.write(f"\n=== {concurrencia} clientes concurrentes, {opts['peticiones']} peticiones ===")
+            for escenario, generar in escenarios.items():
+                for modo, async_, cargar in modos:
+                    indice_disponibilidad.limpiar()
+                    with vistas_async(async_):
+                        r = cargar(generar, concurrencia)
+                    self.stdout.write(
+                        f"{escenario:<15} {modo:<20} {r['rps']:>9,.0f} req/s   "
+                        f"p50 {r['p50_ms']:>8.1f} ms   p99 {r['p99_ms']:>8.1f} ms   errores {r['errores']}"
+                    )
@@ -0,0 +1,96 @@
+import random
+import time as _time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from agendamiento.disponibilidad import (
+    HORA_INICIO,
+    HORA_FIN,
+    INTERVALO,
+    IndiceDisponibilidad,
+    limites_dia,
+)
+from agendamiento.models import Cita, Recurso
+from usuarios.models import Usuario
+
+
+def horas_libres_por_consulta(fecha, recurso_id):
+    """Ruta original: query + localtime por cita + grilla reconstruida en cada llamada."""
+    tz = timezone.get_current_timezone()
+    inicio_local, fin_local = limites_dia(fecha, tz)
+    citas_qs = Cita.objects.filter(
+        recurso_id=recurso_id,
+        fecha_hora__gte=inicio_local,
+        fecha_hora__lt=fin_local
+    ).values_list('fecha_hora', flat=True)
+    ocupadas = {
+        timezone.localtime(dt, tz).time().replace(second=0, microsecond=0)
+        for dt in citas_qs
+    }
+    slots = []
+    actual = inicio_local
+    while actual < fin_local:
+        slots.append(actual.time())
+        actual += INTERVALO
+    return [s for s in slots if s not in ocupadas]
+
+
+class Command(BaseCommand):
+    help = "Benchmark de disponibilidad: consulta por request vs. índice de bitmaps en memoria (usa una BD de prueba)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=30, help="Días de agenda sembrados.")
+        parser.add_argument('--ocupacion', type=float, default=0.6, help="Fracción de slots ocupados (0–1).")
+        parser.add_argument('--consultas', type=int, default=5000, help="Consultas por escenario.")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **opts):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self._ejecutar(opts)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _ejecutar(self, opts):
+        rnd = random.Random(opts['seed'])
+        tz = timezone.get_current_timezone()
+        hoy = timezone.localdate()
+        fechas = [hoy + timedelta(days=d) for d in range(1, opts['dias'] + 1)]
+
+        usuario = Usuario.objects.create_user(rut='111111111', password=None, nombre='Bench')
+        recurso = Recurso.objects.create(nombre='Bench')
+        citas = []
+        for fecha in fechas:
+            actual = timezone.make_aware(datetime.combine(fecha, HORA_INICIO), tz)
+            fin = timezone.make_aware(datetime.combine(fecha, HORA_FIN), tz)
+            while actual < fin:
+                if rnd.random() < opts['ocupacion']:
+                    citas.append(Cita(usuario=usuario, recurso=recurso, fecha_hora=actual, motivo='bench'))
+                actual += INTERVALO
+        Cita.objects.bulk_create(citas)
+        self.stdout.write(f"Sembradas {len(citas)} citas en {len(fechas)} días.")
+
+        consultas = [rnd.choice(fechas) for _ in range(opts['consultas'])]
+        indice = IndiceDisponibilidad(ttl=None)
+
+        # Ambas rutas deben coincidir. Se compara la agenda sembrada: sin `recurso` el índice
+        # da un slot por libre si lo está en cualquier recurso activo (p. ej. 'Agenda general')
+        for fecha in fechas:
+            assert horas_libres_por_consulta(fecha, recurso.id) == indice.horas_libres(fecha, recurso=recurso.id), fecha
+
+        resultados = [
+            ("consulta por request", lambda f: horas_libres_por_consulta(f, recurso.id)),
+            ("índice en memoria", lambda f: indice.horas_libres(f, recurso=recurso.id)),
+        ]
+        base = None
+        for nombre, fn in resultados:
+            t0 = _time.perf_counter()
+            for fecha in consultas:
+                fn(fecha)
+            seg = _time.perf_counter() - t0
+            rps = len(consultas) / seg
+            base = base or rps
+            self.stdout.write(f"{nombre:<22} {rps:>12,.0f} consultas/s   (x{rps / base:,.1f})")
@@ -0,0 +1,148 @@
+import random
+import statistics
+import time as _time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from agendamiento.models import Cita, Recurso
+from chatbot.models import SesionTriaje
+from sithcore.fechas import filtro_rango_dias
+from usuarios.models import Usuario
+
+
+@contextmanager
+def _sin_auto_now_add(modelo, campo):
+    """Permite sembrar `creado_en` histórico con bulk_create."""
+    field = modelo._meta.get_field(campo)
+    previo = field.auto_now_add
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = previo
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN y tiempos de los filtros desde/hasta: __date (sin índices compuestos) "
+        "vs. rango semiabierto con índices. Siembra una BD de prueba."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=1_000_000, help="Filas por tabla (Cita y SesionTriaje).")
+        parser.add_argument('--usuarios', type=int, default=10_000)
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **opts):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self._ejecutar(opts)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    # --- Siembra ---
+    def _sembrar(self, opts):
+        rnd = random.Random(opts['seed'])
+        filas = opts['filas']
+        Usuario.objects.bulk_create(
+            [Usuario(rut=f'{i:09d}', rut_canonico=f'{i:09d}', username=f'{i:09d}', nombre='Bench') for i in range(opts['usuarios'])],
+            batch_size=5000,
+        )
+        ids = list(Usuario.objects.values_list('id', flat=True))
+        recurso = Recurso.objects.create(nombre='Bench')
+        inicio = timezone.now().replace(second=0, microsecond=0) - timedelta(days=365)
+        estados = ['Pendiente', 'Completada', 'Cancelada']
+
+        # Un año de datos; un segundo distinto por cita (respeta uniq_slot_recurso)
+        paso = max(365 * 86400 // max(filas, 1), 1)
+        t0 = _time.perf_counter()
+        lote = []
+        for i in range(filas):
+            lote.append(Cita(
+                usuario_id=rnd.choice(ids),
+                recurso=recurso,
+                fecha_hora=inicio + timedelta(seconds=i * paso),
+                motivo='bench',
+                estado=rnd.choice(estados),
+            ))
+            if len(lote) == 20_000:
+                Cita.objects.bulk_create(lote)
+                lote = []
+        Cita.objects.bulk_create(lote)
+
+        lote = []
+        with _sin_auto_now_add(SesionTriaje, 'creado_en'):
+            for i in range(filas):
+                urgente = rnd.random() < 0.2
+                lote.append(SesionTriaje(
+                    usuario_id=rnd.choice(ids),
+                    respuestas={},
+                    urgente=urgente,
+                    score=rnd.randint(5, 30) if urgente else rnd.randint(0, 4),
+                    creado_en=inicio + timedelta(seconds=i * paso),
+                ))
+                if len(lote) == 20_000:
+                    SesionTriaje.objects.bulk_create(lote)
+                    lote = []
+            SesionTriaje.objects.bulk_create(lote)
+        self.stdout.write(f"Sembradas {filas:,} citas y {filas:,} sesiones en {_time.perf_counter() - t0:.1f}s\n")
+        return inicio, rnd.choice(ids)
+
+    # --- Medición ---
+    def _medir(self, qs, repeticiones):
+        tiempos = []
+        for _ in range(repeticiones):
+            t0 = _time.perf_counter()
+            n = len(list(qs.values_list('id', flat=True)))
+            tiempos.append((_time.perf_counter() - t0) * 1000)
+        return n, statistics.median(tiempos)
+
+    def _indices(self, accion):
+        modelos = [Cita, SesionTriaje]
+        with connection.schema_editor() as editor:
+            for modelo in modelos:
+                for index in modelo._meta.indexes:
+                    getattr(editor, accion)(modelo, index)
+        # Estadísticas del planificador al día con los índices presentes
+        with connection.cursor() as cur:
+            cur.execute('ANALYZE')
+
+    def _ejecutar(self, opts):
+        inicio, usuario_id = self._sembrar(opts)
+        desde = timezone.localdate(inicio) + timedelta(days=120)
+        hasta = desde + timedelta(days=30)
+
+        consultas = {
+            "citas por usuario": (
+                Cita.objects.filter(usuario_id=usuario_id),
+                'fecha_hora', ['fecha_hora'],
+            ),
+            "citas por estado": (
+                Cita.objects.filter(estado='Pendiente'),
+                'fecha_hora', ['fecha_hora'],
+            ),
+            "sesiones urgentes": (
+                SesionTriaje.objects.filter(urgente=True),
+                'creado_en', ['-creado_en'],
+            ),
+        }
+
+        fases = [
+            ("ANTES  (__date, sin índices compuestos)", 'remove_index', lambda campo: {
+                f'{campo}__date__gte': desde, f'{campo}__date__lte': hasta,
+            }),
+            ("DESPUÉS (rango semiabierto + índices)", 'add_index', lambda campo: filtro_rango_dias(campo, desde, hasta)),
+        ]
+        for titulo, accion, filtro in fases:
+            self._indices(accion)
+            self.stdout.write(f"\n=== {titulo} ===")
+            for nombre, (qs, campo, orden) in consultas.items():
+                consulta = qs.filter(**filtro(campo)).order_by(*orden)
+                n, ms = self._medir(consulta, opts['repeticiones'])
+                self.stdout.write(f"\n-- {nombre}: {n:,} filas, mediana {ms:.1f} ms")
+                self.stdout.write(consulta.explain())
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 12:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamiento', '0003_alter_cita_unique_together_cita_uniq_slot_global'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['usuario', 'fecha_hora'], name='cita_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['estado', 'fecha_hora'], name='cita_estado_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-18 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def asignar_agenda_general(apps, schema_editor):
+    """Las citas existentes pasan a la agenda única que existía antes de los recursos."""
+    Recurso = apps.get_model('agendamiento', 'Recurso')
+    Cita = apps.get_model('agendamiento', 'Cita')
+    general = Recurso.objects.create(nombre='Agenda general', tipo='profesional')
+    Cita.objects.filter(recurso__isnull=True).update(recurso=general)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamiento', '0004_indices_rango_fechas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recurso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('tipo', models.CharField(choices=[('profesional', 'Profesional'), ('box', 'Box')], default='profesional', max_length=20)),
+                ('activo', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='cita',
+            name='recurso',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='citas', to='agendamiento.recurso'),
+        ),
+        migrations.RunPython(asignar_agenda_general, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='cita',
+            name='recurso',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='citas', to='agendamiento.recurso'),
+        ),
+        migrations.RemoveConstraint(
+            model_name='cita',
+            name='uniq_slot_global',
+        ),
+        migrations.AddConstraint(
+            model_name='cita',
+            constraint=models.UniqueConstraint(fields=('recurso', 'fecha_hora'), name='uniq_slot_recurso'),
+        ),
+    ]
@@ -3,14 +3,35 @@ from usuarios.models import Usuario
 from django.core.exceptions import ValidationError          # ⬅️ NUEVO
 from django.utils import timezone                           # ⬅️ NUEVO
 
+ESTADOS_CITA = ['Pendiente', 'Completada', 'Cancelada']
+
+
+class Recurso(models.Model):
+    """
+    Agenda independiente (profesional o box): cada recurso admite una cita por slot.
+    """
+    TIPOS = [('profesional', 'Profesional'), ('box', 'Box')]
+
+    nombre = models.CharField(max_length=100)
+    tipo = models.CharField(max_length=20, choices=TIPOS, default='profesional')
+    activo = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f'{self.nombre} ({self.tipo})'
+
+
 class Cita(models.Model):
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='citas')
+    recurso = models.ForeignKey(Recurso, on_delete=models.PROTECT, related_name='citas')
     fecha_hora = models.DateTimeField()
     motivo = models.TextField()
     estado = models.CharField(max_length=20, default='Pendiente')
 
     def __str__(self):
-        return f'Cita del usuario {self.usuario.id} el {self.fecha_hora}'
+        return f'Cita del usuario {self.usuario_id} el {self.fecha_hora}'
 
     # ⛔ Validación de modelo: no permitir fecha/hora pasada
     def clean(self):
@@ -29,8 +50,43 @@ class Cita(models.Model):
             self.fecha_hora = timezone.make_aware(self.fecha_hora, timezone.get_current_timezone())
         return super().save(*args, **kwargs)
 
+    # Recuerda la fecha/hora persistida para invalidar también el día anterior al reprogramar
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._fecha_hora_db = instance.__dict__.get('fecha_hora')
+        return instance
+
     class Meta:
         ordering = ['fecha_hora']
         constraints = [
-            models.UniqueConstraint(fields=['fecha_hora'], name='uniq_slot_global')
+            models.UniqueConstraint(fields=['recurso', 'fecha_hora'], name='uniq_slot_recurso')
+        ]
+        indexes = [
+            models.Index(fields=['usuario', 'fecha_hora'], name='cita_usuario_fecha_idx'),
+            models.Index(fields=['estado', 'fecha_hora'], name='cita_estado_fecha_idx'),
+        ]
+
+
+class ReservaTemporal(models.Model):
+    """
+    Retención de un slot mientras el paciente completa el formulario de agendamiento.
+    Mientras está vigente (`expira_en` futuro) el slot cuenta como tomado para los demás;
+    las vencidas se ignoran en las lecturas y se barren al crear nuevas reservas.
+    """
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='reservas')
+    recurso = models.ForeignKey(Recurso, on_delete=models.CASCADE, related_name='reservas')
+    fecha_hora = models.DateTimeField()
+    expira_en = models.DateTimeField()
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'Reserva del usuario {self.usuario_id} el {self.fecha_hora} (vence {self.expira_en})'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recurso', 'fecha_hora'], name='uniq_reserva_slot')
+        ]
+        indexes = [
+            models.Index(fields=['expira_en'], name='reserva_expira_idx'),
         ]
\ No newline at end of file
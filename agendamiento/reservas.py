@@ -0,0 +1,74 @@
+"""
+Reservas temporales de slots (retenciones con TTL).
+
+El paciente retiene un horario mientras completa el formulario: mientras la reserva
+esté vigente el slot aparece tomado para los demás (índice de disponibilidad y
+`recurso_libre_en`), así los usuarios concurrentes se desvían antes de enviar en vez
+de terminar en un IntegrityError. Al agendar, la cita consume la reserva del paciente.
+
+Las reservas vencidas se ignoran en todas las lecturas; el barrido es un DELETE por
+`expira_en` (indexado) que se ejecuta al crear cada reserva.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import ReservaTemporal
+from .disponibilidad import invalidar_al_confirmar, recurso_libre_en
+
+RESERVA_TTL = timedelta(seconds=getattr(settings, 'AGENDA_RESERVA_TTL', 300))
+
+
+def barrer_vencidas(ahora=None):
+    """Elimina las reservas vencidas (una query). Devuelve cuántas se borraron."""
+    ahora = ahora or timezone.now()
+    borradas, _ = ReservaTemporal.objects.filter(expira_en__lte=ahora).delete()
+    return borradas
+
+
+def reservar_slot(usuario_id, fecha_hora, recurso_id=None, ttl=None, reintentos=1):
+    """
+    Retiene `fecha_hora` para `usuario_id` durante `ttl` (por defecto RESERVA_TTL).
+    Un paciente tiene a lo más una reserva: la anterior se libera.
+    Sin `recurso_id` se toma el primer recurso activo libre.
+    Devuelve la ReservaTemporal creada, o None si el horario ya está tomado.
+    """
+    ttl = ttl or RESERVA_TTL
+    for intento in range(reintentos + 1):
+        ahora = timezone.now()
+        try:
+            with transaction.atomic():
+                barrer_vencidas(ahora)
+                elegido = recurso_libre_en(fecha_hora, usuario_id=usuario_id, recurso_id=recurso_id)
+                if elegido is None:
+                    return None
+
+                propias = ReservaTemporal.objects.filter(usuario_id=usuario_id)
+                previas = list(propias.values_list('fecha_hora', flat=True))
+                if previas:
+                    propias.delete()
+                reserva = ReservaTemporal.objects.create(
+                    usuario_id=usuario_id,
+                    recurso_id=elegido,
+                    fecha_hora=fecha_hora,
+                    expira_en=ahora + ttl,
+                )
+                invalidar_al_confirmar(fecha_hora, *previas)
+            return reserva
+        except IntegrityError:
+            # Otro paciente retuvo el mismo recurso entre la verificación y el INSERT
+            if intento == reintentos:
+                return None
+
+
+def liberar_reserva(reserva):
+    """Libera una reserva antes de su vencimiento."""
+    reserva.delete()
+    invalidar_al_confirmar(reserva.fecha_hora)
+
+
+def consumir_reserva(usuario_id, fecha_hora):
+    """Borra la reserva del paciente para `fecha_hora` (al confirmar su cita)."""
+    ReservaTemporal.objects.filter(usuario_id=usuario_id, fecha_hora=fecha_hora).delete()
@@ -1,20 +1,65 @@
 from rest_framework import serializers
-from .models import Cita
+from .models import Cita, Recurso, ESTADOS_CITA
+from .disponibilidad import indice_de_hora, recurso_libre_en
 from django.utils import timezone
 
+MSG_SLOT_TOMADO = "Ese horario ya está tomado."
+MSG_CITA_PROPIA = "El usuario ya tiene una cita en ese horario."
+MSG_FUERA_DE_GRILLA = "La hora no corresponde a un bloque de la agenda."
+
+
+def _validar_fecha_futura(value):
+    # Normaliza a aware si viene naive
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, timezone.get_current_timezone())
+    if value <= timezone.now():
+        raise serializers.ValidationError("La fecha/hora debe ser futura.")
+    return value
+
+
 class CitaSerializer(serializers.ModelSerializer):
+    # Opcional: si no viene, se asigna el primer recurso activo libre en ese horario
+    recurso = serializers.PrimaryKeyRelatedField(queryset=Recurso.objects.filter(activo=True), required=False)
+
     class Meta:
         model = Cita
-        fields = ['id', 'usuario', 'fecha_hora', 'motivo', 'estado']
+        fields = ['id', 'usuario', 'recurso', 'fecha_hora', 'motivo', 'estado']
+        # La unicidad (recurso, fecha_hora) se valida en validate(), que también asigna recurso
+        validators = []
 
     # --- BLOQUEO DE FECHA/HORA PASADA ---
     def validate_fecha_hora(self, value):
-        # Normaliza a aware si viene naive
-        if timezone.is_naive(value):
-            value = timezone.make_aware(value, timezone.get_current_timezone())
-        if value <= timezone.now():
-            raise serializers.ValidationError("La fecha/hora debe ser futura.")
-        return value
+        return _validar_fecha_futura(value)
+
+    def validate(self, attrs):
+        fecha_hora = attrs.get('fecha_hora', getattr(self.instance, 'fecha_hora', None))
+        recurso = attrs.get('recurso')
+        usuario = attrs.get('usuario', getattr(self.instance, 'usuario', None))
+        if 'fecha_hora' in attrs and usuario is not None:
+            # Con varias agendas el slot global ya no impide que un paciente se duplique
+            propias = Cita.objects.filter(usuario=usuario, fecha_hora=fecha_hora)
+            if self.instance is not None:
+                propias = propias.exclude(id=self.instance.id)
+            if propias.exists():
+                raise serializers.ValidationError({"fecha_hora": [MSG_CITA_PROPIA]})
+        # Un slot con cita o con reserva temporal de otro paciente está tomado (una query)
+        usuario_id = getattr(usuario, 'id', None)
+        if recurso is None and self.instance is None:
+            recurso_id = recurso_libre_en(fecha_hora, usuario_id=usuario_id)
+            if recurso_id is None:
+                raise serializers.ValidationError({"fecha_hora": [MSG_SLOT_TOMADO]})
+            attrs['recurso_id'] = recurso_id
+        elif 'recurso' in attrs or 'fecha_hora' in attrs:
+            recurso_id = recurso.id if recurso is not None else self.instance.recurso_id
+            libre = recurso_libre_en(
+                fecha_hora,
+                excluir_cita_id=getattr(self.instance, 'id', None),
+                usuario_id=usuario_id,
+                recurso_id=recurso_id,
+            )
+            if libre is None:
+                raise serializers.ValidationError({"fecha_hora": [MSG_SLOT_TOMADO]})
+        return attrs
 
     # Normaliza antes de crear/actualizar
     def create(self, validated_data):
@@ -31,8 +76,30 @@ class CitaSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
+        # Requiere select_related('usuario') en los listados para no caer en N+1
         data['usuario'] = {
-            "id": instance.usuario.id,
+            "id": instance.usuario_id,
             "nombre": f"{instance.usuario.nombre[0]}***" if instance.usuario.nombre else None
         }
-        return data
\ No newline at end of file
+        return data
+
+
+class CitaLoteItemSerializer(serializers.Serializer):
+    """
+    Fila de una carga masiva de citas. Valida solo en memoria:
+    `usuario` y `recurso` son IDs planos (se verifican para todo el lote con una query cada uno).
+    Sin `recurso`, la fila toma el primer recurso activo libre en su horario.
+    """
+    usuario = serializers.IntegerField(min_value=1)
+    recurso = serializers.IntegerField(min_value=1, required=False)
+    fecha_hora = serializers.DateTimeField()
+    motivo = serializers.CharField()
+    estado = serializers.ChoiceField(choices=ESTADOS_CITA, default='Pendiente')
+
+    def validate_fecha_hora(self, value):
+        value = _validar_fecha_futura(value)
+        # Fuera de la grilla (09:07, 03:00, con segundos) la cita no aparecería en el índice
+        local = timezone.localtime(value)
+        if indice_de_hora(local.time()) is None or local.second or local.microsecond:
+            raise serializers.ValidationError(MSG_FUERA_DE_GRILLA)
+        return value
@@ -0,0 +1,31 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Cita, Recurso
+from .disponibilidad import indice_disponibilidad, invalidar_al_confirmar
+from .reservas import consumir_reserva
+
+
+@receiver(post_save, sender=Cita)
+def cita_guardada(sender, instance, **kwargs):
+    # Si se reprogramó, también se libera el día anterior
+    previa = getattr(instance, '_fecha_hora_db', None)
+    invalidar_al_confirmar(instance.fecha_hora, previa)
+    if previa != instance.fecha_hora:
+        # La cita confirma el horario: la reserva temporal del paciente ya no hace falta
+        consumir_reserva(instance.usuario_id, instance.fecha_hora)
+    instance._fecha_hora_db = instance.fecha_hora
+
+
+@receiver(post_delete, sender=Cita)
+def cita_eliminada(sender, instance, **kwargs):
+    invalidar_al_confirmar(instance.fecha_hora, getattr(instance, '_fecha_hora_db', None))
+
+
+@receiver(post_save, sender=Recurso)
+@receiver(post_delete, sender=Recurso)
+def recurso_modificado(sender, instance, **kwargs):
+    # Altas, bajas o (des)activaciones cambian el conjunto de agendas disponibles
+    indice_disponibilidad.invalidar_recursos()
+    transaction.on_commit(indice_disponibilidad.invalidar_recursos)
@@ -1,3 +1,818 @@
-from django.test import TestCase
+import asyncio
+import base64
+import json
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.test import AsyncRequestFactory, TestCase
+from django.urls import resolve, reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from sithcore.carga import vistas_async
+from sithcore.fechas import filtro_rango_dias
+from sithcore.testing import PresupuestoQueriesMixin
+from . import lote
+from usuarios.autenticacion import cache_tokens, emitir_token_acceso
+from usuarios.models import Usuario
+from .models import Cita, Recurso, ReservaTemporal
+from . import views_async
+from .disponibilidad import HORA_INICIO, HORAS_GRILLA, INTERVALO, indice_disponibilidad, indice_inicio_hoy
+from .serializers import MSG_CITA_PROPIA, MSG_FUERA_DE_GRILLA, MSG_SLOT_TOMADO
+from .views import DIAS_MAX_RANGO
+
+# Máximo de queries por endpoint (sin contar autenticación)
+PRESUPUESTOS = {
+    'listar_todas_citas': 1,
+    'listar_citas': 1,
+    'obtener_cita': 1,
+    'verificar_disponibilidad': 2,   # recursos activos + citas del rango
+    'disponibilidad_rango': 2,
+    'sugerir_proximo_horario': 2,
+    'crear_citas_lote': 6,           # recursos + usuarios + slots tomados + INSERT + savepoint
+}
+
+
+class PresupuestoQueriesCitasTests(PresupuestoQueriesMixin, TestCase):
+
+    def setUp(self):
+        indice_disponibilidad.limpiar()
+        self.usuario = Usuario.objects.create_user(rut='111111111', password='x', nombre='Ana')
+        self.recurso = Recurso.objects.create(nombre='Dra. Soto')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.base = timezone.make_aware(
+            datetime.combine(timezone.localdate() + timedelta(days=2), HORA_INICIO)
+        )
+        self.creadas = 0
+
+    def sembrar(self, n):
+        """Agrega `n` citas de usuarios distintos en slots consecutivos."""
+        nuevas = []
+        for _ in range(n):
+            u = Usuario.objects.create_user(rut=f'2{self.creadas:08d}', password=None, nombre='Paciente')
+            nuevas.append(Cita(usuario=u, recurso=self.recurso, fecha_hora=self.base + self.creadas * INTERVALO, motivo='control'))
+            self.creadas += 1
+        Cita.objects.bulk_create(nuevas)
+
+    def test_listar_todas_citas(self):
+        url = reverse('listar_todas_citas')
+        for params in ({}, {'limite': 50}, {'stream': 'true'}):
+            with self.subTest(params=params):
+                self.assertQueriesConstantes(
+                    PRESUPUESTOS['listar_todas_citas'],
+                    lambda: self.client.get(url, params),
+                    self.sembrar,
+                    etiqueta=f'listar_todas_citas {params}'
+                )
+
+    def test_listar_citas_por_usuario(self):
+        def sembrar(n):
+            Cita.objects.bulk_create([
+                Cita(usuario=self.usuario, recurso=self.recurso, fecha_hora=self.base + (self.creadas + i) * INTERVALO, motivo='control')
+                for i in range(n)
+            ])
+            self.creadas += n
+
+        url = reverse('listar_citas', args=[self.usuario.id])
+        self.assertQueriesConstantes(PRESUPUESTOS['listar_citas'], lambda: self.client.get(url), sembrar)
+
+    def test_obtener_cita(self):
+        self.sembrar(1)
+        url = reverse('obtener_cita', args=[Cita.objects.get().id])
+        self.assertPresupuestoQueries(PRESUPUESTOS['obtener_cita'], lambda: self.client.get(url))
+
+    def test_disponibilidad(self):
+        self.sembrar(5)
+        fecha = self.base.date().isoformat()
+        self.assertPresupuestoQueries(
+            PRESUPUESTOS['verificar_disponibilidad'],
+            lambda: self.client.post(reverse('verificar_disponibilidad'), {'fecha': fecha}, format='json')
+        )
+        indice_disponibilidad.limpiar()
+        self.assertPresupuestoQueries(
+            PRESUPUESTOS['disponibilidad_rango'],
+            lambda: self.client.get(reverse('disponibilidad_rango'), {'dias': 60})
+        )
+        indice_disponibilidad.limpiar()
+        self.assertPresupuestoQueries(
+            PRESUPUESTOS['sugerir_proximo_horario'],
+            lambda: self.client.get(reverse('sugerir_proximo_horario'), {'limite_dias': 90})
+        )
+
+
+class InvalidacionIndiceTests(TestCase):
+    """Guardar, borrar o mover una cita (ORM o API) se refleja de inmediato en el índice."""
+
+    def setUp(self):
+        indice_disponibilidad.limpiar()
+        self.usuario = Usuario.objects.create_user(rut='111111111', password='x', nombre='Ana')
+        self.recurso = Recurso.objects.create(nombre='Dra. Soto')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.dia = timezone.localdate() + timedelta(days=2)
+        self.a_las_9 = timezone.make_aware(datetime.combine(self.dia, HORA_INICIO))
+
+    def libres(self, dia=None):
+        return indice_disponibilidad.horas_libres(dia or self.dia, recurso=self.recurso.id)
+
+    def crear(self, fecha_hora=None):
+        return Cita.objects.create(
+            usuario=self.usuario, recurso=self.recurso, fecha_hora=fecha_hora or self.a_las_9, motivo='control'
+        )
+
+    def assertRecargaAlConfirmar(self, callbacks):
+        """El día leído dentro de la transacción se vuelve a cargar tras el commit."""
+        self.libres()
+        with self.assertNumQueries(0):
+            self.libres()
+        for callback in callbacks:
+            callback()
+        with self.assertNumQueries(1):
+            self.libres()
+
+    def test_orm_crear_borrar_y_mover(self):
+        self.assertIn(HORA_INICIO, self.libres())  # día cargado en memoria
+        with self.captureOnCommitCallbacks() as callbacks:
+            cita = self.crear()
+            self.assertNotIn(HORA_INICIO, self.libres())
+        self.assertRecargaAlConfirmar(callbacks)
+
+        otro_dia = self.dia + timedelta(days=1)
+        self.assertIn(time(10, 0), self.libres(otro_dia))
+        with self.captureOnCommitCallbacks(execute=True):
+            cita.fecha_hora = timezone.make_aware(datetime.combine(otro_dia, time(10, 0)))
+            cita.save()
+        self.assertIn(HORA_INICIO, self.libres())
+        self.assertNotIn(time(10, 0), self.libres(otro_dia))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            cita.delete()
+            self.assertIn(time(10, 0), self.libres(otro_dia))
+        self.assertTrue(callbacks)
+
+    def test_api_agendar_reprogramar_y_eliminar(self):
+        self.assertIn(HORA_INICIO, self.libres())
+        datos = {'usuario_id': self.usuario.id, 'fecha': self.dia.isoformat(), 'hora': '09:00',
+                 'recurso_id': self.recurso.id}
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.post(reverse('agendar_cita_rapida'), datos, format='json')
+        self.assertEqual(r.status_code, 201)
+        self.assertNotIn(HORA_INICIO, self.libres())
+
+        cita_id = r.data['cita']['id']
+        nueva = timezone.make_aware(datetime.combine(self.dia, time(11, 30)))
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.patch(reverse('reprogramar_cita', args=[cita_id]),
+                                  {'fecha_hora': nueva.isoformat()}, format='json')
+        self.assertEqual(r.status_code, 200)
+        libres = self.libres()
+        self.assertIn(HORA_INICIO, libres)
+        self.assertNotIn(time(11, 30), libres)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.delete(reverse('eliminar_cita', args=[cita_id]))
+        self.assertEqual(r.status_code, 204)
+        self.assertIn(time(11, 30), self.libres())
+
+
+class DisponibilidadRangoTests(TestCase):
+
+    def setUp(self):
+        indice_disponibilidad.limpiar()
+        self.usuario = Usuario.objects.create_user(rut='111111111', password='x', nombre='Ana')
+        self.general = Recurso.objects.get(nombre='Agenda general')  # creada por la migración 0005
+        self.recurso = Recurso.objects.create(nombre='Dra. Soto')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.manana = timezone.localdate() + timedelta(days=1)
+
+    def ocupar(self, dia, horas, recurso=None):
+        Cita.objects.bulk_create(
+            Cita(usuario=self.usuario, recurso=recurso or self.recurso, motivo='control',
+                 fecha_hora=timezone.make_aware(datetime.combine(dia, hora)))
+            for hora in horas
+        )
+        indice_disponibilidad.limpiar()  # bulk_create no dispara señales
+
+    def rango(self, **params):
+        return self.client.get(reverse('disponibilidad_rango'), params)
+
+    def sugerir(self, **params):
+        return self.client.get(reverse('sugerir_proximo_horario'), params)
+
+    def test_dias_y_slots_libres(self):
+        pasado = self.manana + timedelta(days=1)
+        self.ocupar(self.manana, HORAS_GRILLA)
+        self.ocupar(pasado, [HORA_INICIO])
+        grilla = [h.strftime('%H:%M') for h in HORAS_GRILLA]
+
+        r = self.rango(desde=self.manana.isoformat(), dias=3, recurso=self.recurso.id)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([d['fecha'] for d in r.data['dias']],
+                         [(self.manana + timedelta(days=i)).isoformat() for i in range(3)])
+        self.assertEqual([d['horas_disponibles'] for d in r.data['dias']], [[], grilla[1:], grilla])
+
+        # Sin recurso basta con que otra agenda activa tenga el slot libre
+        r = self.rango(desde=self.manana.isoformat(), dias=1)
+        self.assertEqual(r.data['dias'][0]['horas_disponibles'], grilla)
+
+    def test_primeros_saltan_el_dia_completo(self):
+        self.ocupar(self.manana, HORAS_GRILLA)
+        r = self.rango(desde=self.manana.isoformat(), dias=5, primeros=2, recurso=self.recurso.id)
+        siguiente = (self.manana + timedelta(days=1)).isoformat()
+        self.assertEqual(r.data['slots'], [
+            {'fecha': siguiente, 'hora': '09:00', 'recurso': self.recurso.id},
+            {'fecha': siguiente, 'hora': '09:30', 'recurso': self.recurso.id},
+        ])
+        r = self.rango(desde=self.manana.isoformat(), dias=1, primeros=1)
+        self.assertEqual(r.data['slots'], [{'fecha': self.manana.isoformat(), 'hora': '09:00', 'recurso': self.general.id}])
+
+    def test_sugerir_salta_hoy_completo_y_respeta_limite_dias(self):
+        desde = indice_inicio_hoy()
+        if desde is not None:
+            self.ocupar(timezone.localdate(), HORAS_GRILLA[desde:])
+        self.ocupar(self.manana, HORAS_GRILLA[:3])
+
+        r = self.sugerir(recurso=self.recurso.id, limite_dias=0)
+        self.assertEqual(r.data, {'fecha': None, 'hora': None, 'recurso': None})
+        r = self.sugerir(recurso=self.recurso.id, limite_dias=1)
+        self.assertEqual(r.data, {'fecha': self.manana.isoformat(), 'hora': '10:30', 'recurso': self.recurso.id})
+        self.assertEqual(self.sugerir(recurso=self.recurso.id, limite_dias=10 ** 6).data['hora'], '10:30')
+
+    def test_parametros_invalidos(self):
+        ayer = (timezone.localdate() - timedelta(days=1)).isoformat()
+        for params in ({'dias': 0}, {'dias': DIAS_MAX_RANGO + 1}, {'dias': 'x'}, {'primeros': 0},
+                       {'desde': ayer}, {'desde': '18-10-2026'}, {'recurso': 999999}):
+            with self.subTest(params=params):
+                self.assertEqual(self.rango(**params).status_code, 400)
+        self.assertEqual(self.rango(dias=DIAS_MAX_RANGO).status_code, 200)
+        for params in ({'limite_dias': 'x'}, {'limite_dias': -1}, {'recurso': 'x'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.sugerir(**params).status_code, 400)
+
+
+class CargaLoteTests(PresupuestoQueriesMixin, TestCase):
+
+    def setUp(self):
+        indice_disponibilidad.limpiar()
+        self.ana = Usuario.objects.create_user(rut='111111111', password='x', nombre='Ana')
+        self.beto = Usuario.objects.create_user(rut='222222222', password='x', nombre='Beto')
+        self.general = Recurso.objects.get(nombre='Agenda general')  # creada por la migración 0005
+        self.recurso = Recurso.objects.create(nombre='Dra. Soto')
+        self.client = APIClient()
+        self.client.force_authenticate(self.ana)
+        self.dia = timezone.localdate() + timedelta(days=2)
+
+    def hora(self, hh, mm=0, dia=None):
+        return timezone.make_aware(datetime.combine(dia or self.dia, time(hh, mm)))
+
+    def fila(self, usuario, fecha_hora, recurso=None):
+        fila = {'usuario': usuario.id, 'fecha_hora': fecha_hora.isoformat(), 'motivo': 'control'}
+        if recurso is not None:
+            fila['recurso'] = recurso.id
+        return fila
+
+    def cargar(self, filas):
+        return self.client.post(reverse('crear_citas_lote'), {'citas': filas}, format='json')
+
+    def estados(self, r):
+        return [res['estado'] for res in r.data['resultados']]
+
+    def test_resultado_por_fila(self):
+        filas = [
+            self.fila(self.ana, self.hora(9), self.recurso),
+            self.fila(self.beto, self.hora(9, 7)),                     # fuera de la grilla
+            self.fila(self.beto, self.hora(3)),                        # antes de abrir
+            self.fila(self.beto, self.hora(9) - timedelta(days=3)),    # pasada
+            {'usuario': 999999, 'fecha_hora': self.hora(10).isoformat(), 'motivo': 'control'},
+            self.fila(self.beto, self.hora(10), self.recurso),
+        ]
+        r = self.cargar(filas)
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(self.estados(r), ['creada', 'invalida', 'invalida', 'invalida', 'invalida', 'creada'])
+        self.assertEqual((r.data['creadas'], r.data['conflictos'], r.data['invalidas']), (2, 0, 4))
+        self.assertEqual([res['indice'] for res in r.data['resultados']], list(range(6)))
+        self.assertEqual(r.data['resultados'][1]['errores']['fecha_hora'], [MSG_FUERA_DE_GRILLA])
+        self.assertEqual(r.data['resultados'][2]['errores']['fecha_hora'], [MSG_FUERA_DE_GRILLA])
+
+        creada = r.data['resultados'][0]
+        cita = Cita.objects.get(id=creada['id'])
+        self.assertEqual((cita.usuario_id, cita.recurso_id, cita.fecha_hora), (self.ana.id, self.recurso.id, self.hora(9)))
+        self.assertEqual(Cita.objects.count(), 2)
+
+    def test_duplicados_dentro_del_lote(self):
+        r = self.cargar([
+            self.fila(self.ana, self.hora(9), self.recurso),
+            self.fila(self.beto, self.hora(9), self.recurso),    # mismo slot: gana la primera
+            self.fila(self.ana, self.hora(9), self.general),     # misma paciente a la misma hora
+            self.fila(self.beto, self.hora(9)),                  # sin recurso: toma la agenda libre
+        ])
+        self.assertEqual(self.estados(r), ['creada', 'conflicto', 'conflicto', 'creada'])
+        self.assertEqual(r.data['resultados'][1]['error'], MSG_SLOT_TOMADO)
+        self.assertEqual(r.data['resultados'][2]['error'], MSG_CITA_PROPIA)
+        self.assertEqual(r.data['resultados'][3]['recurso'], self.general.id)
+
+    def test_conflictos_con_citas_y_reservas_existentes(self):
+        Cita.objects.create(usuario=self.ana, recurso=self.recurso, fecha_hora=self.hora(9), motivo='control')
+        ReservaTemporal.objects.create(usuario=self.ana, recurso=self.recurso, fecha_hora=self.hora(10),
+                                       expira_en=timezone.now() + timedelta(minutes=5))
+        ReservaTemporal.objects.create(usuario=self.ana, recurso=self.recurso, fecha_hora=self.hora(11),
+                                       expira_en=timezone.now() - timedelta(seconds=1))  # vencida
+        r = self.cargar([
+            self.fila(self.beto, self.hora(9), self.recurso),    # cita en la BD
+            self.fila(self.ana, self.hora(9)),                   # la paciente ya tiene cita a esa hora
+            self.fila(self.beto, self.hora(10), self.recurso),   # reserva vigente
+            self.fila(self.ana, self.hora(10), self.general),    # la reserva solo bloquea su recurso
+            self.fila(self.beto, self.hora(11), self.recurso),   # la reserva vencida no bloquea
+        ])
+        self.assertEqual(self.estados(r), ['conflicto', 'conflicto', 'conflicto', 'creada', 'creada'])
+        self.assertEqual([res.get('error') for res in r.data['resultados'][:3]],
+                         [MSG_SLOT_TOMADO, MSG_CITA_PROPIA, MSG_SLOT_TOMADO])
+
+    def test_reserva_propia_no_bloquea_y_se_consume(self):
+        for hh in (9, 10):
+            ReservaTemporal.objects.create(usuario=self.beto, recurso=self.recurso, fecha_hora=self.hora(hh),
+                                           expira_en=timezone.now() + timedelta(minutes=5))
+        r = self.cargar([
+            self.fila(self.ana, self.hora(9), self.recurso),     # la reserva de Beto bloquea a Ana
+            self.fila(self.beto, self.hora(9), self.recurso),    # ...pero no a Beto
+            self.fila(self.beto, self.hora(10)),                 # sin recurso: el que retuvo tiene prioridad
+        ])
+        self.assertEqual(self.estados(r), ['conflicto', 'creada', 'creada'])
+        self.assertEqual([res.get('recurso') for res in r.data['resultados'][1:]], [self.recurso.id, self.recurso.id])
+        self.assertFalse(ReservaTemporal.objects.exists())
+
+    def test_lote_sin_creadas_es_400(self):
+        Cita.objects.create(usuario=self.ana, recurso=self.recurso, fecha_hora=self.hora(9), motivo='control')
+        r = self.cargar([self.fila(self.beto, self.hora(9), self.recurso), self.fila(self.beto, self.hora(9, 7))])
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(self.estados(r), ['conflicto', 'invalida'])
+        self.assertEqual(self.cargar([]).status_code, 400)
+
+    def test_reintento_tras_integrity_error(self):
+        # Simula una carrera: la primera verificación no ve la cita que ya está en la BD
+        Cita.objects.create(usuario=self.ana, recurso=self.recurso, fecha_hora=self.hora(9), motivo='control')
+        filas = [self.fila(self.beto, self.hora(9), self.recurso), self.fila(self.beto, self.hora(10), self.recurso)]
+        real, llamadas = lote.consultar_slots_tomados, []
+
+        def ciega_la_primera_vez(**filtro):
+            llamadas.append(filtro)
+            return [] if len(llamadas) == 1 else real(**filtro)
+
+        with mock.patch.object(lote, 'consultar_slots_tomados', side_effect=ciega_la_primera_vez) as consulta:
+            resultados = lote.crear_citas_en_lote(filas)
+        self.assertEqual(consulta.call_count, 2)
+        self.assertEqual([r['estado'] for r in resultados], ['conflicto', 'creada'])
+        self.assertEqual(Cita.objects.filter(usuario=self.beto).count(), 1)
+
+        # Sin reintentos disponibles, las filas pendientes quedan como conflicto y no se crea nada
+        with mock.patch.object(lote, 'consultar_slots_tomados', return_value=[]):
+            resultados = lote.crear_citas_en_lote([self.fila(self.beto, self.hora(9), self.recurso)], reintentos=0)
+        self.assertEqual(resultados, [{"indice": 0, "estado": "conflicto", "error": MSG_SLOT_TOMADO}])
+
+    def test_conflictos_en_una_query(self):
+        filas = []
+
+        def sembrar(n):
+            # n filas nuevas en slots libres y n citas existentes con las que chocan las anteriores
+            for _ in range(n):
+                k = len(filas)
+                fh = self.hora(9, dia=self.dia + timedelta(days=k // len(HORAS_GRILLA))) + (k % len(HORAS_GRILLA)) * INTERVALO
+                filas.append(self.fila(self.beto, fh, self.recurso))
+                Cita.objects.create(usuario=self.ana, recurso=self.general, fecha_hora=fh, motivo='control')
+
+        self.assertQueriesConstantes(PRESUPUESTOS['crear_citas_lote'], lambda: self.cargar(filas), sembrar,
+                                     etiqueta='crear_citas_lote')
+        with mock.patch.object(lote, 'consultar_slots_tomados', wraps=lote.consultar_slots_tomados) as consulta:
+            self.assertPresupuestoQueries(PRESUPUESTOS['crear_citas_lote'], lambda: self.cargar(filas))
+        consulta.assert_called_once()
+
+
+class CursorCitasTests(TestCase):
+
+    def setUp(self):
+        indice_disponibilidad.limpiar()
+        self.ana = Usuario.objects.create_user(rut='111111111', password='x', nombre='Ana')
+        self.headers = {'Authorization': f'Token {Token.objects.create(user=self.ana).key}'}
+        self.client = APIClient()
+        self.client.force_authenticate(self.ana)
+        recursos = [Recurso.objects.get(nombre='Agenda general')] + [
+            Recurso.objects.create(nombre=f'Box {i}') for i in range(3)
+        ]
+        base = timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=2), HORA_INICIO))
+        pacientes = [self.ana] + [
+            Usuario.objects.create_user(rut=f'2{i:08d}', password=None, nombre='Paciente') for i in range(3)
+        ]
+        # 5 horas x 4 recursos: cada fecha_hora se repite 4 veces y solo el id desempata
+        Cita.objects.bulk_create(
+            Cita(usuario=paciente, recurso=recurso, fecha_hora=base + k * INTERVALO, motivo='control')
+            for k in range(5) for recurso, paciente in zip(recursos, pacientes)
+        )
+        self.esperado = list(Cita.objects.order_by('fecha_hora', 'id').values_list('id', flat=True))
+
+    def recorrer(self, url, limite):
+        ids, cursor, paginas = [], None, 0
+        while True:
+            params = {'limite': limite, **({'cursor': cursor} if cursor else {})}
+            r = self.client.get(url, params)
+            self.assertEqual(r.status_code, 200)
+            self.assertLessEqual(len(r.data['resultados']), limite)
+            ids += [c['id'] for c in r.data['resultados']]
+            paginas += 1
+            cursor = r.data['siguiente']
+            if cursor is None:
+                return ids, paginas
+
+    def test_recorre_todas_las_paginas_con_fecha_hora_empatada(self):
+        for limite in (1, 3, 4, 7, 20):
+            with self.subTest(limite=limite):
+                ids, paginas = self.recorrer(reverse('listar_todas_citas'), limite)
+                self.assertEqual(ids, self.esperado)  # sin repetidas, sin saltos, mismo orden
+                self.assertEqual(paginas, -(-len(self.esperado) // limite))  # la última página no deja cursor vacío
+        ids, _ = self.recorrer(reverse('listar_citas', args=[self.ana.id]), 2)
+        self.assertEqual(ids, list(Cita.objects.filter(usuario=self.ana).order_by('fecha_hora', 'id').values_list('id', flat=True)))
+
+    async def test_recorrido_async_igual_al_sync(self):
+        ids, cursor = [], None
+        while True:
+            params = {'limite': 3, **({'cursor': cursor} if cursor else {})}
+            r = await views_async.listar_todas_citas(self.factory_get(params))
+            self.assertEqual(r.status_code, 200)
+            datos = json.loads(r.content)
+            ids += [c['id'] for c in datos['resultados']]
+            cursor = datos['siguiente']
+            if cursor is None:
+                break
+        self.assertEqual(ids, self.esperado)
+
+    def factory_get(self, params):
+        return AsyncRequestFactory().get('/', params, headers=self.headers)
+
+    def test_cursor_invalido_es_400(self):
+        def b64(valor):
+            return base64.urlsafe_b64encode(json.dumps(valor).encode()).decode().rstrip('=')
+
+        url = reverse('listar_todas_citas')
+        siguiente = self.client.get(url, {'limite': 2}).data['siguiente']
+        cursores = [
+            '!!!', 'e30', siguiente[:-3], siguiente + 'x',
+            b64({'fecha_hora': 1}), b64([]), b64([self.esperado[0]]),
+            b64(['no-es-fecha', 1]), b64(['2030-01-01T09:00:00Z', 'abc']),
+            b64([None, 1]), b64(['2030-01-01T09:00:00Z', None]), b64([[1], {}]),
+        ]
+        for cursor in cursores:
+            with self.subTest(cursor=cursor):
+                r = self.client.get(url, {'limite': 2, 'cursor': cursor})
+                self.assertEqual(r.status_code, 400)
+                self.assertEqual(r.data['error'], 'Cursor inválido.')
+        for limite in ('0', '-1', 'x'):
+            with self.subTest(limite=limite):
+                self.assertEqual(self.client.get(url, {'limite': limite}).status_code, 400)
+
+
+class MultiRecursoTests(TestCase):
+
+    def setUp(self):
+        indice_disponibilidad.limpiar()
+        self.ana = Usuario.objects.create_user(rut='111111111', password='x', nombre='Ana')
+        self.beto = Usuario.objects.create_user(rut='222222222', password='x', nombre='Beto')
+        self.caro = Usuario.objects.create_user(rut='333333333', password='x', nombre='Caro')
+        self.general = Recurso.objects.get(nombre='Agenda general')  # creada por la migración 0005
+        self.soto = Recurso.objects.create(nombre='Dra. Soto')
+        self.box = Recurso.objects.create(nombre='Box 1', tipo='box')
+        self.client = APIClient()
+        self.client.force_authenticate(self.ana)
+        self.dia = timezone.localdate() + timedelta(days=2)
+
+    def hora(self, hh):
+        return timezone.make_aware(datetime.combine(self.dia, time(hh)))
+
+    def crear(self, usuario, hh, recurso=None):
+        datos = {'usuario': usuario.id, 'fecha_hora': self.hora(hh).isoformat(), 'motivo': 'control'}
+        if recurso is not None:
+            datos['recurso'] = recurso.id
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('create_appointment'), datos, format='json')
+
+    def agendar(self, usuario, recurso=None):
+        datos = {'usuario_id': usuario.id, 'fecha': self.dia.isoformat(), 'hora': '09:00'}
+        if recurso is not None:
+            datos['recurso_id'] = recurso.id
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('agendar_cita_rapida'), datos, format='json')
+
+    def horas_libres(self, recurso=None):
+        datos = {'fecha': self.dia.isoformat(), **({'recurso': recurso.id} if recurso else {})}
+        return self.client.post(reverse('verificar_disponibilidad'), datos, format='json')
+
+    def reprogramar(self, cita_id, hh, recurso=None):
+        datos = {'fecha_hora': self.hora(hh).isoformat(), **({'recurso': recurso.id} if recurso else {})}
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.patch(reverse('reprogramar_cita', args=[cita_id]), datos, format='json')
+
+    def test_mismo_slot_en_recursos_distintos(self):
+        self.assertEqual(self.crear(self.ana, 9, self.soto).status_code, 201)
+        self.assertEqual(self.crear(self.beto, 9, self.box).status_code, 201)
+        r = self.crear(self.caro, 9, self.soto)
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.data['fecha_hora'], [MSG_SLOT_TOMADO])
+        self.assertEqual(set(Cita.objects.values_list('recurso_id', flat=True)), {self.soto.id, self.box.id})
+
+        # La BD sostiene la unicidad aunque se salte la validación (bulk_create no llama a full_clean)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Cita.objects.bulk_create([Cita(usuario=self.caro, recurso=self.soto, fecha_hora=self.hora(9), motivo='control')])
+
+    def test_asigna_el_primer_recurso_libre(self):
+        recursos = [self.agendar(u).data['cita']['recurso'] for u in (self.ana, self.beto, self.caro)]
+        self.assertEqual(recursos, [self.general.id, self.soto.id, self.box.id])
+        otro = Usuario.objects.create_user(rut='444444444', password='x', nombre='Dani')
+        r = self.agendar(otro)
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.data['error'], MSG_SLOT_TOMADO)
+
+    def test_disponibilidad_por_recurso(self):
+        self.crear(self.ana, 9, self.soto)
+        self.assertNotIn('09:00', self.horas_libres(self.soto).data['horas_disponibles'])
+        self.assertIn('09:00', self.horas_libres(self.box).data['horas_disponibles'])
+        self.assertIn('09:00', self.horas_libres().data['horas_disponibles'])
+
+        self.crear(self.beto, 9, self.box)
+        self.crear(self.caro, 9, self.general)
+        self.assertNotIn('09:00', self.horas_libres().data['horas_disponibles'])
+        self.assertIn('09:30', self.horas_libres().data['horas_disponibles'])
+
+        r = self.client.get(reverse('disponibilidad_rango'), {'desde': self.dia.isoformat(), 'dias': 1, 'recurso': self.soto.id})
+        self.assertEqual(r.data['dias'][0]['horas_disponibles'][0], '09:30')
+        r = self.client.get(reverse('sugerir_proximo_horario'), {'recurso': self.box.id})
+        self.assertEqual(r.data['recurso'], self.box.id)
+        self.assertEqual(self.client.post(reverse('verificar_disponibilidad'),
+                                          {'fecha': self.dia.isoformat(), 'recurso': 999999}, format='json').status_code, 400)
+
+    def test_paciente_no_reserva_dos_recursos_a_la_misma_hora(self):
+        self.assertEqual(self.crear(self.ana, 9, self.soto).status_code, 201)
+        r = self.crear(self.ana, 9, self.box)
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.data['fecha_hora'], [MSG_CITA_PROPIA])
+        r = self.agendar(self.ana)
+        self.assertEqual(r.data['error'], MSG_CITA_PROPIA)
+        self.assertEqual(Cita.objects.filter(usuario=self.ana).count(), 1)
+
+    def test_reprogramar_cambia_de_recurso(self):
+        cita_id = self.crear(self.ana, 9, self.soto).data['cita']['id']
+        self.crear(self.beto, 10, self.box)
+        self.crear(self.caro, 11, self.soto)
+
+        r = self.reprogramar(cita_id, 10, self.box)
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.data['error'], MSG_SLOT_TOMADO)
+
+        r = self.reprogramar(cita_id, 10, self.general)
+        self.assertEqual((r.status_code, r.data['recurso']), (200, self.general.id))
+
+        # Sin recurso se queda en el actual si está libre...
+        r = self.reprogramar(cita_id, 12)
+        self.assertEqual(r.data['recurso'], self.general.id)
+        # ...y si no, pasa al primer recurso activo libre
+        self.crear(self.beto, 13, self.general)
+        r = self.reprogramar(cita_id, 13)
+        self.assertEqual(r.data['recurso'], self.soto.id)
+        self.assertNotIn('13:00', self.horas_libres(self.soto).data['horas_disponibles'])
+        self.assertIn('12:00', self.horas_libres(self.general).data['horas_disponibles'])
+
+        # La paciente no puede moverse a una hora en que ya tiene otra cita
+        otra_id = self.crear(self.ana, 15, self.box).data['cita']['id']
+        r = self.reprogramar(otra_id, 13, self.general)
+        self.assertEqual(r.data['error'], MSG_CITA_PROPIA)
+
+    def test_recurso_inactivo_se_omite(self):
+        self.general.activo = False
+        self.general.save()
+        self.assertEqual(self.agendar(self.ana).data['cita']['recurso'], self.soto.id)
+        self.assertEqual(self.agendar(self.beto).data['cita']['recurso'], self.box.id)
+        self.assertNotIn('09:00', self.horas_libres().data['horas_disponibles'])  # la general no cuenta
+        self.assertEqual(self.horas_libres(self.general).status_code, 400)
+        self.assertEqual(self.crear(self.caro, 10, self.general).status_code, 400)
+        r = self.agendar(self.caro)
+        self.assertEqual(r.data['error'], MSG_SLOT_TOMADO)
+
+        self.general.activo = True
+        self.general.save()
+        self.assertIn('09:00', self.horas_libres().data['horas_disponibles'])
+        self.assertEqual(self.agendar(self.caro).data['cita']['recurso'], self.general.id)
+
+
+class FiltroRangoDiasTests(TestCase):
+    """?desde/?hasta son días locales de TIME_ZONE (America/Santiago), ambos inclusive."""
+
+    def setUp(self):
+        self.assertEqual(settings.TIME_ZONE, 'America/Santiago')
+        self.tz = ZoneInfo(settings.TIME_ZONE)
+        self.usuario = Usuario.objects.create_user(rut='111111111', password='x', nombre='Ana')
+        self.recurso = Recurso.objects.create(nombre='Dra. Soto')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def local(self, texto, fold=0):
+        # En UTC: comparar horas ambiguas (fold) entre zonas distintas siempre da "distinto"
+        return datetime.fromisoformat(texto).replace(tzinfo=self.tz, fold=fold).astimezone(ZoneInfo('UTC'))
+
+    def sembrar(self, *instantes):
+        # bulk_create: fechas pasadas y fuera de la grilla, sin validaciones ni señales
+        Cita.objects.bulk_create(
+            Cita(usuario=self.usuario, recurso=self.recurso, fecha_hora=dt, motivo='control') for dt in instantes
+        )
+
+    def listar(self, desde=None, hasta=None):
+        params = {k: v.isoformat() for k, v in (('desde', desde), ('hasta', hasta)) if v}
+        r = self.client.get(reverse('listar_todas_citas'), params)
+        self.assertEqual(r.status_code, 200)
+        return sorted(datetime.fromisoformat(c['fecha_hora']) for c in r.data)
+
+    def test_limites_del_dia_local(self):
+        dia = date(2025, 6, 10)
+        filtro = filtro_rango_dias('fecha_hora', dia, dia)
+        self.assertEqual(filtro, {'fecha_hora__gte': self.local('2025-06-10T00:00'),
+                                  'fecha_hora__lt': self.local('2025-06-11T00:00')})
+
+        medianoche, ultimo = self.local('2025-06-10T00:00'), self.local('2025-06-10T23:59:59.999999')
+        self.sembrar(medianoche - timedelta(microseconds=1), medianoche, ultimo, ultimo + timedelta(microseconds=1))
+        self.assertEqual(self.listar(dia, dia), [medianoche, ultimo])
+        self.assertEqual(self.listar(desde=dia), [medianoche, ultimo, ultimo + timedelta(microseconds=1)])
+        self.assertEqual(self.listar(hasta=dia), [medianoche - timedelta(microseconds=1), medianoche, ultimo])
+        # 23:59:59 local del 10 ya es el día 11 en UTC: cuenta el día local, no el UTC
+        self.assertEqual(ultimo.astimezone(ZoneInfo('UTC')).date(), date(2025, 6, 11))
+
+    def test_dias_con_cambio_de_hora(self):
+        # 2024-04-06 dura 25 h (23:00-23:59 se repite); 2024-09-08 dura 23 h (no hay 00:00-00:59)
+        repetida = [self.local('2024-04-06T23:30', fold=0), self.local('2024-04-06T23:30', fold=1)]
+        antes_del_salto, tras_el_salto = self.local('2024-09-07T23:30'), self.local('2024-09-08T01:00')
+        self.sembrar(*repetida, self.local('2024-04-07T00:00'), antes_del_salto, tras_el_salto)
+
+        self.assertEqual(self.listar(date(2024, 4, 6), date(2024, 4, 6)), repetida)
+        self.assertEqual(self.listar(date(2024, 4, 7), date(2024, 4, 7)), [self.local('2024-04-07T00:00')])
+        self.assertEqual(self.listar(date(2024, 9, 7), date(2024, 9, 7)), [antes_del_salto])
+        self.assertEqual(self.listar(date(2024, 9, 8), date(2024, 9, 8)), [tras_el_salto])
+        inicio = filtro_rango_dias('fecha_hora', date(2024, 9, 8))['fecha_hora__gte']
+        self.assertEqual(inicio.astimezone(ZoneInfo('UTC')), tras_el_salto)  # las 00:00 inexistentes = 01:00
+
+    def test_desde_posterior_a_hasta_es_vacio(self):
+        self.sembrar(self.local('2025-06-10T12:00'), self.local('2025-06-11T12:00'))
+        self.assertEqual(self.listar(date(2025, 6, 11), date(2025, 6, 10)), [])
+        self.assertEqual(len(self.listar(date(2025, 6, 10), date(2025, 6, 11))), 2)
+        self.assertEqual(filtro_rango_dias('fecha_hora'), {})
+
+
+class ReservaTemporalTests(TestCase):
+
+    def setUp(self):
+        indice_disponibilidad.limpiar()
+        Recurso.objects.all().delete()  # una sola agenda (sin la 'Agenda general' de la migración)
+        Recurso.objects.create(nombre='Dra. Soto')
+        self.ana = Usuario.objects.create_user(rut='111111111', password='x', nombre='Ana')
+        self.beto = Usuario.objects.create_user(rut='222222222', password='x', nombre='Beto')
+        self.client = APIClient()
+        self.client.force_authenticate(self.ana)
+        self.fecha = (timezone.localdate() + timedelta(days=2)).isoformat()
+
+    def horas_libres(self):
+        r = self.client.post(reverse('verificar_disponibilidad'), {'fecha': self.fecha}, format='json')
+        return r.data['horas_disponibles']
+
+    def agendar(self, usuario):
+        datos = {'usuario_id': usuario.id, 'fecha': self.fecha, 'hora': '09:00'}
+        return self.client.post(reverse('agendar_cita_rapida'), datos, format='json')
+
+    def test_reserva_bloquea_a_otros_y_se_consume_al_agendar(self):
+        r = self.client.post(reverse('reservar_horario'), {'fecha': self.fecha, 'hora': '09:00'}, format='json')
+        self.assertEqual(r.status_code, 201)
+        self.assertNotIn('09:00', self.horas_libres())
+
+        r = self.agendar(self.beto)
+        self.assertEqual(r.status_code, 400)
+        self.assertIn('ya está tomado', r.data['error'])
+
+        self.assertEqual(self.agendar(self.ana).status_code, 201)
+        self.assertFalse(ReservaTemporal.objects.exists())
+
+    def test_reserva_vencida_no_bloquea(self):
+        self.client.post(reverse('reservar_horario'), {'fecha': self.fecha, 'hora': '09:00'}, format='json')
+        ReservaTemporal.objects.update(expira_en=timezone.now() - timedelta(seconds=1))
+        indice_disponibilidad.limpiar()
+        self.assertIn('09:00', self.horas_libres())
+        self.assertEqual(self.agendar(self.beto).status_code, 201)
+
+    def reservar(self, hora, **extra):
+        return self.client.post(reverse('reservar_horario'), {'fecha': self.fecha, 'hora': hora, **extra}, format='json')
+
+    def test_no_se_reserva_para_otro_paciente(self):
+        self.client.force_authenticate(self.beto)
+        propia = self.reservar('10:00')
+        self.assertEqual(propia.status_code, 201)
+
+        self.client.force_authenticate(self.ana)
+        r = self.reservar('09:00', usuario_id=self.beto.id)
+        self.assertEqual(r.status_code, 403)
+        self.assertEqual(self.reservar('09:00', usuario_id='x').status_code, 400)
+        # La reserva de Beto sigue intacta y la de Ana queda a su nombre
+        self.assertTrue(ReservaTemporal.objects.filter(id=propia.data['id'], usuario=self.beto).exists())
+        r = self.reservar('09:00', usuario_id=self.ana.id)
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(ReservaTemporal.objects.get(id=r.data['id']).usuario, self.ana)
+
+        # El staff sí puede retener para un paciente (p. ej. desde el call center)
+        staff = Usuario.objects.create_user(rut='333333333', password='x', nombre='Mesa', is_staff=True)
+        self.client.force_authenticate(staff)
+        r = self.reservar('11:00', usuario_id=self.beto.id)
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(ReservaTemporal.objects.get(id=r.data['id']).usuario, self.beto)
+
+    def test_solo_el_dueno_libera_su_reserva(self):
+        self.client.force_authenticate(self.beto)
+        reserva_id = self.reservar('09:00').data['id']
+
+        self.client.force_authenticate(self.ana)
+        r = self.client.delete(reverse('liberar_horario', args=[reserva_id]))
+        self.assertEqual(r.status_code, 404)
+        self.assertTrue(ReservaTemporal.objects.filter(id=reserva_id).exists())
+        self.assertNotIn('09:00', self.horas_libres())
+
+        self.client.force_authenticate(self.beto)
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.delete(reverse('liberar_horario', args=[reserva_id]))
+        self.assertEqual(r.status_code, 204)
+        self.assertFalse(ReservaTemporal.objects.exists())
+        self.assertIn('09:00', self.horas_libres())
+
+
+class VistasAsyncTests(TestCase):
+
+    def setUp(self):
+        indice_disponibilidad.limpiar()
+        self.usuario = Usuario.objects.create_user(rut='111111111', password='x', nombre='Ana')
+        self.headers = {'Authorization': f'Token {Token.objects.create(user=self.usuario).key}'}
+        self.fecha = (timezone.localdate() + timedelta(days=2)).isoformat()
+        self.factory = AsyncRequestFactory()
+
+    def post(self, datos):
+        return self.factory.post('/', datos, content_type='application/json', headers=self.headers)
+
+    def get(self, headers):
+        return self.factory.get('/', headers=headers)
+
+    async def test_mismo_contrato_que_las_vistas_drf(self):
+        r = await views_async.verificar_disponibilidad(self.post({'fecha': self.fecha}))
+        self.assertEqual(r.status_code, 200)
+        self.assertIn('09:00', json.loads(r.content)['horas_disponibles'])
+
+        datos = {'usuario_id': self.usuario.id, 'fecha': self.fecha, 'hora': '09:00'}
+        self.assertEqual((await views_async.agendar_cita_rapida_view(self.post(datos))).status_code, 201)
+        r = await views_async.agendar_cita_rapida_view(self.post(datos))
+        self.assertEqual(r.status_code, 400)
+        self.assertIn('error', json.loads(r.content))
+
+        r = await views_async.verificar_disponibilidad(self.post({'fecha': self.fecha}))
+        self.assertNotIn('09:00', json.loads(r.content)['horas_disponibles'])
+
+        r = await views_async.listar_citas_por_usuario(
+            self.factory.get('/', {'limite': 10}, headers=self.headers), usuario_id=self.usuario.id
+        )
+        self.assertEqual(len(json.loads(r.content)['resultados']), 1)
+
+        r = await views_async.listar_todas_citas(self.factory.get('/'))
+        self.assertEqual(r.status_code, 401)
+
+    async def test_autenticacion_y_errores_de_drf(self):
+        token_acceso, _ = emitir_token_acceso(self.usuario)
+        r = await views_async.listar_todas_citas(self.get({'Authorization': f'Bearer {token_acceso}'}))
+        self.assertEqual(r.status_code, 200)
+
+        for cabecera in ('Token nope', 'Token a b', f'Bearer {token_acceso}x'):
+            with self.subTest(cabecera=cabecera):
+                r = await views_async.listar_todas_citas(self.get({'Authorization': cabecera}))
+                self.assertEqual(r.status_code, 401)
+                self.assertEqual(r['WWW-Authenticate'], 'Token')
+
+        await Usuario.objects.filter(pk=self.usuario.pk).aupdate(is_active=False)
+        cache_tokens.limpiar()
+        r = await views_async.listar_todas_citas(self.get(self.headers))
+        self.assertEqual(r.status_code, 401)
+        await Usuario.objects.filter(pk=self.usuario.pk).aupdate(is_active=True)
+
+        r = await views_async.verificar_disponibilidad(
+            self.factory.post('/', '{"fecha":', content_type='application/json', headers=self.headers)
+        )
+        self.assertEqual(r.status_code, 400)
+        r = await views_async.verificar_disponibilidad(self.factory.get('/', headers=self.headers))
+        self.assertEqual((r.status_code, r['Allow']), (405, 'POST'))
+
+    def test_rutas_drf_por_defecto(self):
+        self.assertFalse(settings.AGENDA_VISTAS_ASYNC)
+        self.assertFalse(asyncio.iscoroutinefunction(resolve(reverse('verificar_disponibilidad')).func))
+        with vistas_async(True):
+            self.assertTrue(asyncio.iscoroutinefunction(resolve(reverse('verificar_disponibilidad')).func))
+            self.assertFalse(asyncio.iscoroutinefunction(resolve(reverse('login_usuario')).func))
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import path
 from agendamiento.views import (
     create_appointment_view,
+    crear_citas_lote,
     listar_citas_por_usuario,
     obtener_cita,
     eliminar_cita,
@@ -9,12 +11,27 @@ from agendamiento.views import (
     listar_todas_citas,
     verificar_disponibilidad,
     agendar_cita_rapida_view,
+    reservar_horario,
+    liberar_horario,
     sugerir_proximo_horario,
+    disponibilidad_rango,
 )
 
+# Opcional (AGENDA_VISTAS_ASYNC): las rutas calientes usan sus versiones async nativas (ver views_async.py)
+if getattr(settings, 'AGENDA_VISTAS_ASYNC', False):
+    from agendamiento.views_async import (  # noqa: F811
+        listar_citas_por_usuario,
+        listar_todas_citas,
+        verificar_disponibilidad,
+        agendar_cita_rapida_view,
+        sugerir_proximo_horario,
+        disponibilidad_rango,
+    )
+
 urlpatterns = [
     # CRUD de citas
     path('citas/crear/', create_appointment_view, name='create_appointment'),
+    path('citas/crear-lote/', crear_citas_lote, name='crear_citas_lote'),
     path('citas/', listar_todas_citas, name='listar_todas_citas'),
     path('citas/usuario/<int:usuario_id>/', listar_citas_por_usuario, name='listar_citas'),
     path('citas/<int:cita_id>/', obtener_cita, name='obtener_cita'),
@@ -22,6 +39,9 @@ urlpatterns = [
     path('citas/<int:cita_id>/estado/', actualizar_estado_cita, name='actualizar_estado_cita'),
     path('citas/<int:cita_id>/reprogramar/', reprogramar_cita, name='reprogramar_cita'),
     path('citas/disponibilidad/', verificar_disponibilidad, name='verificar_disponibilidad'),
+    path('citas/disponibilidad/rango/', disponibilidad_rango, name='disponibilidad_rango'),
     path('citas/agendar/', agendar_cita_rapida_view, name='agendar_cita_rapida'),
+    path('citas/reservas/', reservar_horario, name='reservar_horario'),
+    path('citas/reservas/<int:reserva_id>/', liberar_horario, name='liberar_horario'),
     path('citas/sugerir/', sugerir_proximo_horario, name='sugerir_proximo_horario')
 ]
\ No newline at end of file
@@ -1,12 +1,57 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from .serializers import CitaSerializer
-from .models import Cita
+from .serializers import CitaSerializer, MSG_FUERA_DE_GRILLA
+from .models import Cita, ReservaTemporal, ESTADOS_CITA
+from .lote import crear_citas_en_lote, LOTE_MAX
+from .reservas import reservar_slot, liberar_reserva
 from django.views.decorators.csrf import csrf_exempt
-from datetime import datetime, time, timedelta
+from datetime import datetime, timedelta
 from django.utils import timezone  # ⬅️ TZ utilities
 from django.db import IntegrityError  # ⬅️ Para colisiones únicas
+from sithcore.fechas import filtro_rango_dias
+from sithcore.paginacion import paginar_keyset, parsear_limite, respuesta_json_streaming
+from .disponibilidad import indice_de_hora, indice_disponibilidad, indice_inicio_hoy, recurso_libre_en
+
+DIAS_MAX_RANGO = 366  # tope de días por consulta de disponibilidad
+
+
+def _parsear_recurso(valor, recursos=None):
+    """
+    Valida un ID de recurso opcional contra los recursos activos (en memoria).
+    Devuelve (recurso_id | None, None) o (None, Response de error).
+    """
+    if valor in (None, ''):
+        return None, None
+    try:
+        recurso_id = int(valor)
+    except (TypeError, ValueError):
+        recurso_id = None
+    if recursos is None:
+        recursos = indice_disponibilidad.recursos_activos()
+    if recurso_id not in recursos:
+        return None, Response({"error": "Recurso no encontrado o inactivo."}, status=status.HTTP_400_BAD_REQUEST)
+    return recurso_id, None
+
+
+def _parsear_fecha_hora(fecha_str, hora_str):
+    """
+    Combina 'YYYY-MM-DD' y 'HH:MM' en un datetime aware (TZ local) futuro.
+    Devuelve (datetime, None) o (None, Response de error).
+    """
+    try:
+        fecha_hora_dt = datetime.strptime(f"{fecha_str} {hora_str}", "%Y-%m-%d %H:%M")
+    except ValueError:
+        return None, Response(
+            {"error": "Formato de fecha o hora inválido. Usa YYYY-MM-DD y HH:MM."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # ⛔ Hacer aware en TZ local y bloquear pasado
+    fecha_hora_dt = timezone.make_aware(fecha_hora_dt, timezone.get_current_timezone())
+    if fecha_hora_dt <= timezone.now():
+        return None, Response({"error": "No se puede agendar en una fecha/hora pasada."}, status=status.HTTP_400_BAD_REQUEST)
+    return fecha_hora_dt, None
 
 
 @csrf_exempt
@@ -29,16 +74,40 @@ def create_appointment_view(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-@api_view(['GET'])
-def listar_citas_por_usuario(request, usuario_id):
+@csrf_exempt
+@api_view(['POST'])
+def crear_citas_lote(request):
     """
-    Lista todas las citas asociadas a un usuario específico, con filtros opcionales.
-    ?estado=Pendiente
-    ?desde=2025-06-01
-    ?hasta=2025-06-30
+    Carga masiva de citas (p. ej. migración desde call center).
+    Body: {"citas": [{"usuario": id, "fecha_hora": ISO8601, "motivo": str, "estado"?: str}, ...]}
+    Devuelve un resultado por fila: creada (con id), conflicto o invalida (con errores).
     """
-    citas = Cita.objects.filter(usuario_id=usuario_id)
+    filas = request.data.get('citas') if isinstance(request.data, dict) else None
+    if not isinstance(filas, list) or not filas:
+        return Response({"error": "Debe enviar 'citas' como una lista no vacía."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(filas) > LOTE_MAX:
+        return Response({"error": f"El lote no puede superar {LOTE_MAX} citas."}, status=status.HTTP_400_BAD_REQUEST)
+
+    resultados = crear_citas_en_lote(filas)
+    resumen = {
+        "creadas": sum(r["estado"] == "creada" for r in resultados),
+        "conflictos": sum(r["estado"] == "conflicto" for r in resultados),
+        "invalidas": sum(r["estado"] == "invalida" for r in resultados),
+    }
+    return Response(
+        {**resumen, "resultados": resultados},
+        status=status.HTTP_201_CREATED if resumen["creadas"] else status.HTTP_400_BAD_REQUEST
+    )
 
+
+ORDEN_CITAS = ('fecha_hora', 'id')  # orden total para el cursor (keyset)
+
+
+def _filtrar_citas(citas, request):
+    """
+    Aplica los filtros comunes ?estado, ?desde, ?hasta.
+    Devuelve (queryset, None) o (None, Response de error).
+    """
     estado = request.GET.get('estado')
     desde = request.GET.get('desde')
     hasta = request.GET.get('hasta')
@@ -46,31 +115,74 @@ def listar_citas_por_usuario(request, usuario_id):
     if estado:
         citas = citas.filter(estado=estado)
 
+    fecha_desde = fecha_hasta = None
     if desde:
         try:
-            fecha_desde = datetime.strptime(desde, "%Y-%m-%d")
-            citas = citas.filter(fecha_hora__date__gte=fecha_desde)
+            fecha_desde = datetime.strptime(desde, "%Y-%m-%d").date()
         except ValueError:
-            return Response({"error": "Formato de fecha 'desde' inválido. Usa YYYY-MM-DD."}, status=400)
+            return None, Response({"error": "Formato de fecha 'desde' inválido. Usa YYYY-MM-DD."}, status=400)
 
     if hasta:
         try:
-            fecha_hasta = datetime.strptime(hasta, "%Y-%m-%d")
-            citas = citas.filter(fecha_hora__date__lte=fecha_hasta)
+            fecha_hasta = datetime.strptime(hasta, "%Y-%m-%d").date()
         except ValueError:
-            return Response({"error": "Formato de fecha 'hasta' inválido. Usa YYYY-MM-DD."}, status=400)
+            return None, Response({"error": "Formato de fecha 'hasta' inválido. Usa YYYY-MM-DD."}, status=400)
 
-    serializer = CitaSerializer(citas, many=True)
+    # Rango semiabierto sobre límites de día locales (usa índices, a diferencia de __date)
+    citas = citas.filter(**filtro_rango_dias('fecha_hora', fecha_desde, fecha_hasta))
+    return citas, None
+
+
+def _responder_citas(request, citas):
+    """
+    Serializa un listado de citas según el modo pedido:
+    ?stream=true           -> arreglo JSON en streaming (iterator por bloques)
+    ?limite=N&cursor=...   -> página por cursor sobre (fecha_hora, id)
+    sin parámetros         -> lista completa (compatibilidad)
+    """
+    if request.GET.get('stream') == 'true':
+        return respuesta_json_streaming(
+            citas.order_by(*ORDEN_CITAS),
+            lambda bloque: CitaSerializer(bloque, many=True).data
+        )
+
+    if 'limite' in request.GET or 'cursor' in request.GET:
+        try:
+            limite = parsear_limite(request.GET.get('limite'))
+            filas, siguiente = paginar_keyset(citas, ORDEN_CITAS, request.GET.get('cursor'), limite)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "resultados": CitaSerializer(filas, many=True).data,
+            "siguiente": siguiente
+        }, status=status.HTTP_200_OK)
+
+    serializer = CitaSerializer(citas.order_by(*ORDEN_CITAS), many=True)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+@api_view(['GET'])
+def listar_citas_por_usuario(request, usuario_id):
+    """
+    Lista todas las citas asociadas a un usuario específico, con filtros opcionales.
+    ?estado=Pendiente
+    ?desde=2025-06-01
+    ?hasta=2025-06-30
+    Paginación opcional: ?limite=50&cursor=<siguiente>  |  ?stream=true
+    """
+    citas, error = _filtrar_citas(Cita.objects.select_related('usuario').filter(usuario_id=usuario_id), request)
+    if error:
+        return error
+    return _responder_citas(request, citas)
+
+
 @api_view(['GET'])
 def obtener_cita(request, cita_id):
     """
     Devuelve el detalle de una cita específica por ID.
     """
     try:
-        cita = Cita.objects.get(id=cita_id)
+        cita = Cita.objects.select_related('usuario').get(id=cita_id)
         serializer = CitaSerializer(cita)
         return Response(serializer.data, status=status.HTTP_200_OK)
     except Cita.DoesNotExist:
@@ -102,11 +214,10 @@ def actualizar_estado_cita(request, cita_id):
         return Response({'error': 'Cita no encontrada'}, status=status.HTTP_404_NOT_FOUND)
 
     nuevo_estado = request.data.get('estado')
-    ESTADOS_VALIDOS = ['Pendiente', 'Completada', 'Cancelada']
 
-    if nuevo_estado not in ESTADOS_VALIDOS:
+    if nuevo_estado not in ESTADOS_CITA:
         return Response(
-            {'error': f"Estado inválido. Debe ser uno de: {', '.join(ESTADOS_VALIDOS)}"},
+            {'error': f"Estado inválido. Debe ser uno de: {', '.join(ESTADOS_CITA)}"},
             status=status.HTTP_400_BAD_REQUEST
         )
 
@@ -123,6 +234,8 @@ def actualizar_estado_cita(request, cita_id):
 def reprogramar_cita(request, cita_id):
     """
     Permite reprogramar la fecha y hora de una cita específica.
+    Body: fecha_hora (ISO8601) y opcional recurso. Sin recurso se mantiene el actual
+    si está libre; si no, se mueve al primer recurso activo libre en ese horario.
     """
     try:
         cita = Cita.objects.get(id=cita_id)
@@ -145,12 +258,30 @@ def reprogramar_cita(request, cita_id):
     if nueva_fecha <= timezone.now():
         return Response({'error': 'La nueva fecha y hora debe ser en el futuro.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    # ⛔ Evitar mover a un horario ya tomado
-    if Cita.objects.filter(fecha_hora=nueva_fecha).exclude(id=cita.id).exists():
-        return Response({'error': 'Ese horario ya está tomado.'}, status=status.HTTP_400_BAD_REQUEST)
+    recurso_id, error = _parsear_recurso(request.data.get('recurso'))
+    if error:
+        return error
+
+    # ⛔ El paciente no puede quedar con dos citas a la misma hora (en agendas distintas)
+    if Cita.objects.filter(usuario_id=cita.usuario_id, fecha_hora=nueva_fecha).exclude(id=cita.id).exists():
+        return Response({'error': 'El usuario ya tiene una cita en ese horario.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # ⛔ Evitar mover a un horario ya tomado o retenido por otro paciente (recurso pedido o en todos)
+    def libre(recurso=None):
+        return recurso_libre_en(nueva_fecha, excluir_cita_id=cita.id, usuario_id=cita.usuario_id, recurso_id=recurso)
+
+    if recurso_id is not None:
+        if libre(recurso_id) is None:
+            return Response({'error': 'Ese horario ya está tomado.'}, status=status.HTTP_400_BAD_REQUEST)
+    elif libre(cita.recurso_id) is None:
+        recurso_id = libre()
+        if recurso_id is None:
+            return Response({'error': 'Ese horario ya está tomado.'}, status=status.HTTP_400_BAD_REQUEST)
 
     try:
         cita.fecha_hora = nueva_fecha
+        if recurso_id is not None:
+            cita.recurso_id = recurso_id
         cita.save()
     except IntegrityError:
         return Response({'error': 'Ese horario ya está tomado.'}, status=status.HTTP_400_BAD_REQUEST)
@@ -158,6 +289,7 @@ def reprogramar_cita(request, cita_id):
     return Response({
         'mensaje': 'Cita reprogramada correctamente',
         'cita_id': cita.id,
+        'recurso': cita.recurso_id,
         'nueva_fecha_hora': cita.fecha_hora
     }, status=status.HTTP_200_OK)
 
@@ -169,44 +301,21 @@ def listar_todas_citas(request):
     ?estado=Pendiente
     ?desde=YYYY-MM-DD
     ?hasta=YYYY-MM-DD
+    Paginación opcional: ?limite=50&cursor=<siguiente>  |  ?stream=true (volcado completo)
     """
-    citas = Cita.objects.all()
+    citas, error = _filtrar_citas(Cita.objects.select_related('usuario'), request)
+    if error:
+        return error
+    return _responder_citas(request, citas)
 
-    estado = request.GET.get('estado')
-    desde = request.GET.get('desde')
-    hasta = request.GET.get('hasta')
 
-    if estado:
-        citas = citas.filter(estado=estado)
-
-    if desde:
-        try:
-            fecha_desde = datetime.strptime(desde, "%Y-%m-%d")
-            citas = citas.filter(fecha_hora__date__gte=fecha_desde)
-        except ValueError:
-            return Response({"error": "Formato de fecha 'desde' inválido. Usa YYYY-MM-DD."}, status=400)
-
-    if hasta:
-        try:
-            fecha_hasta = datetime.strptime(hasta, "%Y-%m-%d")
-            citas = citas.filter(fecha_hora__date__lte=fecha_hasta)
-        except ValueError:
-            return Response({"error": "Formato de fecha 'hasta' inválido. Usa YYYY-MM-DD."}, status=400)
-
-    citas = citas.order_by('fecha_hora')
-    serializer = CitaSerializer(citas, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
-
-
-@api_view(['POST'])
-def verificar_disponibilidad(request):
+def _parsear_fecha_consulta(fecha_str):
     """
-    Consulta horas disponibles en un día específico (09:00–18:00, cada 30').
-    Calcula y compara en **zona horaria local** para evitar desfases.
+    Valida la fecha (YYYY-MM-DD, no pasada) de una consulta de disponibilidad.
+    Devuelve (date, None) o (None, Response de error).
     """
-    fecha_str = request.data.get('fecha')
     if not fecha_str:
-        return Response(
+        return None, Response(
             {"error": "El campo 'fecha' es obligatorio. Usa formato YYYY-MM-DD."},
             status=status.HTTP_400_BAD_REQUEST
         )
@@ -214,56 +323,42 @@ def verificar_disponibilidad(request):
     try:
         fecha_obj = datetime.strptime(fecha_str, "%Y-%m-%d").date()
     except ValueError:
-        return Response(
+        return None, Response(
             {"error": "Formato de fecha inválido. Usa YYYY-MM-DD."},
             status=status.HTTP_400_BAD_REQUEST
         )
 
     # ⛔ No permitir consulta de fechas pasadas
     if fecha_obj < timezone.localdate():
-        return Response(
+        return None, Response(
             {"error": "No es posible consultar disponibilidad de fechas pasadas."},
             status=status.HTTP_400_BAD_REQUEST
         )
+    return fecha_obj, None
 
-    hora_inicio = time(9, 0)
-    hora_fin = time(18, 0)
-    intervalo = timedelta(minutes=30)
-
-    tz = timezone.get_current_timezone()
-
-    # Límites del día en TZ local (aware)
-    inicio_local = timezone.make_aware(datetime.combine(fecha_obj, hora_inicio), tz)
-    fin_local = timezone.make_aware(datetime.combine(fecha_obj, hora_fin), tz)
-
-    # Traer SOLO citas dentro del rango local del día
-    citas_qs = Cita.objects.filter(
-        fecha_hora__gte=inicio_local,
-        fecha_hora__lt=fin_local
-    ).values_list('fecha_hora', flat=True)
-
-    # Normalizar cada cita a hora LOCAL HH:MM (sin segundos) para comparar
-    horas_ocupadas = {
-        timezone.localtime(dt, tz).time().replace(second=0, microsecond=0)
-        for dt in citas_qs
-    }
 
-    # Construir la grilla local
-    slots = []
-    actual_dt = inicio_local
-    while actual_dt < fin_local:
-        slots.append(actual_dt.time())
-        actual_dt += intervalo
+@api_view(['POST'])
+def verificar_disponibilidad(request):
+    """
+    Consulta horas disponibles en un día específico (09:00–18:00, cada 30').
+    Calcula y compara en **zona horaria local** para evitar desfases.
+    Responde desde el índice en memoria (`disponibilidad.py`).
+    Con 'recurso' mira solo esa agenda; sin él, una hora está disponible
+    si algún recurso activo la tiene libre.
+    """
+    fecha_obj, error = _parsear_fecha_consulta(request.data.get('fecha'))
+    if error:
+        return error
 
-    horas_disponibles = [
-        slot.strftime("%H:%M")
-        for slot in slots
-        if slot not in horas_ocupadas
-    ]
+    recurso_id, error = _parsear_recurso(request.data.get('recurso'))
+    if error:
+        return error
 
+    # Bitmaps del día desde el índice en memoria (una query solo si el día no está cargado)
+    horas = indice_disponibilidad.horas_libres(fecha_obj, recurso=recurso_id)
     return Response({
-        "fecha": fecha_str,
-        "horas_disponibles": horas_disponibles
+        "fecha": request.data.get('fecha'),
+        "horas_disponibles": [slot.strftime("%H:%M") for slot in horas]
     }, status=status.HTTP_200_OK)
 
 
@@ -273,45 +368,53 @@ def verificar_disponibilidad(request):
 def agendar_cita_rapida_view(request):
     """
     Crea una nueva cita a partir de fecha y hora, y devuelve la información de la cita creada.
+    'recurso_id' es opcional: si no viene, se asigna el primer recurso activo libre.
     """
-    usuario_id = request.data.get('usuario_id')
-    fecha_str = request.data.get('fecha')
-    hora_str = request.data.get('hora')
+    datos_cita, error = _datos_cita_rapida(request.data)
+    if error:
+        return error
+    recurso_id, error = _parsear_recurso(request.data.get('recurso_id'))
+    if error:
+        return error
+    if recurso_id is not None:
+        datos_cita['recurso'] = recurso_id
+    return _crear_cita_rapida(datos_cita)
+
+
+def _datos_cita_rapida(data):
+    """
+    Valida usuario_id, fecha y hora del agendamiento rápido.
+    Devuelve (datos para CitaSerializer, None) o (None, Response de error).
+    """
+    usuario_id = data.get('usuario_id')
+    fecha_str = data.get('fecha')
+    hora_str = data.get('hora')
 
     if not all([usuario_id, fecha_str, hora_str]):
-        return Response(
+        return None, Response(
             {"error": "Los campos 'usuario_id', 'fecha' y 'hora' son obligatorios."},
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    try:
-        # Combinar fecha y hora (naive)
-        fecha_hora_dt = datetime.strptime(f"{fecha_str} {hora_str}", "%Y-%m-%d %H:%M")
-    except ValueError:
-        return Response(
-            {"error": "Formato de fecha o hora inválido. Usa YYYY-MM-DD y HH:MM."},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-
-    # ⛔ Hacer aware en TZ local y bloquear pasado
-    if timezone.is_naive(fecha_hora_dt):
-        fecha_hora_dt = timezone.make_aware(fecha_hora_dt, timezone.get_current_timezone())
-    if fecha_hora_dt <= timezone.now():
-        return Response({"error": "No se puede agendar en una fecha/hora pasada."}, status=status.HTTP_400_BAD_REQUEST)
-
-    # ⛔ Prechequeo de doble reserva
-    if Cita.objects.filter(fecha_hora=fecha_hora_dt).exists():
-        return Response({"error": "Ese horario ya está tomado."}, status=status.HTTP_400_BAD_REQUEST)
-
-    motivo_req = request.data.get('motivo', 'Consulta médica agendada por chatbot')
+    fecha_hora_dt, error = _parsear_fecha_hora(fecha_str, hora_str)
+    if error:
+        return None, error
 
-    datos_cita = {
+    motivo_req = data.get('motivo', 'Consulta médica agendada por chatbot')
+    return {
         'usuario': usuario_id,
         'fecha_hora': fecha_hora_dt.isoformat(),
         'estado': 'Pendiente',
         'motivo': motivo_req
-    }
+    }, None
+
 
+def _crear_cita_rapida(datos_cita):
+    """
+    Valida y guarda la cita (sync: la escritura va en transacción y dispara señales).
+    La disponibilidad (citas y reservas temporales de otros) la verifica el serializer
+    con una sola query; si el paciente retuvo el slot, se usa su recurso reservado.
+    """
     serializer = CitaSerializer(data=datos_cita)
     if serializer.is_valid():
         try:
@@ -324,65 +427,213 @@ def agendar_cita_rapida_view(request):
             "cita": serializer_respuesta.data
         }, status=status.HTTP_201_CREATED)
 
+    # El frontend espera {"error": ...} para horarios tomados
+    if 'fecha_hora' in serializer.errors:
+        return Response({"error": serializer.errors['fecha_hora'][0]}, status=status.HTTP_400_BAD_REQUEST)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+def reservar_horario(request):
+    """
+    Retiene un slot mientras el paciente completa el formulario (TTL: AGENDA_RESERVA_TTL).
+    Body: fecha (YYYY-MM-DD), hora (HH:MM) y opcional recurso_id. La reserva queda a nombre
+    del usuario autenticado; solo el staff puede retener para otro paciente con usuario_id.
+    Mientras esté vigente, el slot figura tomado para los demás pacientes.
+    """
+    usuario_id, error = _usuario_de_reserva(request)
+    if error:
+        return error
+    fecha_hora_dt, error = _parsear_fecha_hora(request.data.get('fecha'), request.data.get('hora'))
+    if error:
+        return error
+    if indice_de_hora(timezone.localtime(fecha_hora_dt).time()) is None:
+        return Response({"error": MSG_FUERA_DE_GRILLA}, status=status.HTTP_400_BAD_REQUEST)
+
+    recurso_id, error = _parsear_recurso(request.data.get('recurso_id'))
+    if error:
+        return error
+
+    reserva = reservar_slot(usuario_id, fecha_hora_dt, recurso_id=recurso_id)
+    if reserva is None:
+        return Response({"error": "Ese horario ya está tomado."}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        "id": reserva.id,
+        "recurso": reserva.recurso_id,
+        "fecha_hora": timezone.localtime(reserva.fecha_hora).isoformat(),
+        "expira_en": timezone.localtime(reserva.expira_en).isoformat(),
+    }, status=status.HTTP_201_CREATED)
+
+
+def _usuario_de_reserva(request):
+    """
+    Paciente a cuyo nombre se retiene el slot: el autenticado, u otro (usuario_id) solo para el staff.
+    ⛔ Reservar para otro paciente libera su reserva vigente (un paciente, una reserva).
+    Devuelve (usuario_id, None) o (None, Response de error).
+    """
+    valor = request.data.get('usuario_id')
+    if valor in (None, ''):
+        return request.user.id, None
+    try:
+        usuario_id = int(valor)
+    except (TypeError, ValueError):
+        return None, Response({"error": "'usuario_id' debe ser un entero."}, status=status.HTTP_400_BAD_REQUEST)
+    if usuario_id != request.user.id and not request.user.is_staff:
+        return None, Response({"error": "No puede reservar horarios para otro paciente."}, status=status.HTTP_403_FORBIDDEN)
+    return usuario_id, None
+
+
+@api_view(['DELETE'])
+def liberar_horario(request, reserva_id):
+    """
+    Libera una reserva temporal antes de que venza (p. ej. si el paciente abandona el formulario).
+    Solo el dueño de la reserva (o el staff) puede liberarla; para los demás no existe (404).
+    """
+    reservas = ReservaTemporal.objects.all()
+    if not request.user.is_staff:
+        reservas = reservas.filter(usuario=request.user)
+    try:
+        reserva = reservas.get(id=reserva_id)
+    except ReservaTemporal.DoesNotExist:
+        return Response({"error": "Reserva no encontrada."}, status=status.HTTP_404_NOT_FOUND)
+    liberar_reserva(reserva)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def _inicio_busqueda(fecha_desde, dias):
+    """
+    Ajusta el punto de partida de una búsqueda de slots:
+    hoy parte desde el próximo slot futuro y, si el horario ya cerró, desde mañana.
+    Devuelve (fecha_desde, dias, indice_slot).
+    """
+    if fecha_desde != timezone.localdate():
+        return fecha_desde, dias, 0
+    desde_slot = indice_inicio_hoy()
+    if desde_slot is None:
+        return fecha_desde + timedelta(days=1), max(dias - 1, 0), 0
+    return fecha_desde, dias, desde_slot
+
+
+@api_view(['GET'])
+def disponibilidad_rango(request):
+    """
+    Horas disponibles para varios días con una sola consulta de rango.
+    ?desde=YYYY-MM-DD   (por defecto hoy)
+    ?dias=7             (1–DIAS_MAX_RANGO)
+    ?primeros=K         (opcional: devuelve solo los primeros K slots libres)
+    ?recurso=ID         (opcional: solo esa agenda; si no, cualquier recurso activo)
+    Para hoy se omiten los slots que ya pasaron.
+    """
+    consulta, error = _parsear_rango(request.GET)
+    if error:
+        return error
+
+    recurso_id, error = _parsear_recurso(request.GET.get('recurso'))
+    if error:
+        return error
+
+    fecha_desde, dias, desde_slot = _inicio_busqueda(consulta['fecha_desde'], consulta['dias'])
+    libres = indice_disponibilidad.slots_libres(
+        fecha_desde, dias, desde_slot, limite=consulta['primeros'], recurso=recurso_id
+    )
+    return Response(_rango_a_json(libres, fecha_desde, dias, consulta['primeros']), status=status.HTTP_200_OK)
+
+
+def _parsear_rango(params):
+    """
+    Valida ?desde, ?dias y ?primeros de `disponibilidad_rango`.
+    Devuelve ({fecha_desde, dias, primeros}, None) o (None, Response de error).
+    """
+    hoy = timezone.localdate()
+    desde_str = params.get('desde')
+    try:
+        fecha_desde = datetime.strptime(desde_str, "%Y-%m-%d").date() if desde_str else hoy
+        dias = int(params.get('dias', 7))
+        primeros = params.get('primeros')
+        primeros = int(primeros) if primeros else None
+    except ValueError:
+        return None, Response(
+            {"error": "Parámetros inválidos. Usa desde=YYYY-MM-DD, dias y primeros enteros."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if fecha_desde < hoy:
+        return None, Response(
+            {"error": "No es posible consultar disponibilidad de fechas pasadas."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not 1 <= dias <= DIAS_MAX_RANGO or (primeros is not None and primeros < 1):
+        return None, Response(
+            {"error": f"'dias' debe estar entre 1 y {DIAS_MAX_RANGO} y 'primeros' ser positivo."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return {"fecha_desde": fecha_desde, "dias": dias, "primeros": primeros}, None
+
+
+def _rango_a_json(libres, fecha_desde, dias, primeros):
+    if primeros is not None:
+        return {
+            "slots": [
+                {"fecha": f.strftime("%Y-%m-%d"), "hora": h.strftime("%H:%M"), "recurso": r}
+                for f, h, r in libres
+            ]
+        }
+
+    por_dia = {fecha_desde + timedelta(days=i): [] for i in range(dias)}
+    for f, h, _ in libres:
+        por_dia[f].append(h.strftime("%H:%M"))
+    return {
+        "dias": [
+            {"fecha": f.strftime("%Y-%m-%d"), "horas_disponibles": horas}
+            for f, horas in por_dia.items()
+        ]
+    }
+
+
 @api_view(['GET'])
 def sugerir_proximo_horario(request):
     """
     Devuelve la primera fecha/hora disponible a partir de 'ahora' (09:00–18:00, 30').
-    Cálculo en **zona local** y filtrado por rango local del día.
-    """
-    limite_dias = int(request.GET.get('limite_dias', 30))
-    tz = timezone.get_current_timezone()
-    ahora = timezone.localtime()
-
-    hora_inicio = time(9, 0)
-    hora_fin = time(18, 0)
-    intervalo = timedelta(minutes=30)
-
-    def siguiente_slot(t: time) -> time:
-        """Redondea hacia arriba al próximo múltiplo de 30 minutos."""
-        mins = t.hour * 60 + t.minute
-        next_mins = ((mins + 29) // 30) * 30
-        h, m = divmod(next_mins, 60)
-        return time(h % 24, m)
-
-    for offset in range(0, limite_dias + 1):
-        fecha_busqueda = (ahora.date() + timedelta(days=offset))
-
-        # Punto de inicio del día:
-        if fecha_busqueda == ahora.date():
-            start_time = max(hora_inicio, siguiente_slot(ahora.time().replace(second=0, microsecond=0)))
-            if start_time >= hora_fin:
-                continue
-        else:
-            start_time = hora_inicio
-
-        # Rango local del día
-        inicio_local = timezone.make_aware(datetime.combine(fecha_busqueda, start_time), tz)
-        fin_local = timezone.make_aware(datetime.combine(fecha_busqueda, hora_fin), tz)
-
-        # Citas en rango local
-        citas_qs = Cita.objects.filter(
-            fecha_hora__gte=inicio_local,
-            fecha_hora__lt=fin_local
-        ).values_list('fecha_hora', flat=True)
-
-        ocupadas = {
-            timezone.localtime(dt, tz).time().replace(second=0, microsecond=0)
-            for dt in citas_qs
-        }
+    Se apoya en el rango del índice de disponibilidad: a lo más una query de citas
+    (para todos los recursos a la vez) sin importar cuántos días mire hacia adelante.
+    ?recurso=ID opcional para buscar en una sola agenda.
+    """
+    limite_dias, error = _parsear_limite_dias(request.GET.get('limite_dias'))
+    if error:
+        return error
+    recurso_id, error = _parsear_recurso(request.GET.get('recurso'))
+    if error:
+        return error
 
-        # Buscar el primer slot libre
-        cur = inicio_local
-        while cur < fin_local:
-            if cur.time() not in ocupadas:
-                return Response({
-                    "fecha": fecha_busqueda.strftime("%Y-%m-%d"),
-                    "hora": cur.strftime("%H:%M")
-                }, status=status.HTTP_200_OK)
-            cur += intervalo
+    fecha_desde, dias, desde_slot = _inicio_busqueda(timezone.localdate(), limite_dias + 1)
+    libres = indice_disponibilidad.slots_libres(fecha_desde, dias, desde_slot, limite=1, recurso=recurso_id)
+    return Response(_sugerencia_a_json(libres), status=status.HTTP_200_OK)
 
+
+def _parsear_limite_dias(valor):
+    """
+    ?limite_dias de `sugerir_proximo_horario` (por defecto 30, tope DIAS_MAX_RANGO).
+    Devuelve (int, None) o (None, Response de error).
+    """
+    try:
+        limite_dias = int(valor) if valor not in (None, '') else 30
+    except ValueError:
+        limite_dias = -1
+    if limite_dias < 0:
+        return None, Response(
+            {"error": "'limite_dias' debe ser un entero mayor o igual a 0."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return min(limite_dias, DIAS_MAX_RANGO), None
+
+
+def _sugerencia_a_json(libres):
+    if libres:
+        fecha, hora, recurso = libres[0]
+        return {
+            "fecha": fecha.strftime("%Y-%m-%d"),
+            "hora": hora.strftime("%H:%M"),
+            "recurso": recurso
+        }
     # Sin resultados dentro del límite
-    return Response({"fecha": None, "hora": None}, status=status.HTTP_200_OK)
\ No newline at end of file
+    return {"fecha": None, "hora": None, "recurso": None}
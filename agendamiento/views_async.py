@@ -0,0 +1,135 @@
+"""
+Versiones async nativas (ASGI) de los endpoints de disponibilidad, agendamiento y listado.
+
+Comparten validaciones y formato de respuesta con `views.py`; cambian solo los accesos
+a datos: índice de disponibilidad y listados con el ORM async, sin ocupar un hilo por
+request. La escritura del agendamiento sigue siendo sync (transacción, `full_clean`
+y señales) y se ejecuta con `sync_to_async` como respaldo.
+Se enrutan en lugar de las vistas DRF cuando `AGENDA_VISTAS_ASYNC` está activo.
+"""
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from rest_framework import status
+
+from sithcore.asincrono import api_async, como_json, respuesta_json
+from sithcore.paginacion import apaginar_keyset, parsear_limite, respuesta_json_streaming_async
+from .models import Cita
+from .serializers import CitaSerializer
+from .disponibilidad import indice_disponibilidad
+from .views import (
+    ORDEN_CITAS,
+    _crear_cita_rapida,
+    _datos_cita_rapida,
+    _filtrar_citas,
+    _inicio_busqueda,
+    _parsear_fecha_consulta,
+    _parsear_limite_dias,
+    _parsear_rango,
+    _parsear_recurso,
+    _rango_a_json,
+    _sugerencia_a_json,
+)
+
+
+async def _aparsear_recurso(valor):
+    if valor in (None, ''):
+        return None, None
+    return _parsear_recurso(valor, await indice_disponibilidad.arecursos_activos())
+
+
+@api_async(['POST'])
+async def verificar_disponibilidad(request):
+    fecha_obj, error = _parsear_fecha_consulta(request.data.get('fecha'))
+    if error:
+        return como_json(error)
+    recurso_id, error = await _aparsear_recurso(request.data.get('recurso'))
+    if error:
+        return como_json(error)
+
+    horas = await indice_disponibilidad.ahoras_libres(fecha_obj, recurso=recurso_id)
+    return respuesta_json({
+        "fecha": request.data.get('fecha'),
+        "horas_disponibles": [slot.strftime("%H:%M") for slot in horas]
+    })
+
+
+@api_async(['GET'])
+async def disponibilidad_rango(request):
+    consulta, error = _parsear_rango(request.GET)
+    if error:
+        return como_json(error)
+    recurso_id, error = await _aparsear_recurso(request.GET.get('recurso'))
+    if error:
+        return como_json(error)
+
+    fecha_desde, dias, desde_slot = _inicio_busqueda(consulta['fecha_desde'], consulta['dias'])
+    libres = await indice_disponibilidad.aslots_libres(
+        fecha_desde, dias, desde_slot, limite=consulta['primeros'], recurso=recurso_id
+    )
+    return respuesta_json(_rango_a_json(libres, fecha_desde, dias, consulta['primeros']))
+
+
+@api_async(['GET'])
+async def sugerir_proximo_horario(request):
+    limite_dias, error = _parsear_limite_dias(request.GET.get('limite_dias'))
+    if error:
+        return como_json(error)
+    recurso_id, error = await _aparsear_recurso(request.GET.get('recurso'))
+    if error:
+        return como_json(error)
+
+    fecha_desde, dias, desde_slot = _inicio_busqueda(timezone.localdate(), limite_dias + 1)
+    libres = await indice_disponibilidad.aslots_libres(fecha_desde, dias, desde_slot, limite=1, recurso=recurso_id)
+    return respuesta_json(_sugerencia_a_json(libres))
+
+
+@api_async(['POST'])
+async def agendar_cita_rapida_view(request):
+    datos_cita, error = _datos_cita_rapida(request.data)
+    if error:
+        return como_json(error)
+    recurso_id, error = await _aparsear_recurso(request.data.get('recurso_id'))
+    if error:
+        return como_json(error)
+    if recurso_id is not None:
+        datos_cita['recurso'] = recurso_id
+    return como_json(await sync_to_async(_crear_cita_rapida)(datos_cita))
+
+
+async def _aresponder_citas(request, citas):
+    """Mismos modos que `views._responder_citas` (stream, cursor o lista) con el ORM async."""
+    if request.GET.get('stream') == 'true':
+        return respuesta_json_streaming_async(
+            citas.order_by(*ORDEN_CITAS),
+            lambda bloque: CitaSerializer(bloque, many=True).data
+        )
+
+    if 'limite' in request.GET or 'cursor' in request.GET:
+        try:
+            limite = parsear_limite(request.GET.get('limite'))
+            filas, siguiente = await apaginar_keyset(citas, ORDEN_CITAS, request.GET.get('cursor'), limite)
+        except ValueError as e:
+            return respuesta_json({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return respuesta_json({
+            "resultados": CitaSerializer(filas, many=True).data,
+            "siguiente": siguiente
+        })
+
+    filas = [cita async for cita in citas.order_by(*ORDEN_CITAS)]
+    return respuesta_json(CitaSerializer(filas, many=True).data)
+
+
+@api_async(['GET'])
+async def listar_citas_por_usuario(request, usuario_id):
+    citas, error = _filtrar_citas(Cita.objects.select_related('usuario').filter(usuario_id=usuario_id), request)
+    if error:
+        return como_json(error)
+    return await _aresponder_citas(request, citas)
+
+
+@api_async(['GET'])
+async def listar_todas_citas(request):
+    citas, error = _filtrar_citas(Cita.objects.select_related('usuario'), request)
+    if error:
+        return como_json(error)
+    return await _aresponder_citas(request, citas)
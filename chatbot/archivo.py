@@ -0,0 +1,203 @@
+"""
+Retención de sesiones de triaje: las antiguas se mueven a un archivo comprimido.
+
+Las sesiones con `creado_en` anterior al corte (hoy − TRIAJE_RETENCION_DIAS días
+locales) se mueven por lotes a segmentos NDJSON comprimidos con gzip en
+TRIAJE_ARCHIVO_DIR, así SesionTriaje solo guarda la ventana reciente ("caliente").
+Cada lote es una transacción: se escribe el segmento (archivo temporal + rename),
+se registra en SegmentoArchivoTriaje y se borran las filas. Si el proceso se corta,
+los lotes confirmados quedan archivados y la siguiente ejecución sigue desde ahí;
+un segmento escrito sin su fila de manifiesto se ignora y se reescribe con el
+mismo nombre (el lote se elige de forma determinista).
+
+ContadorTriaje y los resúmenes cubren toda la historia (caliente + archivo): el
+borrado pasa por las señales (y cascadas) normales, pero dentro de `archivando()` no
+descuenta, y las reconstrucciones suman lo registrado en el manifiesto (ver
+chatbot/contadores.py y chatbot/resumenes.py).
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import zlib
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.utils.encoders import JSONEncoder
+
+from sithcore.fechas import filtro_rango_dias, inicio_dia_local
+from .models import SegmentoArchivoTriaje, SesionTriaje
+from .resumenes import hora_local
+from .signals import archivando
+
+logger = logging.getLogger(__name__)
+
+ARCHIVO_DIR = Path(getattr(settings, 'TRIAJE_ARCHIVO_DIR', settings.BASE_DIR / 'archivo_triaje'))
+RETENCION_DIAS = getattr(settings, 'TRIAJE_RETENCION_DIAS', 365)
+LOTE_ARCHIVO = 2000  # filas por segmento (y por DELETE ... WHERE id IN)
+
+
+class ArchivoIncompleto(Exception):
+    """Segmentos del manifiesto cuyo archivo falta o no coincide con lo registrado."""
+
+    def __init__(self, faltantes=(), corruptos=()):
+        self.faltantes, self.corruptos = list(faltantes), list(corruptos)
+        super().__init__(
+            f"Segmentos del archivo faltantes: {', '.join(self.faltantes) or '-'}; "
+            f"dañados: {', '.join(self.corruptos) or '-'}"
+        )
+
+
+def corte_retencion(dias=None):
+    """Inicio del día local de hace `dias` (por defecto RETENCION_DIAS): se archiva lo anterior."""
+    dias = RETENCION_DIAS if dias is None else dias
+    return inicio_dia_local(timezone.localdate() - timedelta(days=dias))
+
+
+def _fila(sesion):
+    return {
+        "id": sesion.id,
+        "usuario": sesion.usuario_id,
+        "respuestas": sesion.respuestas,
+        "mascara": sesion.mascara,
+        "urgente": sesion.urgente,
+        "score": sesion.score,
+        "recomendaciones": sesion.recomendaciones,
+        "creado_en": timezone.localtime(sesion.creado_en).isoformat(),
+        "actualizado_en": timezone.localtime(sesion.actualizado_en).isoformat(),
+    }
+
+
+def _escribir_segmento(ruta, filas):
+    """
+    Escribe el segmento completo en un temporal y lo publica con un rename atómico.
+    Devuelve el sha256 del archivo comprimido (se guarda en el manifiesto).
+    """
+    encoder = JSONEncoder(ensure_ascii=False)
+    contenido = gzip.compress(''.join(encoder.encode(fila) + '\n' for fila in filas).encode(), mtime=0)
+    temporal = ruta.with_name(ruta.name + '.tmp')
+    with open(temporal, 'wb') as crudo:
+        crudo.write(contenido)
+        crudo.flush()
+        os.fsync(crudo.fileno())
+    os.replace(temporal, ruta)
+    return hashlib.sha256(contenido).hexdigest()
+
+
+def _resumen(sesiones):
+    """Buckets (hora local, score, urgente) del lote, para reconstruir los resúmenes."""
+    conteo = Counter((hora_local(s.creado_en).isoformat(), s.score, s.urgente) for s in sesiones)
+    return [[hora, score, urgente, n] for (hora, score, urgente), n in sorted(conteo.items())]
+
+
+def archivar_lote(corte, lote=LOTE_ARCHIVO):
+    """
+    Archiva las `lote` sesiones más antiguas con creado_en < `corte` en un segmento.
+    Devuelve el SegmentoArchivoTriaje creado, o None si no queda nada por archivar.
+    """
+    ARCHIVO_DIR.mkdir(parents=True, exist_ok=True)
+    with transaction.atomic():
+        sesiones = list(
+            SesionTriaje.objects.filter(creado_en__lt=corte)
+            .order_by('creado_en', 'id')
+            .select_for_update()[:lote]
+        )
+        if not sesiones:
+            return None
+        primera, ultima = sesiones[0], sesiones[-1]
+        nombre = f"sesiones_{timezone.localtime(primera.creado_en):%Y%m%dT%H%M%S}_{primera.id}.ndjson.gz"
+        sha256 = _escribir_segmento(ARCHIVO_DIR / nombre, map(_fila, sesiones))
+        segmento = SegmentoArchivoTriaje.objects.create(
+            nombre=nombre,
+            sha256=sha256,
+            desde=primera.creado_en,
+            hasta=ultima.creado_en,
+            filas=len(sesiones),
+            urgentes=sum(s.urgente for s in sesiones),
+            resumen=_resumen(sesiones),
+        )
+        # Borrado normal (señales y cascadas); archivando(): lo archivado sigue contando
+        with archivando():
+            SesionTriaje.objects.filter(id__in=[s.id for s in sesiones]).delete()
+    return segmento
+
+
+def archivar(corte, lote=LOTE_ARCHIVO, max_lotes=None):
+    """Archiva por lotes todo lo anterior a `corte` (o hasta `max_lotes`); genera cada segmento."""
+    hechos = 0
+    while max_lotes is None or hechos < max_lotes:
+        segmento = archivar_lote(corte, lote)
+        if segmento is None:
+            return
+        hechos += 1
+        yield segmento
+
+
+def _leer_segmento(nombre):
+    """Filas de un segmento completo; ArchivoIncompleto si ya no se puede leer."""
+    try:
+        with gzip.open(ARCHIVO_DIR / nombre, 'rt', encoding='utf-8') as archivo:
+            return [json.loads(linea) for linea in archivo]
+    except (OSError, EOFError, zlib.error, ValueError) as e:
+        logger.error("Segmento de archivo ilegible: %s (%s)", nombre, e)
+        raise ArchivoIncompleto(corruptos=[nombre]) from e
+
+
+def _segmento_integro(segmento):
+    """
+    ¿El archivo coincide con el manifiesto? Compara el sha256 registrado; los segmentos
+    archivados antes de guardarlo (sha256 vacío) se descomprimen y se cuentan sus filas.
+    """
+    if segmento.sha256:
+        digest = hashlib.sha256()
+        with open(ARCHIVO_DIR / segmento.nombre, 'rb') as crudo:
+            for bloque in iter(lambda: crudo.read(1 << 16), b''):
+                digest.update(bloque)
+        return digest.hexdigest() == segmento.sha256
+    try:
+        return len(_leer_segmento(segmento.nombre)) == segmento.filas
+    except ArchivoIncompleto:
+        return False
+
+
+def leer_archivo(desde=None, hasta=None):
+    """
+    Sesiones archivadas (dicts, como en el segmento) de los días locales [desde, hasta],
+    en orden de archivo. El manifiesto descarta los segmentos fuera del rango sin abrirlos.
+
+    Antes de devolver el iterador verifica todos los segmentos del rango contra el
+    manifiesto (existencia y sha256, o número de filas si no tiene sha256) y lanza
+    ArchivoIncompleto si alguno falta o está dañado: nunca se entrega un export al que
+    le falten filas sin avisar. Cada segmento se descomprime entero antes de entregar sus
+    filas (a lo más LOTE_ARCHIVO); si falla después de verificado (p. ej. se reemplazó el
+    archivo entre medio), ArchivoIncompleto corta el streaming en vez de omitirlo.
+    """
+    rango = filtro_rango_dias('creado_en', desde, hasta)
+    inicio, fin = rango.get('creado_en__gte'), rango.get('creado_en__lt')
+    segmentos = SegmentoArchivoTriaje.objects.all()
+    if inicio:
+        segmentos = segmentos.filter(hasta__gte=inicio)
+    if fin:
+        segmentos = segmentos.filter(desde__lt=fin)
+
+    segmentos = list(segmentos.only('nombre', 'filas', 'sha256'))
+    faltantes = [s.nombre for s in segmentos if not (ARCHIVO_DIR / s.nombre).is_file()]
+    corruptos = [s.nombre for s in segmentos if s.nombre not in faltantes and not _segmento_integro(s)]
+    if faltantes or corruptos:
+        raise ArchivoIncompleto(faltantes, corruptos)
+
+    def filas():
+        for segmento in segmentos:
+            for fila in _leer_segmento(segmento.nombre):
+                creado_en = parse_datetime(fila['creado_en'])
+                if (inicio and creado_en < inicio) or (fin and creado_en >= fin):
+                    continue
+                yield fila
+
+    return filas()
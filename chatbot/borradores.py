@@ -0,0 +1,106 @@
+"""
+Borradores de triaje: las respuestas parciales se guardan en el servidor.
+
+`guardar-parcial` va acumulando respuestas en un borrador con TTL y devuelve su ID;
+`evaluar`, `recomendaciones` y `sesiones/crear` aceptan ese `borrador_id` en vez del
+objeto 'respuestas' completo, sin volver a enviarlo ni validarlo en cada paso.
+
+El borrador es mínimo: dueño y dos máscaras de 8 bits (respuestas afirmativas y
+preguntas contestadas, ver chatbot/triaje.py). Vive en el cache de Django y vence
+por TTL (TRIAJE_BORRADOR_TTL, 30 min por defecto, renovado en cada paso). Con varios
+procesos el cache debe ser compartido (Redis/Memcached); el LocMemCache por defecto
+solo sirve con un proceso.
+"""
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .triaje import CLAVES
+
+BORRADOR_TTL = getattr(settings, 'TRIAJE_BORRADOR_TTL', 30 * 60)
+MSG_BORRADOR_INVALIDO = "El borrador de triaje no existe o expiró."
+
+
+class RespuestasInvalidas(ValueError):
+    pass
+
+
+def _clave(borrador_id):
+    return f'triaje:borrador:{borrador_id}'
+
+
+def _mascaras(respuestas):
+    """
+    (afirmativas, contestadas, borradas) a partir de una lista de 8 respuestas o de un
+    objeto {clave: valor}; None borra la respuesta de esa pregunta.
+    """
+    if isinstance(respuestas, list):
+        if len(respuestas) != len(CLAVES):
+            raise RespuestasInvalidas("Debe enviar una lista de 8 respuestas.")
+        pares = zip(CLAVES, respuestas)
+    elif isinstance(respuestas, dict):
+        desconocidas = set(respuestas) - set(CLAVES)
+        if desconocidas:
+            raise RespuestasInvalidas(f"Preguntas desconocidas: {', '.join(sorted(desconocidas))}.")
+        pares = respuestas.items()
+    else:
+        raise RespuestasInvalidas("Debe enviar una lista de 8 respuestas o un objeto 'respuestas'.")
+
+    afirmativas = contestadas = borradas = 0
+    for clave, valor in pares:
+        bit = 1 << CLAVES.index(clave)
+        if valor is None:
+            borradas |= bit
+        else:
+            contestadas |= bit
+            if valor:
+                afirmativas |= bit
+    return afirmativas, contestadas, borradas
+
+
+def _leer(borrador_id, usuario_id):
+    borrador = cache.get(_clave(borrador_id)) if isinstance(borrador_id, str) else None
+    if borrador is None or borrador['usuario'] != usuario_id:
+        return None
+    return borrador
+
+
+def guardar_respuestas(usuario_id, respuestas, borrador_id=None):
+    """
+    Agrega `respuestas` al borrador (o crea uno si `borrador_id` es None).
+    Devuelve (borrador_id, borrador) o (None, None) si el borrador no existe o expiró.
+    Lanza RespuestasInvalidas si el formato no es válido.
+    """
+    afirmativas, contestadas, borradas = _mascaras(respuestas)
+    if borrador_id is None:
+        borrador_id = secrets.token_urlsafe(16)
+        borrador = {'usuario': usuario_id, 'mascara': 0, 'contestadas': 0}
+    else:
+        borrador = _leer(borrador_id, usuario_id)
+        if borrador is None:
+            return None, None
+
+    # Las preguntas de este paso reemplazan lo que hubiera; el resto se conserva
+    tocadas = contestadas | borradas
+    borrador['mascara'] = (borrador['mascara'] & ~tocadas) | afirmativas
+    borrador['contestadas'] = (borrador['contestadas'] & ~borradas) | contestadas
+    cache.set(_clave(borrador_id), borrador, BORRADOR_TTL)
+    return borrador_id, borrador
+
+
+def respuestas_del_borrador(borrador_id, usuario_id):
+    """Objeto 'respuestas' {clave: bool} de las preguntas contestadas, o None si no existe o expiró."""
+    borrador = _leer(borrador_id, usuario_id)
+    if borrador is None:
+        return None
+    cache.touch(_clave(borrador_id), BORRADOR_TTL)
+    return {
+        clave: bool(borrador['mascara'] >> i & 1)
+        for i, clave in enumerate(CLAVES)
+        if borrador['contestadas'] >> i & 1
+    }
+
+
+def descartar_borrador(borrador_id):
+    cache.delete(_clave(borrador_id))
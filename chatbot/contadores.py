@@ -0,0 +1,69 @@
+"""
+Contadores de sesiones de triaje mantenidos de forma incremental.
+
+`contar_sesiones` lee dos filas de ContadorTriaje en vez de dos COUNT(*) sobre
+toda la tabla. Cada escritura ajusta el contador dentro de su transacción:
+save() y delete() por señales (chatbot/signals.py) y la ingesta masiva
+llamando a `sumar_sesiones`. `QuerySet.update()` sobre `urgente` no pasa por
+aquí: tras algo así hay que ejecutar `manage.py reconstruir_contadores_triaje`.
+Las sesiones archivadas (chatbot/archivo.py) siguen contando.
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+
+from .models import ContadorTriaje, SegmentoArchivoTriaje, SesionTriaje
+
+
+def sumar_sesiones(deltas):
+    """
+    Aplica {urgente: delta} a los contadores en un solo UPDATE
+    (llamar dentro de la transacción de la escritura).
+    """
+    deltas = {urgente: delta for urgente, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    incremento = Case(*(When(urgente=u, then=Value(d)) for u, d in deltas.items()), default=Value(0))
+    actualizadas = ContadorTriaje.objects.filter(urgente__in=deltas).update(total=F('total') + incremento)
+    if actualizadas < len(deltas):
+        # Fila faltante (BD sin la migración de datos o contadores borrados a mano)
+        for urgente in deltas:
+            ContadorTriaje.objects.get_or_create(urgente=urgente)
+        reconstruir_contadores()
+
+
+def leer_contadores():
+    """{"total", "urgentes", "no_urgentes"} en una query."""
+    totales = dict(ContadorTriaje.objects.values_list('urgente', 'total'))
+    urgentes, no_urgentes = totales.get(True, 0), totales.get(False, 0)
+    return {"total": urgentes + no_urgentes, "urgentes": urgentes, "no_urgentes": no_urgentes}
+
+
+def contar_desde_cero():
+    """{urgente: total} con un COUNT agrupado sobre SesionTriaje más los totales del archivo."""
+    filas = SesionTriaje.objects.order_by().values('urgente').annotate(n=Count('id'))
+    totales = {True: 0, False: 0}
+    totales.update({fila['urgente']: fila['n'] for fila in filas})
+    archivo = SegmentoArchivoTriaje.objects.aggregate(
+        filas=Sum('filas', default=0), urgentes=Sum('urgentes', default=0)
+    )
+    totales[True] += archivo['urgentes']
+    totales[False] += archivo['filas'] - archivo['urgentes']
+    return totales
+
+
+def reconstruir_contadores(aplicar=True):
+    """
+    Recalcula los contadores desde la tabla y devuelve {urgente: (guardado, real)}.
+    Con `aplicar`, reescribe los que difieren. Las filas del contador se bloquean
+    primero, así las escrituras concurrentes esperan y no se pierden incrementos.
+    """
+    with transaction.atomic():
+        for urgente in (True, False):
+            ContadorTriaje.objects.get_or_create(urgente=urgente)
+        guardados = dict(ContadorTriaje.objects.select_for_update().values_list('urgente', 'total'))
+        reales = contar_desde_cero()
+        diferencias = {u: (guardados[u], reales[u]) for u in reales if guardados[u] != reales[u]}
+        if aplicar:
+            for urgente, (_, real) in diferencias.items():
+                ContadorTriaje.objects.filter(urgente=urgente).update(total=real)
+    return diferencias
@@ -0,0 +1,115 @@
+"""
+Contenido estático del chatbot: textos de las preguntas y reglas de autocuidado.
+
+Se define una vez a nivel de módulo (antes se reconstruía en cada request) y se
+publica como payload versionado con ETag (ver sithcore/cache_http.py).
+
+Las recomendaciones dependen solo de 4 flags no críticos y 3 condiciones de las
+notas: los 16 × 8 resultados posibles se precalculan una sola vez al importar el
+módulo. Cambiar las reglas implica editar este archivo y reiniciar el proceso.
+"""
+from django.conf import settings
+
+from sithcore.cache_http import ContenidoVersionado
+from .triaje import CLAVES
+
+# Flags críticos primero y luego puntaje (mismo orden que CLAVES)
+TEXTOS_PREGUNTAS = (
+    "¿Presentas dificultad para respirar?",                          # Flag crítico
+    "¿Presentas dolor en el pecho?",                                 # Flag crítico
+    "¿Presentas confusión o desorientación?",                        # Flag crítico
+    "¿Has sufrido un trauma reciente grave?",                        # Flag crítico
+    "¿Sientes fiebre alta (sobre 38.5 °C)?",                         # Puntaje
+    "¿Tienes dolor muy intenso (8 o más de 10)?",                    # Puntaje
+    "¿Has tenido vómitos o diarreas intensos y persistentes (más de 6 episodios en 24 horas)?",  # Puntaje
+    "¿Padeces alguna enfermedad crónica (HTA, diabetes, dislipidemia, etc.)?"                    # Puntaje
+)
+
+REGLAS_AUTOCUIDADO = {
+    "fiebreAlta": (
+        "Hidrátate bien (agua o sueros de rehidratación).",
+        "Controla la temperatura con paños tibios/fríos.",
+        "Puedes usar paracetamol si no tienes contraindicación."
+    ),
+    "dolorIntenso": (
+        "Descansa en un lugar cómodo y evita esfuerzos.",
+        "Prueba frío o calor local según alivie mejor.",
+        "Usa analgésico simple si no tienes contraindicación y reevalúa en 12–24 h."
+    ),
+    "vomitosDiarrea": (
+        "Rehidrátate con sueros de rehidratación oral en pequeños sorbos frecuentes.",
+        "Evita comidas grasosas y lácteos por 24–48 h; dieta blanda (arroz, sopa, pan tostado).",
+        "Reintroduce alimentos gradualmente cuando ceda la sintomatología."
+    ),
+    "enfermedadCronica": (
+        "Mantén tu medicación habitual y no la suspendas sin indicación médica.",
+        "Controla signos de alarma (empeoramiento súbito, fiebre persistente, descompensación).",
+        "Evita automedicación que pueda interactuar con tus tratamientos; consulta si tienes dudas."
+    ),
+}
+
+RECOMENDACIONES_GENERALES = (
+    "Descansa, hidrátate y observa la evolución por 24–48 h.",
+    "Si los síntomas persisten o empeoran, agenda una consulta.",
+)
+RECOMENDACION_ALARMA = "Si aparecen señales de alarma (disnea, dolor torácico intenso, confusión, desmayo), acude a urgencias."
+
+# Condiciones del paciente que agregan una nota, en este orden (bit i de la máscara de notas)
+NOTAS = (
+    ("embarazada", "Si estás embarazada, evita automedicarte; prioriza paracetamol y consulta si persisten los síntomas."),
+    ("mayor_65", "Mayor de 65 años: vigila hidratación y temperatura; consulta si hay empeoramiento."),
+    ("comorbilidad", "Con comorbilidades, controla síntomas de cerca y consulta si no mejoran."),
+)
+COMORBILIDADES_RECONOCIDAS = frozenset(["asma", "epoc", "cardiopatía", "cardiopatia", "diabetes"])
+EDAD_MAYOR = 65
+
+# Segundos que navegadores y CDN pueden servir el contenido sin revalidar
+MAX_AGE = getattr(settings, 'CHATBOT_CONTENIDO_MAX_AGE', 3600)
+
+PREGUNTAS = ContenidoVersionado({
+    "preguntas": list(TEXTOS_PREGUNTAS),
+    "claves": list(CLAVES),
+})
+REGLAS = ContenidoVersionado({
+    "reglas": {clave: list(textos) for clave, textos in REGLAS_AUTOCUIDADO.items()},
+    "generales": list(RECOMENDACIONES_GENERALES),
+    "alarma": RECOMENDACION_ALARMA,
+    "notas": dict(NOTAS),
+    "comorbilidades": sorted(COMORBILIDADES_RECONOCIDAS),
+})
+
+
+def _sin_repetidos(textos):
+    return list(dict.fromkeys(textos))
+
+
+def _tabla_recomendaciones():
+    """{(mascara_flags, mascara_notas): payload} para todas las combinaciones."""
+    tabla = {}
+    for mascara_flags in range(1 << len(REGLAS_AUTOCUIDADO)):
+        recomendaciones = [
+            texto
+            for i, textos in enumerate(REGLAS_AUTOCUIDADO.values()) if mascara_flags >> i & 1
+            for texto in textos
+        ] or list(RECOMENDACIONES_GENERALES)
+        recomendaciones.append(RECOMENDACION_ALARMA)
+        for mascara_notas in range(1 << len(NOTAS)):
+            tabla[mascara_flags, mascara_notas] = {
+                "recomendaciones": _sin_repetidos(recomendaciones),
+                "notas": _sin_repetidos(texto for i, (_, texto) in enumerate(NOTAS) if mascara_notas >> i & 1),
+            }
+    return tabla
+
+
+TABLA_RECOMENDACIONES = _tabla_recomendaciones()
+
+
+def recomendaciones_para(respuestas_obj, embarazada=False, edad=None, comorbilidades=()):
+    """Payload {"recomendaciones", "notas"} precalculado (no modificar: es compartido)."""
+    mascara_flags = sum(1 << i for i, clave in enumerate(REGLAS_AUTOCUIDADO) if respuestas_obj.get(clave))
+    mascara_notas = (
+        bool(embarazada)
+        | (isinstance(edad, int) and edad >= EDAD_MAYOR) << 1
+        | (not COMORBILIDADES_RECONOCIDAS.isdisjoint(comorbilidades)) << 2
+    )
+    return TABLA_RECOMENDACIONES[mascara_flags, mascara_notas]
@@ -0,0 +1,90 @@
+"""
+Ingesta masiva de sesiones de triaje (kioscos que sincronizan en lotes).
+
+Todo el lote se valida en memoria, los usuarios se verifican con una sola query,
+los `score`/`urgente` faltantes se calculan en una pasada con el motor de triaje
+y las filas válidas se insertan con `bulk_create` dentro de una transacción.
+Cada fila recibe su propio resultado: 'creada' o 'invalida'.
+"""
+from collections import Counter
+
+from django.db import transaction
+
+from usuarios.models import Usuario
+from .models import SesionTriaje
+from .serializers import SesionTriajeLoteItemSerializer
+from .contadores import sumar_sesiones
+from .resumenes import claves_de, sumar_en_resumenes
+from .triaje import evaluar_lote, mascara_de
+
+LOTE_MAX = 2000
+BATCH_SIZE = 500
+
+
+def _validar_filas(filas, usuario_id):
+    """Devuelve (resultados, validas) con validas = [(indice, datos_validados)]."""
+    resultados = [None] * len(filas)
+    candidatas = []
+    for i, fila in enumerate(filas):
+        ser = SesionTriajeLoteItemSerializer(data=fila)
+        if ser.is_valid():
+            datos = dict(ser.validated_data)
+            datos.setdefault('usuario', usuario_id)  # como en crear_sesion_triaje
+            candidatas.append((i, datos))
+        else:
+            resultados[i] = {"indice": i, "estado": "invalida", "errores": ser.errors}
+
+    # Usuarios inexistentes: una sola query para todo el lote
+    ids = {datos['usuario'] for _, datos in candidatas} - {None}
+    existentes = set(Usuario.objects.filter(id__in=ids).values_list('id', flat=True))
+    validas = []
+    for i, datos in candidatas:
+        if datos['usuario'] is not None and datos['usuario'] not in existentes:
+            resultados[i] = {"indice": i, "estado": "invalida", "errores": {"usuario": ["Usuario no encontrado."]}}
+        else:
+            validas.append((i, datos))
+    return resultados, validas
+
+
+def _completar_evaluacion(validas):
+    """Calcula score y urgente (ambos) de las filas a las que les falta alguno, en una pasada."""
+    faltantes = [datos for _, datos in validas if 'score' not in datos or 'urgente' not in datos]
+    for datos, (score, urgente) in zip(faltantes, evaluar_lote([d['respuestas'] for d in faltantes])):
+        datos['score'], datos['urgente'] = score, urgente
+
+
+def crear_sesiones_en_lote(filas, usuario_id=None):
+    """
+    Crea las sesiones de `filas` (lista de dicts con respuestas, usuario?, urgente?, score?,
+    recomendaciones?); `usuario_id` es el usuario por defecto de las filas que no lo traen.
+    Devuelve la lista de resultados por fila, en el mismo orden de entrada.
+    """
+    resultados, validas = _validar_filas(filas, usuario_id)
+    _completar_evaluacion(validas)
+
+    with transaction.atomic():
+        sesiones = SesionTriaje.objects.bulk_create(
+            [
+                SesionTriaje(
+                    usuario_id=datos['usuario'],
+                    respuestas=datos['respuestas'],
+                    mascara=mascara_de(datos['respuestas']),
+                    urgente=datos['urgente'],
+                    score=datos['score'],
+                    recomendaciones=datos['recomendaciones'],
+                )
+                for _, datos in validas
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        # bulk_create no dispara señales: contadores y resúmenes se ajustan a mano
+        urgentes = sum(s.urgente for s in sesiones)
+        sumar_sesiones({True: urgentes, False: len(sesiones) - urgentes})
+        sumar_en_resumenes(Counter(claves_de(s) for s in sesiones))
+
+    for (i, datos), sesion in zip(validas, sesiones):
+        resultados[i] = {
+            "indice": i, "estado": "creada", "id": sesion.id,
+            "urgente": sesion.urgente, "score": sesion.score,
+        }
+    return resultados
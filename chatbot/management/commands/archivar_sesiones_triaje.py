@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from chatbot.archivo import ARCHIVO_DIR, LOTE_ARCHIVO, RETENCION_DIAS, archivar, corte_retencion
+from chatbot.models import SesionTriaje
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve las sesiones de triaje más antiguas que la retención a segmentos NDJSON "
+        "comprimidos (TRIAJE_ARCHIVO_DIR). Cada lote se confirma por separado: si se "
+        "interrumpe, basta con volver a ejecutarlo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=RETENCION_DIAS, help="Días locales que quedan en la tabla.")
+        parser.add_argument('--lote', type=int, default=LOTE_ARCHIVO, help="Sesiones por segmento.")
+        parser.add_argument('--max-lotes', type=int, help="Detenerse tras N segmentos (ventanas de mantenimiento).")
+        parser.add_argument('--simular', action='store_true', help="Solo contar lo que se archivaría.")
+
+    def handle(self, *args, **opts):
+        if opts['dias'] < 0 or opts['lote'] < 1:
+            raise CommandError("--dias debe ser >= 0 y --lote >= 1.")
+        corte = corte_retencion(opts['dias'])
+        pendientes = SesionTriaje.objects.filter(creado_en__lt=corte).count()
+        self.stdout.write(f"Corte: {timezone.localtime(corte):%Y-%m-%d %H:%M}. Sesiones por archivar: {pendientes}.")
+        if opts['simular'] or not pendientes:
+            return
+
+        total = 0
+        for segmento in archivar(corte, opts['lote'], opts['max_lotes']):
+            total += segmento.filas
+            self.stdout.write(f"  {segmento.nombre}: {segmento.filas} sesiones ({total}/{pendientes})")
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} sesiones archivadas en {ARCHIVO_DIR}."))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot.contadores import reconstruir_contadores
+from chatbot.resumenes import reconstruir_resumenes
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los contadores de sesiones de triaje (ContadorTriaje) y los resúmenes "
+        "por hora/día desde la tabla SesionTriaje e informa las diferencias (drift). "
+        "Con --verificar no modifica nada y termina con error si hay diferencias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verificar', action='store_true', help="Solo comparar, sin reescribir.")
+
+    def handle(self, *args, **opts):
+        aplicar = not opts['verificar']
+        diferencias = reconstruir_contadores(aplicar=aplicar)
+        for urgente, (guardado, real) in sorted(diferencias.items()):
+            etiqueta = 'urgentes' if urgente else 'no urgentes'
+            self.stdout.write(f"⚠️ {etiqueta}: contador {guardado}, real {real} (drift {guardado - real:+d})")
+        buckets = reconstruir_resumenes(aplicar=aplicar)
+        for granularidad, n in buckets.items():
+            if n:
+                self.stdout.write(f"⚠️ resumen por {granularidad}: {n} buckets con drift")
+
+        con_drift = len(diferencias) + sum(bool(n) for n in buckets.values())
+        if not con_drift:
+            self.stdout.write(self.style.SUCCESS("✅ Contadores y resúmenes al día."))
+        elif opts['verificar']:
+            raise CommandError(f"{con_drift} agregados con drift.")
+        else:
+            self.stdout.write(self.style.SUCCESS("Contadores y resúmenes reconstruidos."))
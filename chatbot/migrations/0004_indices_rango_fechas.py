@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 12:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0003_sesiontriaje'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sesiontriaje',
+            index=models.Index(fields=['urgente', 'creado_en'], name='sesion_urgente_creado_idx'),
+        ),
+    ]
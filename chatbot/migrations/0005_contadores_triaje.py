@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 12:55
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def inicializar_contadores(apps, schema_editor):
+    """Los contadores parten del conteo real de las sesiones existentes."""
+    SesionTriaje = apps.get_model('chatbot', 'SesionTriaje')
+    ContadorTriaje = apps.get_model('chatbot', 'ContadorTriaje')
+    totales = {True: 0, False: 0}
+    for fila in SesionTriaje.objects.order_by().values('urgente').annotate(n=Count('id')):
+        totales[fila['urgente']] = fila['n']
+    ContadorTriaje.objects.bulk_create(ContadorTriaje(urgente=u, total=n) for u, n in totales.items())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0004_indices_rango_fechas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorTriaje',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('urgente', models.BooleanField(unique=True)),
+                ('total', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(inicializar_contadores, migrations.RunPython.noop),
+    ]
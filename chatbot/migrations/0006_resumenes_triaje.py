@@ -0,0 +1,62 @@
+# Generated by Django 5.2 on 2026-10-18 12:57
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+
+def poblar_resumenes(apps, schema_editor):
+    """Resúmenes por hora y día de las sesiones existentes (dos GROUP BY)."""
+    SesionTriaje = apps.get_model('chatbot', 'SesionTriaje')
+    tz = timezone.get_current_timezone()
+    for modelo, campo, trunc in (
+        (apps.get_model('chatbot', 'ResumenTriajeHora'), 'hora', TruncHour),
+        (apps.get_model('chatbot', 'ResumenTriajeDia'), 'fecha', TruncDate),
+    ):
+        filas = (
+            SesionTriaje.objects.order_by()
+            .annotate(bucket=trunc('creado_en', tzinfo=tz))
+            .values_list('bucket', 'score', 'urgente')
+            .annotate(n=Count('id'))
+        )
+        modelo.objects.bulk_create(
+            [modelo(**{campo: b}, score=s, urgente=u, total=n) for b, s, u, n in filas], batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0005_contadores_triaje'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenTriajeDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('score', models.SmallIntegerField()),
+                ('urgente', models.BooleanField()),
+                ('total', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'score', 'urgente'), name='uniq_resumen_dia')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenTriajeHora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.DateTimeField()),
+                ('score', models.SmallIntegerField()),
+                ('urgente', models.BooleanField()),
+                ('total', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('hora', 'score', 'urgente'), name='uniq_resumen_hora')],
+            },
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
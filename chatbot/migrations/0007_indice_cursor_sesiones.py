@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 13:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0006_resumenes_triaje'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sesiontriaje',
+            index=models.Index(fields=['creado_en', 'id'], name='sesion_creado_id_idx'),
+        ),
+    ]
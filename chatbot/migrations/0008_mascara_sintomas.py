@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-18 13:08
+
+from django.db import migrations, models
+
+# Orden de bits congelado al escribir la migración (= chatbot.triaje.CLAVES)
+CLAVES = (
+    'dificultadRespirar', 'dolorPecho', 'confusion', 'trauma',
+    'fiebreAlta', 'dolorIntenso', 'vomitosDiarrea', 'enfermedadCronica',
+)
+LOTE = 2000
+
+
+def poblar_mascaras(apps, schema_editor):
+    """
+    Calcula la máscara de las sesiones existentes por lotes de id (sin JSON en SQL:
+    portable). Por id y no con .iterator(): SQLite no aísla la lectura de la escritura.
+    """
+    SesionTriaje = apps.get_model('chatbot', 'SesionTriaje')
+    ultimo = 0
+    while True:
+        lote = list(SesionTriaje.objects.filter(id__gt=ultimo).order_by('id').only('id', 'respuestas')[:LOTE])
+        if not lote:
+            return
+        ultimo = lote[-1].id
+        for sesion in lote:
+            respuestas = sesion.respuestas if isinstance(sesion.respuestas, dict) else {}
+            sesion.mascara = sum(1 << i for i, clave in enumerate(CLAVES) if respuestas.get(clave))
+        SesionTriaje.objects.bulk_update([s for s in lote if s.mascara], ['mascara'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0007_indice_cursor_sesiones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sesiontriaje',
+            name='mascara',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(poblar_mascaras, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='sesiontriaje',
+            index=models.Index(fields=['mascara', 'creado_en'], name='sesion_mascara_creado_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0008_mascara_sintomas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SegmentoArchivoTriaje',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+                ('desde', models.DateTimeField()),
+                ('hasta', models.DateTimeField()),
+                ('filas', models.IntegerField()),
+                ('urgentes', models.IntegerField()),
+                ('resumen', models.JSONField(default=list)),
+                ('archivado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['desde', 'id'],
+                'indexes': [models.Index(fields=['desde', 'hasta'], name='segmento_rango_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 13:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0009_archivo_triaje'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sintoma',
+            index=models.Index(fields=['usuario', '-fecha_registro', '-id'], name='sintoma_usuario_fecha_idx'),
+        ),
+    ]
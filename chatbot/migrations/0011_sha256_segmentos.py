@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 14:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0010_indice_sintomas_usuario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='segmentoarchivotriaje',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
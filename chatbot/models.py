@@ -1,12 +1,19 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.conf import settings
 from usuarios.models import Usuario
+from .triaje import mascara_de
 
 class Sintoma(models.Model):
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='sintomas')
     descripcion = models.TextField()
     fecha_registro = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Síntomas de un usuario, recientes primero (listado por usuario y prefetch con tope)
+            models.Index(fields=['usuario', '-fecha_registro', '-id'], name='sintoma_usuario_fecha_idx'),
+        ]
+
     def __str__(self):
         return f'Síntoma de {self.usuario.nombre} en {self.fecha_registro}'
 
@@ -21,6 +28,7 @@ class SesionTriaje(models.Model):
         related_name='sesiones_triaje'
     )
     respuestas = models.JSONField()                 # dict con las 8 claves del triaje
+    mascara = models.PositiveSmallIntegerField(default=0)  # bit i = CLAVES[i] de `respuestas` (ver triaje.py)
     urgente = models.BooleanField(default=False)    # resultado final
     score = models.IntegerField(default=0)          # puntaje usado en la decisión
     recomendaciones = models.JSONField(default=list, blank=True)  # textos opcionales
@@ -29,7 +37,99 @@ class SesionTriaje(models.Model):
 
     class Meta:
         ordering = ['-creado_en']
+        indexes = [
+            models.Index(fields=['urgente', 'creado_en'], name='sesion_urgente_creado_idx'),
+            # Paginación por cursor y exportación del listado admin: ORDER BY creado_en DESC, id DESC
+            models.Index(fields=['creado_en', 'id'], name='sesion_creado_id_idx'),
+            # Filtros por síntoma: mascara IN (...) + rango de fechas
+            models.Index(fields=['mascara', 'creado_en'], name='sesion_mascara_creado_idx'),
+        ]
 
     def __str__(self):
         u = self.usuario_id or "anon"
-        return f"Triaje u={u} urgente={self.urgente} score={self.score} {self.creado_en:%Y-%m-%d %H:%M}"
\ No newline at end of file
+        return f"Triaje u={u} urgente={self.urgente} score={self.score} {self.creado_en:%Y-%m-%d %H:%M}"
+
+    # La señal post_save ajusta ContadorTriaje: se envía dentro de esta transacción
+    # ⚠️ `mascara` se deriva aquí (y en lote.py): un .update(respuestas=...) debe recalcularla
+    def save(self, *args, **kwargs):
+        if isinstance(self.respuestas, dict):
+            self.mascara = mascara_de(self.respuestas)
+        if kwargs.get('update_fields') is not None and 'respuestas' in kwargs['update_fields']:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'mascara'}
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
+
+    # Recuerda resultado y puntaje persistidos para mover contador y resúmenes si cambian
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._urgente_db = instance.__dict__.get('urgente')
+        instance._score_db = instance.__dict__.get('score')
+        return instance
+
+
+class ContadorTriaje(models.Model):
+    """
+    Total de sesiones de triaje por resultado (una fila por valor de `urgente`).
+    Se ajusta en la misma transacción que cada alta, baja o cambio de resultado
+    (ver chatbot/contadores.py); `reconstruir_contadores_triaje` lo recalcula.
+    """
+    urgente = models.BooleanField(unique=True)
+    total = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{'Urgentes' if self.urgente else 'No urgentes'}: {self.total}"
+
+class ResumenTriajeHora(models.Model):
+    """
+    Sesiones de triaje por hora local, puntaje y resultado (rollup incremental,
+    ver chatbot/resumenes.py). `hora` es el inicio de la hora local (aware).
+    """
+    hora = models.DateTimeField()
+    score = models.SmallIntegerField()
+    urgente = models.BooleanField()
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['hora', 'score', 'urgente'], name='uniq_resumen_hora'),
+        ]
+
+
+class ResumenTriajeDia(models.Model):
+    """Sesiones de triaje por día local, puntaje y resultado (rollup incremental)."""
+    fecha = models.DateField()
+    score = models.SmallIntegerField()
+    urgente = models.BooleanField()
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'score', 'urgente'], name='uniq_resumen_dia'),
+        ]
+
+
+class SegmentoArchivoTriaje(models.Model):
+    """
+    Manifiesto de un segmento de sesiones archivadas (NDJSON comprimido con gzip,
+    ver chatbot/archivo.py). Las sesiones salen de SesionTriaje pero siguen contando
+    en ContadorTriaje y en los resúmenes: `urgentes` y `resumen` permiten
+    reconstruirlos sin abrir los archivos.
+    """
+    nombre = models.CharField(max_length=100, unique=True)  # archivo dentro de TRIAJE_ARCHIVO_DIR
+    desde = models.DateTimeField()                          # creado_en de la primera sesión
+    hasta = models.DateTimeField()                          # creado_en de la última sesión
+    filas = models.IntegerField()
+    urgentes = models.IntegerField()
+    resumen = models.JSONField(default=list)                # [[hora local ISO, score, urgente, n], ...]
+    sha256 = models.CharField(max_length=64, blank=True)    # del archivo comprimido ('' en los anteriores)
+    archivado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['desde', 'id']
+        indexes = [
+            models.Index(fields=['desde', 'hasta'], name='segmento_rango_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nombre} ({self.filas} sesiones, {self.desde:%Y-%m-%d} a {self.hasta:%Y-%m-%d})"
@@ -0,0 +1,163 @@
+"""
+Resúmenes (rollups) de sesiones de triaje por hora y por día local.
+
+Cada fila cuenta las sesiones de un bucket (hora o día) con un puntaje y resultado
+dados: con puntajes 0..30 un bucket tiene a lo más 62 filas y en la práctica unas
+pocas, así que la analítica de un año lee unos miles de filas indexadas en vez de
+recorrer SesionTriaje.
+
+Se mantienen como ContadorTriaje: en la transacción de cada escritura (señales y
+ingesta masiva) con `sumar_en_resumenes`; `reconstruir_resumenes` los recalcula.
+Incluyen las sesiones archivadas (chatbot/archivo.py): la analítica cubre toda la historia.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from sithcore.fechas import filtro_rango_dias
+from .models import ResumenTriajeDia, ResumenTriajeHora, SegmentoArchivoTriaje, SesionTriaje
+
+
+def hora_local(instante):
+    """Inicio (aware) de la hora local de `instante`."""
+    return timezone.localtime(instante).replace(minute=0, second=0, microsecond=0)
+
+
+def claves_de(sesion, score=None, urgente=None):
+    """Clave (creado_en, score, urgente) de una sesión; score/urgente permiten usar los valores previos."""
+    return (
+        sesion.creado_en,
+        sesion.score if score is None else score,
+        sesion.urgente if urgente is None else urgente,
+    )
+
+
+def _sumar(modelo, campo, deltas):
+    for (bucket, score, urgente), delta in deltas.items():
+        if not delta:
+            continue
+        filtro = {campo: bucket, 'score': score, 'urgente': urgente}
+        if modelo.objects.filter(**filtro).update(total=F('total') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                modelo.objects.create(total=delta, **filtro)
+        except IntegrityError:
+            # Otra transacción creó el bucket entre el UPDATE y el INSERT
+            modelo.objects.filter(**filtro).update(total=F('total') + delta)
+
+
+def sumar_en_resumenes(deltas):
+    """
+    Aplica {(creado_en, score, urgente): delta} a los resúmenes por hora y por día
+    (llamar dentro de la transacción de la escritura).
+    """
+    por_hora, por_dia = Counter(), Counter()
+    for (creado_en, score, urgente), delta in deltas.items():
+        hora = hora_local(creado_en)
+        por_hora[hora, score, urgente] += delta
+        por_dia[hora.date(), score, urgente] += delta
+    _sumar(ResumenTriajeHora, 'hora', por_hora)
+    _sumar(ResumenTriajeDia, 'fecha', por_dia)
+
+
+def _agrupar(trunc):
+    return (
+        SesionTriaje.objects.order_by()
+        .annotate(bucket=trunc('creado_en', tzinfo=timezone.get_current_timezone()))
+        .values_list('bucket', 'score', 'urgente')
+        .annotate(n=Count('id'))
+    )
+
+
+def _agrupar_archivo():
+    """{(hora, score, urgente): n} y {(fecha, score, urgente): n} de lo archivado, desde el manifiesto."""
+    por_hora, por_dia = Counter(), Counter()
+    for resumen in SegmentoArchivoTriaje.objects.values_list('resumen', flat=True).iterator():
+        for hora, score, urgente, n in resumen:
+            hora = timezone.localtime(parse_datetime(hora))
+            por_hora[hora, score, urgente] += n
+            por_dia[hora.date(), score, urgente] += n
+    return {'hora': por_hora, 'dia': por_dia}
+
+
+def reconstruir_resumenes(aplicar=True):
+    """
+    Recalcula ambos resúmenes desde SesionTriaje (un GROUP BY cada uno) más el
+    manifiesto del archivo y devuelve {'hora': n, 'dia': n} con la cantidad de
+    buckets que difieren. Con `aplicar`, los resúmenes se reescriben.
+    """
+    diferencias = {}
+    with transaction.atomic():
+        archivo = _agrupar_archivo()
+        for clave, modelo, campo, trunc in (
+            ('hora', ResumenTriajeHora, 'hora', TruncHour),
+            ('dia', ResumenTriajeDia, 'fecha', TruncDate),
+        ):
+            reales = archivo[clave]
+            for b, s, u, n in _agrupar(trunc):
+                reales[b, s, u] += n
+            guardados = {
+                (b, s, u): n
+                for b, s, u, n in modelo.objects.select_for_update().values_list(campo, 'score', 'urgente', 'total')
+                if n
+            }
+            diferencias[clave] = sum(reales.get(k) != guardados.get(k) for k in reales.keys() | guardados.keys())
+            if aplicar and diferencias[clave]:
+                modelo.objects.all().delete()
+                modelo.objects.bulk_create(
+                    [modelo(**{campo: b}, score=s, urgente=u, total=n) for (b, s, u), n in reales.items()],
+                    batch_size=1000,
+                )
+    return diferencias
+
+
+def analitica(desde, hasta, por_hora=False, histogramas=False):
+    """
+    Volumen, proporción de urgentes y puntaje medio por bucket para los días locales
+    [desde, hasta], más el histograma de puntajes del rango (agregados en SQL sobre
+    los resúmenes). Con `histogramas`, cada bucket trae además su propio histograma.
+    """
+    if por_hora:
+        campo, filas = 'hora', ResumenTriajeHora.objects.filter(**filtro_rango_dias('hora', desde, hasta))
+    else:
+        campo, filas = 'fecha', ResumenTriajeDia.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+    filas = filas.filter(total__gt=0)
+    formato = (lambda b: timezone.localtime(b).isoformat()) if por_hora else (lambda b: b.isoformat())
+
+    por_bucket = {}
+    if histogramas:
+        for bucket, score, n in filas.values_list(campo, 'score').annotate(n=Sum('total')).order_by(campo, 'score'):
+            por_bucket.setdefault(bucket, {})[str(score)] = n
+
+    buckets = []
+    for fila in (
+        filas.values(campo)
+        .annotate(
+            n=Sum('total'),
+            urgentes=Sum('total', filter=Q(urgente=True), default=0),
+            suma=Sum(F('score') * F('total')),
+        )
+        .order_by(campo)
+    ):
+        bucket = {
+            "inicio": formato(fila[campo]),
+            "total": fila['n'],
+            "urgentes": fila['urgentes'],
+            "proporcion_urgente": round(fila['urgentes'] / fila['n'], 4),
+            "score_medio": round(fila['suma'] / fila['n'], 2),
+        }
+        if histogramas:
+            bucket["histograma_score"] = por_bucket.get(fila[campo], {})
+        buckets.append(bucket)
+
+    histograma = {str(score): n for score, n in filas.values_list('score').annotate(n=Sum('total')).order_by('score')}
+    return {
+        "buckets": buckets,
+        "histograma_score": histograma,
+        "total": sum(histograma.values()),
+    }
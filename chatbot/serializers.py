@@ -7,6 +7,25 @@ class SesionTriajeCreateSerializer(serializers.ModelSerializer):
         fields = ['usuario', 'respuestas', 'urgente', 'score', 'recomendaciones']
 
 class SesionTriajeSerializer(serializers.ModelSerializer):
+    """`excluir`: campos a omitir de la salida (p. ej. los JSON pesados en listados)."""
+
+    def __init__(self, *args, excluir=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        for campo in excluir:
+            self.fields.pop(campo, None)
+
     class Meta:
         model = SesionTriaje
-        fields = ['id', 'usuario', 'respuestas', 'urgente', 'score', 'recomendaciones', 'creado_en']
\ No newline at end of file
+        fields = ['id', 'usuario', 'respuestas', 'urgente', 'score', 'recomendaciones', 'creado_en']
+
+class SesionTriajeLoteItemSerializer(serializers.Serializer):
+    """
+    Sesión de una carga masiva (kioscos). Valida solo en memoria: `usuario` es un ID
+    plano que se verifica para todo el lote con una query. Sin `score` o `urgente`
+    se calculan ambos con el motor de triaje.
+    """
+    usuario = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+    respuestas = serializers.DictField()
+    urgente = serializers.BooleanField(required=False)
+    score = serializers.IntegerField(required=False)
+    recomendaciones = serializers.JSONField(required=False, default=list)
@@ -0,0 +1,52 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import SesionTriaje
+from .contadores import sumar_sesiones
+from .resumenes import claves_de, sumar_en_resumenes
+
+
+# Mientras se archiva, los borrados no descuentan: lo archivado sigue contando (chatbot/archivo.py)
+_archivando = ContextVar('archivando_triaje', default=False)
+
+
+@contextmanager
+def archivando():
+    """Borrados de SesionTriaje que pasan al archivo: señales normales, sin descontar."""
+    previo = _archivando.set(True)
+    try:
+        yield
+    finally:
+        _archivando.reset(previo)
+
+
+@receiver(post_save, sender=SesionTriaje)
+def sesion_guardada(sender, instance, created, **kwargs):
+    if created:
+        sumar_sesiones({instance.urgente: 1})
+        sumar_en_resumenes({claves_de(instance): 1})
+    else:
+        urgente_previo = getattr(instance, '_urgente_db', None)
+        score_previo = getattr(instance, '_score_db', None)
+        if urgente_previo is not None and urgente_previo != instance.urgente:
+            sumar_sesiones({urgente_previo: -1, instance.urgente: 1})
+        if urgente_previo is not None and (urgente_previo, score_previo) != (instance.urgente, instance.score):
+            sumar_en_resumenes({
+                claves_de(instance, score_previo, urgente_previo): -1,
+                claves_de(instance): 1,
+            })
+    instance._urgente_db = instance.urgente
+    instance._score_db = instance.score
+
+
+@receiver(post_delete, sender=SesionTriaje)
+def sesion_eliminada(sender, instance, **kwargs):
+    if _archivando.get():
+        return
+    # Collector.delete envía la señal dentro de la transacción del DELETE
+    urgente = getattr(instance, '_urgente_db', instance.urgente)
+    sumar_sesiones({urgente: -1})
+    sumar_en_resumenes({claves_de(instance, getattr(instance, '_score_db', None), urgente): -1})
@@ -1,3 +1,482 @@
+import csv
+import gzip
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db.models.signals import post_delete
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from sithcore.testing import PresupuestoQueriesMixin
+from usuarios.models import Usuario
+from . import archivo, contenido
+from .contadores import leer_contadores
+from .models import ContadorTriaje, SegmentoArchivoTriaje, SesionTriaje
+from .triaje import CLAVES, N_MASCARAS, evaluar, evaluar_mascaras, mascara_de
+
+# Máximo de queries por endpoint (sin contar autenticación)
+PRESUPUESTOS = {
+    'listar_sesiones': 1,
+    'contar_sesiones': 1,
+}
+
+
+class PresupuestoQueriesSesionesTests(PresupuestoQueriesMixin, TestCase):
+
+    def setUp(self):
+        self.admin = Usuario.objects.create_user(rut='111111111', password='x', nombre='Admin', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.creadas = 0
+
+    def sembrar(self, n):
+        for _ in range(n):
+            u = Usuario.objects.create_user(rut=f'3{self.creadas:08d}', password=None, nombre='Paciente')
+            SesionTriaje.objects.create(usuario=u, respuestas={'fiebreAlta': True}, score=4)
+            self.creadas += 1
+
+    def test_listar_sesiones(self):
+        url = reverse('listar_sesiones')
+        for params in ({}, {'limite': 2}, {'formato': 'ndjson'}, {'formato': 'csv', 'sin': 'respuestas'}):
+            with self.subTest(params=params):
+                self.assertQueriesConstantes(
+                    PRESUPUESTOS['listar_sesiones'],
+                    lambda: self.client.get(url, params),
+                    self.sembrar,
+                    etiqueta=f'listar_sesiones {params}'
+                )
+
+    def test_contar_sesiones(self):
+        self.assertQueriesConstantes(
+            PRESUPUESTOS['contar_sesiones'],
+            lambda: self.client.get(reverse('contar_sesiones')),
+            self.sembrar
+        )
+
+
+class MotorTriajeTests(TestCase):
+
+    def test_tabla_equivale_a_las_reglas(self):
+        pesos = [5, 5, 5, 3, 4, 5, 2, 1]
+        puntajes, urgencias = evaluar_mascaras(range(N_MASCARAS))
+        for mascara in range(N_MASCARAS):
+            respuestas = [bool(mascara >> i & 1) for i in range(8)]
+            score = sum(p for r, p in zip(respuestas, pesos) if r)
+            urgente = any(respuestas[:4]) or score >= 5
+            obj = {clave: r for clave, r in zip(CLAVES, respuestas)}
+            self.assertEqual(evaluar(obj), (score, urgente))
+            self.assertEqual((puntajes[mascara], bool(urgencias[mascara])), (score, urgente))
+
+    def test_evaluar_lote(self):
+        client = APIClient()
+        client.force_authenticate(Usuario.objects.create_user(rut='111111111', password='x'))
+        url = reverse('chatbot_evaluar_lote')
+
+        r = client.post(url, {'respuestas': [{'fiebreAlta': True}, {'trauma': True}, {}]}, format='json')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([x['score'] for x in r.data['resultados']], [4, 3, 0])
+        self.assertEqual(r.data['urgentes'], 1)
+
+        r = client.post(url, {'mascaras': [0b00010000, 0b00110000]}, format='json')
+        self.assertEqual([x['urgente'] for x in r.data['resultados']], [False, True])
+
+        self.assertEqual(client.post(url, {'mascaras': [256]}, format='json').status_code, 400)
+        self.assertEqual(client.post(url, {'respuestas': 'x'}, format='json').status_code, 400)
+
+
+class SesionesLoteTests(PresupuestoQueriesMixin, TestCase):
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(rut='111111111', password='x', nombre='Kiosco')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.url = reverse('crear_sesiones_lote')
+
+    def test_resultado_por_fila(self):
+        filas = [
+            {'respuestas': {'fiebreAlta': True}},
+            {'respuestas': {'trauma': True}, 'usuario': None},
+            {'respuestas': {}, 'urgente': True, 'score': 9},
+            {'respuestas': 'x'},
+            {'respuestas': {}, 'usuario': 999999},
+        ]
+        r = self.client.post(self.url, {'sesiones': filas}, format='json')
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual((r.data['creadas'], r.data['invalidas']), (3, 2))
+        estados = [(x['estado'], x.get('urgente'), x.get('score')) for x in r.data['resultados']]
+        self.assertEqual(estados[:3], [('creada', False, 4), ('creada', True, 3), ('creada', True, 9)])
+        self.assertEqual([x['estado'] for x in r.data['resultados'][3:]], ['invalida', 'invalida'])
+        self.assertEqual(SesionTriaje.objects.filter(usuario=self.usuario).count(), 2)
+
+    def test_queries_no_crecen_con_el_lote(self):
+        for n in (1, 50):
+            filas = [{'respuestas': {'fiebreAlta': True}} for _ in range(n)]
+            self.assertPresupuestoQueries(
+                # 5 + UPDATE/INSERT (con savepoint) de los buckets de hora y día del resumen
+                13, lambda: self.client.post(self.url, {'sesiones': filas}, format='json'), 'crear_sesiones_lote'
+            )
+
+
+class ContadoresTriajeTests(TestCase):
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(rut='111111111', password='x', nombre='Ana')
+
+    def test_altas_cambios_y_bajas(self):
+        leve = SesionTriaje.objects.create(usuario=self.usuario, respuestas={}, urgente=False)
+        SesionTriaje.objects.create(usuario=self.usuario, respuestas={}, urgente=True)
+
+        recargada = SesionTriaje.objects.get(pk=leve.pk)
+        recargada.urgente = True
+        recargada.save()
+        self.assertEqual(leer_contadores(), {"total": 2, "urgentes": 2, "no_urgentes": 0})
+
+        SesionTriaje.objects.filter(urgente=True).delete()
+        self.assertEqual(leer_contadores(), {"total": 0, "urgentes": 0, "no_urgentes": 0})
+
+    def test_lote_y_reconstruccion(self):
+        client = APIClient()
+        client.force_authenticate(self.usuario)
+        filas = [{'respuestas': {'trauma': True}}, {'respuestas': {}}, {'respuestas': {}}]
+        client.post(reverse('crear_sesiones_lote'), {'sesiones': filas}, format='json')
+        self.assertEqual(leer_contadores(), {"total": 3, "urgentes": 1, "no_urgentes": 2})
+
+        ContadorTriaje.objects.filter(urgente=False).update(total=10)
+        with self.assertRaises(CommandError):
+            call_command('reconstruir_contadores_triaje', '--verificar', stdout=StringIO())
+        call_command('reconstruir_contadores_triaje', stdout=StringIO())
+        self.assertEqual(leer_contadores()["no_urgentes"], 2)
+
+
+class AnaliticaTriajeTests(TestCase):
+
+    def setUp(self):
+        self.admin = Usuario.objects.create_user(rut='111111111', password='x', nombre='Admin', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_resumenes_coinciden_con_las_sesiones(self):
+        self.client.post(reverse('crear_sesiones_lote'), {'sesiones': [
+            {'respuestas': {'fiebreAlta': True}},
+            {'respuestas': {'fiebreAlta': True}},
+            {'respuestas': {'trauma': True}},
+        ]}, format='json')
+        sesion = SesionTriaje.objects.create(usuario=self.admin, respuestas={}, urgente=False, score=0)
+        sesion = SesionTriaje.objects.get(pk=sesion.pk)
+        sesion.score, sesion.urgente = 9, True
+        sesion.save()
+        SesionTriaje.objects.filter(score=3).delete()
+
+        hoy = timezone.localdate().isoformat()
+        for granularidad in ('dia', 'hora'):
+            r = self.client.get(reverse('analitica_sesiones'), {
+                'desde': hoy, 'hasta': hoy, 'granularidad': granularidad, 'histogramas': 'true'
+            })
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual(r.data['histograma_score'], {'4': 2, '9': 1})
+            self.assertEqual(sum(b['urgentes'] for b in r.data['buckets']), 1)
+            self.assertEqual(sum(sum(b['histograma_score'].values()) for b in r.data['buckets']), 3)
+        call_command('reconstruir_contadores_triaje', '--verificar', stdout=StringIO())
+
+    def test_rango_invalido(self):
+        url = reverse('analitica_sesiones')
+        self.assertEqual(self.client.get(url, {'desde': '2025-01-01', 'hasta': '2025-12-31', 'granularidad': 'hora'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'granularidad': 'semana'}).status_code, 400)
+
+
+class ListadoSesionesTests(TestCase):
+
+    def setUp(self):
+        self.admin = Usuario.objects.create_user(rut='111111111', password='x', nombre='Admin', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        base = timezone.now().replace(microsecond=500000)
+        # Empates exactos y diferencias de microsegundos: el cursor no debe saltarse filas
+        for delta in (0, 0, 0, 1, 1, 250, 250, 999, 1000, 1000):
+            sesion = SesionTriaje.objects.create(usuario=self.admin, respuestas={'fiebreAlta': True}, score=4)
+            SesionTriaje.objects.filter(pk=sesion.pk).update(creado_en=base - timedelta(microseconds=delta))
+        self.esperados = list(SesionTriaje.objects.order_by('-creado_en', '-id').values_list('id', flat=True))
+
+    def test_paginas_por_cursor(self):
+        ids, cursor = [], None
+        while True:
+            params = {'limite': 3, 'sin': 'respuestas,recomendaciones'}
+            if cursor:
+                params['cursor'] = cursor
+            r = self.client.get(reverse('listar_sesiones'), params)
+            self.assertEqual(r.status_code, 200)
+            self.assertNotIn('respuestas', r.data['resultados'][0])
+            ids += [fila['id'] for fila in r.data['resultados']]
+            cursor = r.data['siguiente']
+            if not cursor:
+                break
+        self.assertEqual(ids, self.esperados)
+        self.assertEqual(self.client.get(reverse('listar_sesiones'), {'cursor': 'x'}).status_code, 400)
+
+    def test_exportaciones(self):
+        url = reverse('listar_sesiones')
+        r = self.client.get(url, {'formato': 'ndjson'})
+        filas = [json.loads(linea) for linea in b''.join(r.streaming_content).decode().splitlines()]
+        self.assertEqual([f['id'] for f in filas], self.esperados)
+        self.assertEqual(filas[0]['respuestas'], {'fiebreAlta': True})
+
+        r = self.client.get(url, {'formato': 'csv', 'sin': 'respuestas,recomendaciones'})
+        self.assertEqual(r['Content-Type'], 'text/csv; charset=utf-8')
+        filas = list(csv.reader(StringIO(b''.join(r.streaming_content).decode())))
+        self.assertEqual(filas[0], ['id', 'usuario_id', 'urgente', 'score', 'creado_en'])
+        self.assertEqual([int(f[0]) for f in filas[1:]], self.esperados)
+
+        self.assertEqual(self.client.get(url, {'formato': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'sin': 'score'}).status_code, 400)
+
+
+class FiltroSintomasTests(TestCase):
+
+    def setUp(self):
+        self.admin = Usuario.objects.create_user(rut='111111111', password='x', nombre='Admin', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_mascara_al_escribir_y_filtros(self):
+        SesionTriaje.objects.create(usuario=self.admin, respuestas={'dolorPecho': True, 'trauma': True})
+        SesionTriaje.objects.create(usuario=self.admin, respuestas={'dolorPecho': True})
+        self.client.post(reverse('crear_sesiones_lote'), {'sesiones': [
+            {'respuestas': {'trauma': True, 'fiebreAlta': True}},
+            {'respuestas': {'fiebreAlta': False}},
+        ]}, format='json')
+        sesion = SesionTriaje.objects.get(respuestas={'fiebreAlta': False})
+        sesion.respuestas = {'confusion': True}
+        sesion.save(update_fields=['respuestas'])
+
+        for s in SesionTriaje.objects.all():
+            self.assertEqual(s.mascara, mascara_de(s.respuestas))
+
+        def ids(params):
+            r = self.client.get(reverse('listar_sesiones'), params)
+            self.assertEqual(r.status_code, 200)
+            return {fila['id'] for fila in r.data}
+
+        def esperados(claves, todas):
+            cumple = all if todas else any
+            return {s.id for s in SesionTriaje.objects.all() if cumple(s.respuestas.get(c) for c in claves)}
+
+        for sintomas in ('dolorPecho', 'dolorPecho,trauma', 'trauma,confusion'):
+            for modo in ('todos', 'alguno'):
+                with self.subTest(sintomas=sintomas, modo=modo):
+                    self.assertEqual(
+                        ids({'sintomas': sintomas, 'sintomas_modo': modo}),
+                        esperados(sintomas.split(','), modo == 'todos')
+                    )
+        self.assertEqual(self.client.get(reverse('listar_sesiones'), {'sintomas': 'tos'}).status_code, 400)
+
+
+class ArchivoTriajeTests(TestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        parche = mock.patch.object(archivo, 'ARCHIVO_DIR', Path(directorio.name))
+        parche.start()
+        self.addCleanup(parche.stop)
+
+        self.admin = Usuario.objects.create_user(rut='111111111', password='x', nombre='Admin', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        hace_dos_anios = timezone.now() - timedelta(days=730)
+        for i in range(5):
+            sesion = SesionTriaje.objects.create(
+                usuario=self.admin, respuestas={'dolorPecho': i % 2 == 0}, urgente=i % 2 == 0, score=5 * (i % 2 == 0)
+            )
+            SesionTriaje.objects.filter(pk=sesion.pk).update(creado_en=hace_dos_anios + timedelta(hours=i))
+        # update() no pasa por las señales: los resúmenes deben quedar en las horas antiguas
+        call_command('reconstruir_contadores_triaje', stdout=StringIO())
+        self.reciente = SesionTriaje.objects.create(usuario=self.admin, respuestas={}, score=0)
+
+    def test_archivar_por_lotes_reanudable(self):
+        contadores = leer_contadores()
+        call_command('archivar_sesiones_triaje', '--lote', '2', '--max-lotes', '1', stdout=StringIO())
+        self.assertEqual(SesionTriaje.objects.count(), 4)
+        call_command('archivar_sesiones_triaje', '--lote', '2', stdout=StringIO())
+
+        self.assertEqual(list(SesionTriaje.objects.values_list('id', flat=True)), [self.reciente.id])
+        self.assertEqual(SegmentoArchivoTriaje.objects.count(), 3)
+        # Lo archivado sigue contando y las reconstrucciones no ven drift
+        self.assertEqual(leer_contadores(), contadores)
+        call_command('reconstruir_contadores_triaje', '--verificar', stdout=StringIO())
+
+        r = self.client.get(reverse('listar_sesiones_archivadas'))
+        filas = [json.loads(linea) for linea in b''.join(r.streaming_content).decode().splitlines()]
+        self.assertEqual(len(filas), 5)
+        self.assertEqual(filas[0]['respuestas'], {'dolorPecho': True})
+
+        r = self.client.get(reverse('listar_sesiones_archivadas'), {'sintomas': 'dolorPecho', 'sin': 'respuestas'})
+        filas = [json.loads(linea) for linea in b''.join(r.streaming_content).decode().splitlines()]
+        self.assertEqual(len(filas), 3)
+        self.assertNotIn('respuestas', filas[0])
+
+        hoy = timezone.localdate().isoformat()
+        r = self.client.get(reverse('listar_sesiones_archivadas'), {'desde': hoy})
+        self.assertEqual(b''.join(r.streaming_content), b'')
+
+    def test_archivar_borra_con_senales_sin_descontar(self):
+        borradas = []
+
+        def registrar(sender, instance, **kwargs):
+            borradas.append(instance.id)
+
+        post_delete.connect(registrar, sender=SesionTriaje)
+        self.addCleanup(post_delete.disconnect, registrar, sender=SesionTriaje)
+        contadores = leer_contadores()
+        antiguas = list(SesionTriaje.objects.exclude(id=self.reciente.id).values_list('id', flat=True))
+
+        segmento = archivo.archivar_lote(archivo.corte_retencion())
+        self.assertEqual(segmento.filas, 5)
+        self.assertEqual(sorted(borradas), sorted(antiguas))
+        self.assertEqual(leer_contadores(), contadores)
+
+        # Fuera del archivo, borrar sí descuenta
+        self.reciente.delete()
+        self.assertEqual(leer_contadores()['total'], contadores['total'] - 1)
+
+    def test_segmento_faltante_o_corrupto(self):
+        call_command('archivar_sesiones_triaje', '--lote', '2', stdout=StringIO())
+        primero, segundo, tercero = SegmentoArchivoTriaje.objects.values_list('nombre', flat=True)
+        url = reverse('listar_sesiones_archivadas')
+
+        # Corrupto (truncado): error antes de empezar a transmitir, no un export con huecos
+        with open(archivo.ARCHIVO_DIR / segundo, 'r+b') as crudo:
+            crudo.truncate(20)
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 500)
+        self.assertFalse(r.streaming)
+        self.assertEqual((r.data['faltantes'], r.data['corruptos']), ([], [segundo]))
+        # Fuera del rango pedido no se revisa
+        hoy = timezone.localdate().isoformat()
+        self.assertEqual(b''.join(self.client.get(url, {'desde': hoy}).streaming_content), b'')
+
+        # gzip válido pero sin una fila: lo detecta el sha256 del manifiesto
+        filas = [json.loads(linea) for linea in gzip.decompress((archivo.ARCHIVO_DIR / primero).read_bytes()).splitlines()]
+        archivo._escribir_segmento(archivo.ARCHIVO_DIR / segundo, filas[:1])
+        archivo._escribir_segmento(archivo.ARCHIVO_DIR / primero, filas[:1])
+        SegmentoArchivoTriaje.objects.filter(nombre=segundo).update(sha256='')
+        r = self.client.get(url)
+        self.assertEqual(r.data['corruptos'], [primero, segundo])  # sin sha256: se cuentan las filas
+
+        # Faltante
+        (archivo.ARCHIVO_DIR / tercero).unlink()
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 500)
+        self.assertEqual(r.data['faltantes'], [tercero])
+        with self.assertRaises(archivo.ArchivoIncompleto):
+            archivo.leer_archivo()
+
+
+class BorradorTriajeTests(TestCase):
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(rut='111111111', password='x', nombre='Ana')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def guardar(self, respuestas, borrador_id=None):
+        datos = {'respuestas': respuestas}
+        if borrador_id:
+            datos['borrador_id'] = borrador_id
+        return self.client.post(reverse('chatbot_guardar_parcial'), datos, format='json')
+
+    def test_flujo_con_borrador(self):
+        r = self.guardar([None] * 8)
+        borrador = r.data['borrador_id']
+        self.assertEqual(r.data['contestadas'], 0)
+        for clave in CLAVES:
+            r = self.guardar({clave: clave in ('fiebreAlta', 'dolorPecho')}, borrador)
+        self.assertTrue(r.data['completo'])
+        self.guardar({'dolorPecho': False}, borrador)
+
+        r = self.client.post(reverse('chatbot_evaluar_respuestas'), {'borrador_id': borrador}, format='json')
+        self.assertFalse(r.data['urgente'])
+        r = self.client.post(reverse('recomendaciones_autocuidado'), {'borrador_id': borrador}, format='json')
+        self.assertEqual(r.status_code, 200)
+
+        r = self.client.post(reverse('crear_sesion_triaje'), {'borrador_id': borrador}, format='json')
+        self.assertEqual((r.status_code, r.data['score']), (201, 4))
+        self.assertFalse(r.data['respuestas']['dolorPecho'])
+        # La sesión registrada consume el borrador
+        r = self.client.post(reverse('chatbot_evaluar_respuestas'), {'borrador_id': borrador}, format='json')
+        self.assertEqual(r.status_code, 404)
+
+    def test_borrador_ajeno_o_invalido(self):
+        borrador = self.guardar([True] + [False] * 7).data['borrador_id']
+        otro = APIClient()
+        otro.force_authenticate(Usuario.objects.create_user(rut='222222222', password='x'))
+        r = otro.post(reverse('chatbot_evaluar_respuestas'), {'borrador_id': borrador}, format='json')
+        self.assertEqual(r.status_code, 404)
+        self.assertEqual(self.guardar([True] * 3).status_code, 400)
+        self.assertEqual(self.guardar({'tos': True}, borrador).status_code, 400)
+
+
+class ContenidoEstaticoTests(TestCase):
+
+    def test_etag_y_304(self):
+        client = APIClient()
+        for nombre in ('chatbot_preguntas', 'reglas_autocuidado'):
+            self.assertEqual(client.get(reverse(nombre)).status_code, 401)
+        client.force_authenticate(Usuario.objects.create_user(rut='111111111', password='x'))
+        for nombre in ('chatbot_preguntas', 'reglas_autocuidado'):
+            r = client.get(reverse(nombre))
+            self.assertEqual(r.status_code, 200)
+            self.assertIn('private', r['Cache-Control'])
+            self.assertEqual(r['ETag'], f'"{r.json()["version"]}"')
+            r = client.get(reverse(nombre), HTTP_IF_NONE_MATCH=r['ETag'])
+            self.assertEqual((r.status_code, r.content), (304, b''))
+            self.assertIn('max-age', r['Cache-Control'])
+        self.assertEqual(len(client.get(reverse('chatbot_preguntas')).json()['preguntas']), len(CLAVES))
+
+
+class RecomendacionesPrecalculadasTests(TestCase):
+
+    def referencia(self, respuestas, embarazada, edad, comorbilidades):
+        """Lógica original de recomendaciones_autocuidado, fila por fila."""
+        recomendaciones, notas = [], []
+        for clave, textos in contenido.REGLAS_AUTOCUIDADO.items():
+            if respuestas.get(clave):
+                recomendaciones.extend(textos)
+        if embarazada:
+            notas.append(contenido.NOTAS[0][1])
+        if isinstance(edad, int) and edad >= 65:
+            notas.append(contenido.NOTAS[1][1])
+        if any(c in comorbilidades for c in ["asma", "epoc", "cardiopatía", "cardiopatia", "diabetes"]):
+            notas.append(contenido.NOTAS[2][1])
+        if not recomendaciones:
+            recomendaciones.extend(contenido.RECOMENDACIONES_GENERALES)
+        recomendaciones.append(contenido.RECOMENDACION_ALARMA)
+        return {"recomendaciones": list(dict.fromkeys(recomendaciones)), "notas": list(dict.fromkeys(notas))}
+
+    def test_tabla_equivale_a_la_logica_original(self):
+        claves = list(contenido.REGLAS_AUTOCUIDADO)
+        for mascara in range(16):
+            respuestas = {c: bool(mascara >> i & 1) for i, c in enumerate(claves)}
+            for embarazada in (False, True):
+                for edad in (None, 30, 70):
+                    for comorbilidades in ([], ['asma'], ['hipotiroidismo']):
+                        self.assertEqual(
+                            contenido.recomendaciones_para(respuestas, embarazada, edad, comorbilidades),
+                            self.referencia(respuestas, embarazada, edad, comorbilidades),
+                        )
 
-# Create your tests here.
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(Usuario.objects.create_user(rut='111111111', password='x'))
+        r = client.post(reverse('recomendaciones_autocuidado'), {
+            'respuestas': {'fiebreAlta': True}, 'edad': 70, 'comorbilidades': [' Asma ']
+        }, format='json')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data['recomendaciones'][0], contenido.REGLAS_AUTOCUIDADO['fiebreAlta'][0])
+        self.assertEqual(len(r.data['notas']), 2)
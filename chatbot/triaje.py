@@ -0,0 +1,93 @@
+"""
+Motor de triaje: reglas de urgencia compiladas en una tabla de decisión.
+
+Las 8 respuestas son sí/no, así que cada combinación es una máscara de 8 bits
+(bit i = pregunta i de `PREGUNTAS`) y solo hay 256 casos posibles. Al importar el
+módulo se precalculan puntaje y urgencia de los 256; evaluar es armar la máscara
+y leer la tabla.
+
+Las tablas son `bytes` para evaluar lotes sin bucles en Python: `bytes.translate`
+mapea en C todas las máscaras de una vez (el puntaje máximo, 30, cabe en un byte).
+"""
+
+# (clave en el objeto 'respuestas', peso): flags críticos primero y luego puntaje
+PREGUNTAS = (
+    ('dificultadRespirar', 5),
+    ('dolorPecho', 5),
+    ('confusion', 5),
+    ('trauma', 3),
+    ('fiebreAlta', 4),
+    ('dolorIntenso', 5),
+    ('vomitosDiarrea', 2),
+    ('enfermedadCronica', 1),
+)
+CLAVES = tuple(clave for clave, _ in PREGUNTAS)
+PESOS = tuple(peso for _, peso in PREGUNTAS)
+INDICES_CRITICOS = (0, 1, 2, 3)  # ✅ SOLO 0..3 son críticos
+UMBRAL_URGENCIA = 5
+N_MASCARAS = 1 << len(PREGUNTAS)
+
+MASCARA_CRITICA = sum(1 << i for i in INDICES_CRITICOS)
+
+
+def _compilar():
+    puntajes, urgencias = bytearray(N_MASCARAS), bytearray(N_MASCARAS)
+    for mascara in range(N_MASCARAS):
+        puntaje = sum(peso for i, peso in enumerate(PESOS) if mascara >> i & 1)
+        puntajes[mascara] = puntaje
+        urgencias[mascara] = bool(mascara & MASCARA_CRITICA or puntaje >= UMBRAL_URGENCIA)
+    return bytes(puntajes), bytes(urgencias)
+
+
+TABLA_PUNTAJE, TABLA_URGENCIA = _compilar()
+
+
+def mascara_de(respuestas_obj):
+    """Máscara de 8 bits del objeto 'respuestas' (cada clave cuenta si su valor es verdadero)."""
+    mascara = 0
+    for i, clave in enumerate(CLAVES):
+        if respuestas_obj.get(clave):
+            mascara |= 1 << i
+    return mascara
+
+
+def mascara_de_claves(claves):
+    """Máscara con los bits de `claves` (nombres de `CLAVES`); ValueError si alguna no existe."""
+    mascara = 0
+    for clave in claves:
+        if clave not in CLAVES:
+            raise ValueError(f"Síntoma desconocido: {clave}.")
+        mascara |= 1 << CLAVES.index(clave)
+    return mascara
+
+
+def mascaras_con(requerida, todos=True):
+    """
+    Las máscaras (0..255) que contienen todos los bits de `requerida` (o alguno si
+    `todos=False`). Filtrar por `mascara__in=` esta lista usa el índice de la columna,
+    a diferencia de una condición bit a bit, que obliga a recorrer toda la tabla.
+    """
+    if todos:
+        return [m for m in range(N_MASCARAS) if m & requerida == requerida]
+    return [m for m in range(N_MASCARAS) if m & requerida]
+
+
+def evaluar(respuestas_obj):
+    """(score, urgente) de un objeto 'respuestas'."""
+    mascara = mascara_de(respuestas_obj)
+    return TABLA_PUNTAJE[mascara], bool(TABLA_URGENCIA[mascara])
+
+
+def evaluar_mascaras(mascaras):
+    """
+    Evalúa un lote de máscaras (0..255) de una vez.
+    Devuelve (puntajes, urgencias) como `bytes` alineados con la entrada.
+    """
+    lote = bytes(mascaras)  # ValueError si alguna está fuera de 0..255
+    return lote.translate(TABLA_PUNTAJE), lote.translate(TABLA_URGENCIA)
+
+
+def evaluar_lote(lista_respuestas):
+    """[(score, urgente), ...] para una lista de objetos 'respuestas'."""
+    puntajes, urgencias = evaluar_mascaras(mascara_de(r) for r in lista_respuestas)
+    return list(zip(puntajes, map(bool, urgencias)))
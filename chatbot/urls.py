@@ -2,21 +2,31 @@ from django.urls import path
 from .views import (
     chatbot_preguntas,
     chatbot_evaluar_respuestas,
+    chatbot_evaluar_lote,
     chatbot_resolver_traslado,
     chatbot_guardar_parcial,
     recomendaciones_autocuidado,
+    reglas_autocuidado,
     crear_sesion_triaje,
+    crear_sesiones_lote,
     listar_sesiones,
+    listar_sesiones_archivadas,
     contar_sesiones,
+    analitica_sesiones,
 )
 
 urlpatterns = [
     path('preguntas/', chatbot_preguntas, name='chatbot_preguntas'),
     path('evaluar/', chatbot_evaluar_respuestas, name='chatbot_evaluar_respuestas'),
+    path('evaluar-lote/', chatbot_evaluar_lote, name='chatbot_evaluar_lote'),
     path('resolver-traslado/', chatbot_resolver_traslado, name='chatbot_resolver_traslado'),
     path('guardar-parcial/', chatbot_guardar_parcial, name='chatbot_guardar_parcial'),
     path('recomendaciones/', recomendaciones_autocuidado, name='recomendaciones_autocuidado'),
+    path('recomendaciones/reglas/', reglas_autocuidado, name='reglas_autocuidado'),
     path('sesiones/crear/', crear_sesion_triaje, name='crear_sesion_triaje'),
+    path('sesiones/crear-lote/', crear_sesiones_lote, name='crear_sesiones_lote'),
     path('sesiones/listar/', listar_sesiones, name='listar_sesiones'),
+    path('sesiones/archivo/', listar_sesiones_archivadas, name='listar_sesiones_archivadas'),
     path('sesiones/contar/', contar_sesiones, name='contar_sesiones'),
+    path('sesiones/analitica/', analitica_sesiones, name='analitica_sesiones'),
 ]
\ No newline at end of file
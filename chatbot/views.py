@@ -5,82 +5,72 @@ from rest_framework import status
 from rest_framework.permissions import IsAdminUser
 from .models import SesionTriaje
 from .serializers import SesionTriajeCreateSerializer, SesionTriajeSerializer
-from datetime import datetime
-
-# ==========================
-# Utilidad interna: misma lógica de urgencia que /evaluar
-# ==========================
-def _es_urgencia_con_respuestas(respuestas_obj: dict) -> bool:
+import json
+from datetime import datetime, timedelta
+from django.utils import timezone
+from sithcore.fechas import filtro_rango_dias
+from sithcore.paginacion import (
+    CHUNK_STREAM,
+    paginar_keyset,
+    parsear_limite,
+    respuesta_csv_streaming,
+    respuesta_ndjson_streaming,
+)
+from .triaje import CLAVES, evaluar, evaluar_lote, evaluar_mascaras, mascara_de_claves, mascaras_con
+from . import contenido
+from .borradores import (
+    MSG_BORRADOR_INVALIDO,
+    RespuestasInvalidas,
+    descartar_borrador,
+    guardar_respuestas,
+    respuestas_del_borrador,
+)
+from .contadores import leer_contadores
+from .resumenes import analitica
+from .lote import LOTE_MAX, crear_sesiones_en_lote
+from .archivo import ArchivoIncompleto, leer_archivo
+
+# Rango máximo (días) de /sesiones/analitica/ según granularidad
+DIAS_MAX_ANALITICA = {'dia': 3660, 'hora': 93}
+
+# Máximo de sets de respuestas por llamada a /evaluar-lote/
+MAX_LOTE_EVALUACION = 10000
+
+# Orden del listado admin de sesiones (más recientes primero; id desempata el cursor)
+ORDEN_SESIONES = ('-creado_en', '-id')
+# Campos JSON que se pueden omitir con ?sin=
+CAMPOS_OMITIBLES = ('respuestas', 'recomendaciones')
+# Columnas de ?formato=csv (mismas de los antiguos volcados sesiones_triaje.csv + los JSON)
+COLUMNAS_CSV = ('id', 'usuario_id', 'urgente', 'score', 'creado_en', 'respuestas', 'recomendaciones')
+
+
+def _respuestas_de(request, data, defecto=None):
     """
-    Reproduce la misma evaluación que usas en chatbot_evaluar_respuestas.
-    Flags críticos: SOLO los 4 primeros (0..3).
-    Las otras 4 (fiebreAlta, dolorIntenso, vomitosDiarrea, enfermedadCronica) suman al score.
+    'respuestas' del body, o las del borrador si viene `borrador_id` (ver chatbot/borradores.py).
+    Devuelve (respuestas, None) o (None, Response 404 si el borrador no existe o expiró).
     """
-    respuestas = [
-        respuestas_obj.get('dificultadRespirar', False),
-        respuestas_obj.get('dolorPecho', False),
-        respuestas_obj.get('confusion', False),
-        respuestas_obj.get('trauma', False),
-        respuestas_obj.get('fiebreAlta', False),
-        respuestas_obj.get('dolorIntenso', False),
-        respuestas_obj.get('vomitosDiarrea', False),
-        respuestas_obj.get('enfermedadCronica', False)
-    ]
+    if 'borrador_id' not in data:
+        return data.get('respuestas', defecto), None
+    respuestas = respuestas_del_borrador(data.get('borrador_id'), request.user.id)
+    if respuestas is None:
+        return None, Response({"error": MSG_BORRADOR_INVALIDO}, status=status.HTTP_404_NOT_FOUND)
+    return respuestas, None
 
-    pesos = [5, 5, 5, 3, 4, 5, 2, 1]
-    score = sum(p for r, p in zip(respuestas, pesos) if r)
 
-    # ✅ SOLO 0..3 son críticos
-    indices_criticos = [0, 1, 2, 3]
-    es_urgencia_flag = any(respuestas[i] for i in indices_criticos)
-    es_urgencia_score = score >= 5
+# Devuelve la lista de preguntas del chatbot para clasificación de urgencia
+# (payload precalculado con ETag y Cache-Control; requiere token como el resto de la API)
+chatbot_preguntas = contenido.PREGUNTAS.vista(contenido.MAX_AGE)
 
-    return bool(es_urgencia_flag or es_urgencia_score)
-
-
-@api_view(['GET'])
-def chatbot_preguntas(request):
-    """
-    Devuelve la lista de preguntas del chatbot para clasificación de urgencia.
-    Flags críticos primero y luego puntaje.
-    """
-    preguntas = [
-        "¿Presentas dificultad para respirar?",                          # Flag crítico
-        "¿Presentas dolor en el pecho?",                                 # Flag crítico
-        "¿Presentas confusión o desorientación?",                        # Flag crítico
-        "¿Has sufrido un trauma reciente grave?",                        # Flag crítico
-        "¿Sientes fiebre alta (sobre 38.5 °C)?",                         # Puntaje
-        "¿Tienes dolor muy intenso (8 o más de 10)?",                    # Puntaje
-        "¿Has tenido vómitos o diarreas intensos y persistentes (más de 6 episodios en 24 horas)?",  # Puntaje
-        "¿Padeces alguna enfermedad crónica (HTA, diabetes, dislipidemia, etc.)?"                   # Puntaje
-    ]
-    return Response({"preguntas": preguntas}, status=status.HTTP_200_OK)
+# Tabla de reglas de autocuidado que usa /recomendaciones/
+reglas_autocuidado = contenido.REGLAS.vista(contenido.MAX_AGE)
 
 
 @api_view(['POST'])
 def chatbot_evaluar_respuestas(request):
-    respuestas_obj = request.data.get('respuestas', {})
-
-    respuestas = [
-        respuestas_obj.get('dificultadRespirar', False),
-        respuestas_obj.get('dolorPecho', False),
-        respuestas_obj.get('confusion', False),
-        respuestas_obj.get('trauma', False),
-        respuestas_obj.get('fiebreAlta', False),
-        respuestas_obj.get('dolorIntenso', False),
-        respuestas_obj.get('vomitosDiarrea', False),
-        respuestas_obj.get('enfermedadCronica', False)
-    ]
-
-    pesos = [5, 5, 5, 3, 4, 5, 2, 1]
-    score = sum(p for r, p in zip(respuestas, pesos) if r)
-
-    # ✅ SOLO 0..3 son críticos
-    indices_criticos = [0, 1, 2, 3]
-    es_urgencia_flag = any(respuestas[i] for i in indices_criticos)
-    es_urgencia_score = score >= 5
-
-    es_urgencia = es_urgencia_flag or es_urgencia_score
+    respuestas_obj, error = _respuestas_de(request, request.data, defecto={})
+    if error:
+        return error
+    score, es_urgencia = evaluar(respuestas_obj)
 
     if es_urgencia:
         resultado = {
@@ -102,13 +92,67 @@ def chatbot_evaluar_respuestas(request):
 
 
 @api_view(['POST'])
-def chatbot_guardar_parcial(request):
-    respuestas = request.data.get('respuestas')
+def chatbot_evaluar_lote(request):
+    """
+    Evalúa muchos sets de respuestas en una llamada (p. ej. re-puntuar sesiones
+    históricas tras un cambio de reglas). Body, uno de:
+      - respuestas (list[dict]): objetos 'respuestas' como en /evaluar
+      - mascaras (list[int]):    máscaras de 8 bits (bit i = pregunta i), sin armar dicts
+    Devuelve los resultados en el mismo orden.
+    """
+    data = request.data if isinstance(request.data, dict) else {}
+    lista = data.get('respuestas', data.get('mascaras'))
+    if not isinstance(lista, list):
+        return Response({"error": "Debe enviar 'respuestas' (lista de objetos) o 'mascaras' (lista de enteros)."}, status=400)
+    if len(lista) > MAX_LOTE_EVALUACION:
+        return Response({"error": f"Máximo {MAX_LOTE_EVALUACION} evaluaciones por llamada."}, status=400)
+
+    if 'respuestas' in data:
+        if not all(isinstance(r, dict) for r in lista):
+            return Response({"error": "Cada elemento de 'respuestas' debe ser un objeto."}, status=400)
+        resultados = evaluar_lote(lista)
+    else:
+        if not all(type(m) is int for m in lista):
+            return Response({"error": "Las máscaras deben ser enteros entre 0 y 255."}, status=400)
+        try:
+            puntajes, urgencias = evaluar_mascaras(lista)
+        except ValueError:
+            return Response({"error": "Las máscaras deben ser enteros entre 0 y 255."}, status=400)
+        resultados = zip(puntajes, map(bool, urgencias))
+
+    resultados = [{"urgente": urgente, "score": score} for score, urgente in resultados]
+    return Response({
+        "resultados": resultados,
+        "urgentes": sum(r["urgente"] for r in resultados),
+    }, status=status.HTTP_200_OK)
 
-    if not isinstance(respuestas, list) or len(respuestas) != 8:
-        return Response({"error": "Debe enviar una lista de 8 respuestas."}, status=400)
 
-    return Response({"mensaje": "Primera parte del triaje registrada."}, status=200)
+@api_view(['POST'])
+def chatbot_guardar_parcial(request):
+    """
+    Guarda respuestas en el borrador de triaje del usuario (se crea si no viene `borrador_id`).
+    Body:
+      - respuestas: lista de 8 valores o objeto {clave: valor} con las preguntas de este paso
+                    (null deja la pregunta sin contestar)
+      - borrador_id (str) [opcional]
+    Los pasos siguientes pueden enviar solo `borrador_id` en vez de 'respuestas'.
+    """
+    try:
+        borrador_id, borrador = guardar_respuestas(
+            request.user.id, request.data.get('respuestas'), request.data.get('borrador_id')
+        )
+    except RespuestasInvalidas as e:
+        return Response({"error": str(e)}, status=400)
+    if borrador_id is None:
+        return Response({"error": MSG_BORRADOR_INVALIDO}, status=404)
+
+    contestadas = bin(borrador['contestadas']).count('1')
+    return Response({
+        "mensaje": "Primera parte del triaje registrada.",
+        "borrador_id": borrador_id,
+        "contestadas": contestadas,
+        "completo": contestadas == len(CLAVES),
+    }, status=200)
 
 
 @api_view(['POST'])
@@ -136,11 +180,13 @@ def chatbot_resolver_traslado(request):
 @permission_classes([IsAuthenticated])
 def recomendaciones_autocuidado(request):
     """
-    Usa el MISMO objeto 'respuestas' del triaje.
+    Usa el MISMO objeto 'respuestas' del triaje (o su `borrador_id`).
     Devuelve recomendaciones SOLO si NO es urgencia.
     """
     data = request.data or {}
-    respuestas_obj = data.get("respuestas", {})
+    respuestas_obj, error = _respuestas_de(request, data, defecto={})
+    if error:
+        return error
     edad = data.get("edad")
     embarazada = bool(data.get("embarazada", False))
     comorbilidades = [str(x).strip().lower() for x in (data.get("comorbilidades") or [])]
@@ -149,67 +195,15 @@ def recomendaciones_autocuidado(request):
         return Response({"error": "Debe enviar el objeto 'respuestas' del triaje."}, status=400)
 
     # Revalidar con la lógica corregida
-    if _es_urgencia_con_respuestas(respuestas_obj):
+    if evaluar(respuestas_obj)[1]:
         return Response({"error": "El módulo de autocuidado solo aplica cuando el caso NO es urgente."}, status=400)
 
-    reglas = {
-        "fiebreAlta": [
-            "Hidrátate bien (agua o sueros de rehidratación).",
-            "Controla la temperatura con paños tibios/fríos.",
-            "Puedes usar paracetamol si no tienes contraindicación."
-        ],
-        "dolorIntenso": [
-            "Descansa en un lugar cómodo y evita esfuerzos.",
-            "Prueba frío o calor local según alivie mejor.",
-            "Usa analgésico simple si no tienes contraindicación y reevalúa en 12–24 h."
-        ],
-        "vomitosDiarrea": [
-            "Rehidrátate con sueros de rehidratación oral en pequeños sorbos frecuentes.",
-            "Evita comidas grasosas y lácteos por 24–48 h; dieta blanda (arroz, sopa, pan tostado).",
-            "Reintroduce alimentos gradualmente cuando ceda la sintomatología."
-        ],
-        "enfermedadCronica": [
-            "Mantén tu medicación habitual y no la suspendas sin indicación médica.",
-            "Controla signos de alarma (empeoramiento súbito, fiebre persistente, descompensación).",
-            "Evita automedicación que pueda interactuar con tus tratamientos; consulta si tienes dudas."
-        ],
-    }
+    # Una consulta a la tabla precalculada (ver chatbot/contenido.py)
+    return Response(
+        contenido.recomendaciones_para(respuestas_obj, embarazada, edad, comorbilidades),
+        status=200
+    )
 
-    recomendaciones, notas = [], []
-
-    if respuestas_obj.get("fiebreAlta"):
-        recomendaciones.extend(reglas["fiebreAlta"])
-    if respuestas_obj.get("dolorIntenso"):
-        recomendaciones.extend(reglas["dolorIntenso"])
-    if respuestas_obj.get("vomitosDiarrea"):
-        recomendaciones.extend(reglas["vomitosDiarrea"])
-    if respuestas_obj.get("enfermedadCronica"):
-        recomendaciones.extend(reglas["enfermedadCronica"])
-
-    if embarazada:
-        notas.append("Si estás embarazada, evita automedicarte; prioriza paracetamol y consulta si persisten los síntomas.")
-    if isinstance(edad, int) and edad >= 65:
-        notas.append("Mayor de 65 años: vigila hidratación y temperatura; consulta si hay empeoramiento.")
-    if any(c in comorbilidades for c in ["asma", "epoc", "cardiopatía", "cardiopatia", "diabetes"]):
-        notas.append("Con comorbilidades, controla síntomas de cerca y consulta si no mejoran.")
-
-    if not recomendaciones:
-        recomendaciones.append("Descansa, hidrátate y observa la evolución por 24–48 h.")
-        recomendaciones.append("Si los síntomas persisten o empeoran, agenda una consulta.")
-
-    recomendaciones.append("Si aparecen señales de alarma (disnea, dolor torácico intenso, confusión, desmayo), acude a urgencias.")
-
-    def uniq(seq):
-        seen, out = set(), []
-        for x in seq:
-            if x not in seen:
-                out.append(x); seen.add(x)
-        return out
-
-    return Response({
-        "recomendaciones": uniq(recomendaciones),
-        "notas": uniq(notas)
-    }, status=200)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -217,31 +211,23 @@ def crear_sesion_triaje(request):
     """
     Registra una sesión de triaje.
     Body:
-      - respuestas (dict) [obligatorio]
+      - respuestas (dict) [obligatorio, salvo que venga borrador_id]
+      - borrador_id (str) [opcional] -> usa y descarta el borrador de guardar-parcial
       - urgente (bool)    [opcional] -> si no viene, se calcula
       - score (int)       [opcional] -> si no viene, se calcula
       - recomendaciones (list[str]) [opcional]
     """
     data = request.data or {}
-    respuestas = data.get('respuestas')
+    respuestas, error = _respuestas_de(request, data)
+    if error:
+        return error
     if not isinstance(respuestas, dict):
         return Response({"error": "Debe enviar 'respuestas' como objeto."}, status=400)
+    data['respuestas'] = respuestas
 
     # Recalcular si no se envía score/urgente
     if 'urgente' not in data or 'score' not in data:
-        ordered = [
-            respuestas.get('dificultadRespirar', False),
-            respuestas.get('dolorPecho', False),
-            respuestas.get('confusion', False),
-            respuestas.get('trauma', False),
-            respuestas.get('fiebreAlta', False),
-            respuestas.get('dolorIntenso', False),
-            respuestas.get('vomitosDiarrea', False),
-            respuestas.get('enfermedadCronica', False)
-        ]
-        pesos = [5, 5, 5, 3, 4, 5, 2, 1]
-        score = sum(p for r, p in zip(ordered, pesos) if r)
-        urgente = _es_urgencia_con_respuestas(respuestas)
+        score, urgente = evaluar(respuestas)
         data['score'] = score
         data['urgente'] = urgente
 
@@ -251,43 +237,228 @@ def crear_sesion_triaje(request):
     ser = SesionTriajeCreateSerializer(data=data)
     ser.is_valid(raise_exception=True)
     sesion = ser.save()
+    if 'borrador_id' in data:
+        descartar_borrador(data['borrador_id'])
     return Response(SesionTriajeSerializer(sesion).data, status=201)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def crear_sesiones_lote(request):
+    """
+    Carga masiva de sesiones de triaje (kioscos que sincronizan sin conexión).
+    Body: {"sesiones": [{"respuestas": {...}, "usuario"?: id, "urgente"?: bool,
+                         "score"?: int, "recomendaciones"?: [...]}, ...]}
+    Sin 'usuario' se asocia el usuario autenticado; sin score/urgente se calculan.
+    Devuelve un resultado por fila: creada (con id, urgente y score) o invalida (con errores).
+    """
+    filas = request.data.get('sesiones') if isinstance(request.data, dict) else None
+    if not isinstance(filas, list) or not filas:
+        return Response({"error": "Debe enviar 'sesiones' como una lista no vacía."}, status=400)
+    if len(filas) > LOTE_MAX:
+        return Response({"error": f"El lote no puede superar {LOTE_MAX} sesiones."}, status=400)
+
+    resultados = crear_sesiones_en_lote(filas, usuario_id=getattr(request.user, 'id', None))
+    resumen = {
+        "creadas": sum(r["estado"] == "creada" for r in resultados),
+        "invalidas": sum(r["estado"] == "invalida" for r in resultados),
+    }
+    return Response({**resumen, "resultados": resultados}, status=201 if resumen["creadas"] else 400)
+
+
+def _filas_csv_sesiones(qs, columnas):
+    """Tuplas para el CSV: fecha en hora local y los campos JSON como texto JSON."""
+    i_fecha = columnas.index('creado_en')
+    i_json = [i for i, c in enumerate(columnas) if c in CAMPOS_OMITIBLES]
+    for fila in qs.values_list(*columnas).iterator(chunk_size=CHUNK_STREAM):
+        fila = list(fila)
+        fila[i_fecha] = timezone.localtime(fila[i_fecha]).isoformat(sep=' ', timespec='seconds')
+        for i in i_json:
+            fila[i] = json.dumps(fila[i], ensure_ascii=False)
+        yield fila
+
+
+def _filtros_sesiones(params):
+    """
+    Filtros comunes de listar_sesiones y del archivo (ver sus docstrings).
+    Devuelve un dict con los valores ya validados; ValueError con el mensaje si alguno es inválido.
+    """
+    uid = params.get('usuario_id')
+    urgente = params.get('urgente')
+    sintomas = params.get('sintomas')
+    sintomas_modo = params.get('sintomas_modo', 'todos')
+    desde = params.get('desde')
+    hasta = params.get('hasta')
+
+    filtros = {
+        'usuario_id': None,
+        'urgente': (urgente == 'true') if urgente in ('true', 'false') else None,
+        'mascaras': None,
+        'excluir': [c for c in params.get('sin', '').split(',') if c],
+    }
+    if uid:
+        try:
+            filtros['usuario_id'] = int(uid)
+        except ValueError:
+            raise ValueError("usuario_id debe ser un entero.")
+    if sintomas:
+        if sintomas_modo not in ('todos', 'alguno'):
+            raise ValueError("sintomas_modo debe ser 'todos' o 'alguno'.")
+        requerida = mascara_de_claves(c for c in sintomas.split(',') if c)
+        filtros['mascaras'] = mascaras_con(requerida, todos=(sintomas_modo == 'todos'))
+    try:
+        filtros['desde'] = datetime.strptime(desde, "%Y-%m-%d").date() if desde else None
+        filtros['hasta'] = datetime.strptime(hasta, "%Y-%m-%d").date() if hasta else None
+    except ValueError:
+        raise ValueError("Formato de fecha inválido. Usa YYYY-MM-DD.")
+    if any(c not in CAMPOS_OMITIBLES for c in filtros['excluir']):
+        raise ValueError(f"'sin' admite solo: {', '.join(CAMPOS_OMITIBLES)}.")
+    return filtros
+
+
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def listar_sesiones(request):
     """
     ADMIN: lista sesiones con filtros opcionales:
       ?usuario_id=...  ?desde=YYYY-MM-DD  ?hasta=YYYY-MM-DD  ?urgente=true/false
+      ?sintomas=dolorPecho,trauma [&sintomas_modo=todos|alguno]  (columna `mascara` indexada)
+    Omitir campos pesados: ?sin=respuestas,recomendaciones
+    Modos:
+      ?limite=N&cursor=...   -> página por cursor sobre (creado_en, id), más recientes primero
+      ?formato=ndjson|csv    -> exportación completa en streaming (sin tope de filas)
+      sin parámetros         -> las 500 más recientes (compatibilidad)
+    Solo la tabla caliente: lo archivado se lee en /sesiones/archivo/.
     """
+    try:
+        filtros = _filtros_sesiones(request.GET)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    formato = request.GET.get('formato')
+    excluir = filtros['excluir']
+
     qs = SesionTriaje.objects.all()
+    if filtros['usuario_id'] is not None:
+        qs = qs.filter(usuario_id=filtros['usuario_id'])
+    if filtros['urgente'] is not None:
+        qs = qs.filter(urgente=filtros['urgente'])
+    if filtros['mascaras'] is not None:
+        # IN sobre las máscaras que cumplen: seek por índice en vez de leer el JSON de cada fila
+        qs = qs.filter(mascara__in=filtros['mascaras'])
+    # Rango semiabierto sobre límites de día locales (usa índices, a diferencia de __date)
+    qs = qs.filter(**filtro_rango_dias('creado_en', filtros['desde'], filtros['hasta'])).order_by(*ORDEN_SESIONES)
+    if excluir:
+        qs = qs.defer(*excluir)  # ni siquiera se leen de la BD
+
+    if formato == 'csv':
+        columnas = [c for c in COLUMNAS_CSV if c not in excluir]
+        return respuesta_csv_streaming(_filas_csv_sesiones(qs, columnas), columnas, 'sesiones_triaje.csv')
+    if formato == 'ndjson':
+        return respuesta_ndjson_streaming(
+            qs, lambda bloque: SesionTriajeSerializer(bloque, many=True, excluir=excluir).data,
+            nombre_archivo='sesiones_triaje.ndjson'
+        )
+    if formato:
+        return Response({"error": "Formato inválido. Usa 'ndjson' o 'csv'."}, status=400)
+
+    if 'limite' in request.GET or 'cursor' in request.GET:
+        try:
+            limite = parsear_limite(request.GET.get('limite'))
+            filas, siguiente = paginar_keyset(qs, ORDEN_SESIONES, request.GET.get('cursor'), limite)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        return Response({
+            "resultados": SesionTriajeSerializer(filas, many=True, excluir=excluir).data,
+            "siguiente": siguiente
+        }, status=200)
+
+    data = SesionTriajeSerializer(qs[:500], many=True, excluir=excluir).data
+    return Response(data, status=200)
 
-    uid = request.GET.get('usuario_id')
-    desde = request.GET.get('desde')
-    hasta = request.GET.get('hasta')
-    urgente = request.GET.get('urgente')
 
-    if uid:
-        qs = qs.filter(usuario_id=uid)
-    if urgente in ('true', 'false'):
-        qs = qs.filter(urgente=(urgente == 'true'))
-    if desde:
-        qs = qs.filter(creado_en__date__gte=datetime.strptime(desde, "%Y-%m-%d").date())
-    if hasta:
-        qs = qs.filter(creado_en__date__lte=datetime.strptime(hasta, "%Y-%m-%d").date())
-
-    data = SesionTriajeSerializer(qs[:500], many=True).data
-    return Response(data, status=200)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def listar_sesiones_archivadas(request):
+    """
+    ADMIN (solo lectura): sesiones movidas al archivo (ver chatbot/archivo.py), como
+    NDJSON en streaming y en orden de archivo. Mismos filtros que /sesiones/listar/
+    (?desde ?hasta ?usuario_id ?urgente ?sintomas ?sintomas_modo ?sin); el rango de
+    fechas descarta segmentos completos sin descomprimirlos.
+    """
+    try:
+        filtros = _filtros_sesiones(request.GET)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    mascaras = set(filtros['mascaras']) if filtros['mascaras'] is not None else None
+
+    def cumple(fila):
+        return (
+            (filtros['usuario_id'] is None or fila['usuario'] == filtros['usuario_id'])
+            and (filtros['urgente'] is None or fila['urgente'] == filtros['urgente'])
+            and (mascaras is None or fila['mascara'] in mascaras)
+        )
+
+    def serializar(bloque):
+        for fila in bloque:
+            for campo in filtros['excluir']:
+                fila.pop(campo, None)
+        return bloque
+
+    # ⚠️ Los segmentos faltantes o dañados se detectan antes de empezar el streaming (no a la mitad)
+    try:
+        archivadas = leer_archivo(filtros['desde'], filtros['hasta'])
+    except ArchivoIncompleto as e:
+        return Response(
+            {"error": "El archivo de sesiones está incompleto.", "faltantes": e.faltantes, "corruptos": e.corruptos},
+            status=500,
+        )
+    filas = (fila for fila in archivadas if cumple(fila))
+    return respuesta_ndjson_streaming(filas, serializar, nombre_archivo='sesiones_triaje_archivo.ndjson')
 
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def contar_sesiones(request):
     """
-    ADMIN: conteo global de sesiones.
+    ADMIN: conteo global de sesiones (contadores incrementales, ver chatbot/contadores.py).
     """
-    total = SesionTriaje.objects.count()
-    urg = SesionTriaje.objects.filter(urgente=True).count()
-    no_urg = total - urg
-    return Response({"total": total, "urgentes": urg, "no_urgentes": no_urg}, status=200)
\ No newline at end of file
+    return Response(leer_contadores(), status=200)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def analitica_sesiones(request):
+    """
+    ADMIN: volumen, proporción de urgentes, puntaje medio e histograma de puntajes por bucket.
+      ?desde=YYYY-MM-DD  ?hasta=YYYY-MM-DD  (por defecto, los últimos 30 días)
+      ?granularidad=dia|hora  (por defecto dia)
+      ?histogramas=true  (histograma de puntajes también por bucket)
+    Lee los resúmenes por hora/día (chatbot/resumenes.py), no recorre SesionTriaje.
+    """
+    granularidad = request.GET.get('granularidad', 'dia')
+    if granularidad not in DIAS_MAX_ANALITICA:
+        return Response({"error": "La granularidad debe ser 'dia' u 'hora'."}, status=400)
+    try:
+        hasta = datetime.strptime(request.GET['hasta'], "%Y-%m-%d").date() if request.GET.get('hasta') else timezone.localdate()
+        desde = datetime.strptime(request.GET['desde'], "%Y-%m-%d").date() if request.GET.get('desde') else hasta - timedelta(days=29)
+    except ValueError:
+        return Response({"error": "Formato de fecha inválido. Usa YYYY-MM-DD."}, status=400)
+    if desde > hasta:
+        return Response({"error": "'desde' no puede ser posterior a 'hasta'."}, status=400)
+    if (hasta - desde).days >= DIAS_MAX_ANALITICA[granularidad]:
+        return Response(
+            {"error": f"El rango por {granularidad} no puede superar {DIAS_MAX_ANALITICA[granularidad]} días."},
+            status=400
+        )
+
+    datos = analitica(
+        desde, hasta,
+        por_hora=granularidad == 'hora',
+        histogramas=request.GET.get('histogramas') == 'true'
+    )
+    return Response({
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "granularidad": granularidad,
+        **datos,
+    }, status=200)
@@ -0,0 +1,96 @@
+"""
+Soporte para vistas async nativas (ASGI).
+
+DRF 3.16 no ejecuta vistas `async def`: bajo ASGI cada `@api_view` ocupa un hilo
+(sync_to_async) durante todo el viaje al ORM. Algunas rutas de agenda tienen además
+una versión `async def` de Django puro con el mismo contrato que la vista DRF.
+Son opcionales: las urls solo las enrutan con AGENDA_VISTAS_ASYNC activo (por
+defecto no, también bajo ASGI).
+
+La autenticación, los permisos y el parseo del cuerpo no se reimplementan: `api_async`
+corre las clases configuradas en REST_FRAMEWORK (DEFAULT_AUTHENTICATION_CLASSES,
+DEFAULT_PERMISSION_CLASSES, DEFAULT_PARSER_CLASSES) sobre una `Request` de DRF, con
+los mismos errores y cabeceras que `APIView`.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def respuesta_json(data, status=status.HTTP_200_OK):
+    """JsonResponse con el mismo encoder que DRF (fechas, decimales, lazies)."""
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False, json_dumps_params={'ensure_ascii': False})
+
+
+def como_json(respuesta):
+    """Convierte una `Response` de DRF (p. ej. un error de un helper compartido) en JsonResponse."""
+    convertida = respuesta_json(respuesta.data, status=respuesta.status_code)
+    for cabecera, valor in respuesta.items():  # p. ej. Retry-After
+        if cabecera.lower() != 'content-type':
+            convertida[cabecera] = valor
+    return convertida
+
+
+def _detalle(excepcion):
+    return respuesta_json({"detail": excepcion.detail}, status=excepcion.status_code)
+
+
+def _preparar(request):
+    """
+    Autentica, verifica permisos y parsea el cuerpo con las clases de DRF (como `APIView.initial`).
+    Devuelve (usuario, datos, None) o (None, None, respuesta de error). Sync: puede ir a la BD.
+    """
+    drf = Request(
+        request,
+        parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+        authenticators=[autenticador() for autenticador in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+    )
+    try:
+        drf.user  # noqa: B018  (dispara la autenticación)
+        for permiso in (clase() for clase in api_settings.DEFAULT_PERMISSION_CLASSES):
+            if not permiso.has_permission(drf, None):
+                if drf.authenticators and not drf.successful_authenticator:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(getattr(permiso, 'message', None))
+        datos = drf.data
+    except exceptions.APIException as e:
+        respuesta = _detalle(e)
+        if isinstance(e, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            # Igual que APIView.handle_exception: 401 con WWW-Authenticate del primer autenticador
+            cabecera = drf.authenticators[0].authenticate_header(drf) if drf.authenticators else None
+            if cabecera:
+                respuesta['WWW-Authenticate'] = cabecera
+            else:
+                respuesta.status_code = status.HTTP_403_FORBIDDEN
+        return None, None, respuesta
+    return drf.user, datos, None
+
+
+def api_async(metodos):
+    """
+    Decorador para vistas `async def` con el contrato de `@api_view(metodos)` y la
+    configuración de REST_FRAMEWORK: 405 si el método no corresponde, autenticación y
+    permisos por defecto de DRF, y `request.user` / `request.data` como en DRF.
+    """
+    def decorador(vista):
+        @csrf_exempt
+        @wraps(vista)
+        async def envoltura(request, *args, **kwargs):
+            if request.method not in metodos:
+                respuesta = _detalle(exceptions.MethodNotAllowed(request.method))
+                respuesta['Allow'] = ', '.join(metodos)
+                return respuesta
+
+            usuario, datos, error = await sync_to_async(_preparar)(request)
+            if error:
+                return error
+            request.user, request.data = usuario, datos
+            return await vista(request, *args, **kwargs)
+        return envoltura
+    return decorador
@@ -0,0 +1,34 @@
+"""
+Respuestas JSON precalculadas para contenido estático, con caché HTTP.
+
+El cuerpo se serializa una sola vez (al importar) y su ETag fuerte es un hash del
+contenido: cambia solo si cambia el contenido, así que el cliente puede guardar la
+respuesta y revalidar con If-None-Match, que se responde con 304 sin volver a
+enviar el cuerpo. La vista pasa por DRF (autenticación y permisos por defecto),
+por eso la caché es `private`: la revalidación funciona igual con token.
+"""
+import hashlib
+import json
+
+from django.http import HttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from rest_framework.decorators import api_view
+
+
+class ContenidoVersionado:
+    """Payload JSON fijo; `version` (prefijo del hash) se incluye en el cuerpo y es el ETag."""
+
+    def __init__(self, data):
+        version = hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False).encode()).hexdigest()[:16]
+        self.version = version
+        self.cuerpo = json.dumps({"version": version, **data}, ensure_ascii=False).encode()
+
+    def vista(self, max_age):
+        """Vista GET/HEAD autenticada: 200 con el payload o 304 si el ETag coincide."""
+        @api_view(['GET', 'HEAD'])
+        @cache_control(private=True, max_age=max_age)  # también en los 304
+        @condition(etag_func=lambda request: self.version)
+        def servir(request):
+            return HttpResponse(self.cuerpo, content_type='application/json; charset=utf-8')
+        return servir
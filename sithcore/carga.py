@@ -0,0 +1,282 @@
+"""
+Generación de carga en proceso contra los handlers reales de Django (WSGI y ASGI).
+
+Las peticiones pasan por `WSGIHandler` / `ASGIHandler` con la URL conf y middleware
+reales, sin servidor ni sockets de por medio: lo medido es el costo de Django + ORM.
+Los clientes son de lazo cerrado (cada uno envía la siguiente petición al recibir la
+respuesta anterior); en WSGI las peticiones esperan un hilo libre del pool, como en un
+servidor con N hilos (p. ej. gunicorn --threads), y esa espera cuenta en la latencia.
+
+Cada petición cuenta además sus queries SQL (con un execute_wrapper en cada conexión y
+una ContextVar que sigue a la petición a través de sync_to_async), sin depender de DEBUG.
+
+Con escrituras concurrentes la BD de prueba debe ir en archivo (`bd_de_carga`): la de
+memoria de SQLite comparte cache entre hilos y responde "database table is locked"
+sin esperar, y esos 500 se medirían como errores del endpoint.
+"""
+import asyncio
+import importlib
+import json
+import math
+import statistics
+import tempfile
+import time as _time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncRequestFactory, RequestFactory
+from django.test.utils import override_settings
+from django.urls import clear_url_caches
+
+
+HOST = 'localhost'  # permitido en ALLOWED_HOSTS (a diferencia de 'testserver' fuera de los tests)
+
+
+_queries_peticion = ContextVar('queries_peticion', default=None)
+
+
+@contextmanager
+def bd_de_carga(espera=30):
+    """
+    BD de prueba para carga con escrituras concurrentes. En SQLite va en un archivo
+    temporal con WAL (lectores no bloquean al escritor), `timeout` como busy timeout y
+    transacciones BEGIN IMMEDIATE (sin deadlocks al pasar de lectura a escritura):
+    los escritores concurrentes esperan su turno en vez de fallar.
+    """
+    ajustes = connection.settings_dict
+    previos = ajustes.get('TEST', {}), ajustes.get('OPTIONS', {})
+    directorio = tempfile.TemporaryDirectory() if connection.vendor == 'sqlite' else None
+    if directorio:
+        ajustes['TEST'] = {**previos[0], 'NAME': str(Path(directorio.name) / 'carga.sqlite3')}
+        ajustes['OPTIONS'] = {
+            **previos[1], 'timeout': espera, 'transaction_mode': 'IMMEDIATE', 'init_command': 'PRAGMA journal_mode=WAL;',
+        }
+    nombre = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(nombre, verbosity=0)
+        ajustes['TEST'], ajustes['OPTIONS'] = previos
+        if directorio:
+            directorio.cleanup()
+
+
+def _contar_query(execute, sql, params, many, context):
+    contador = _queries_peticion.get()
+    if contador is not None:
+        contador[0] += 1
+    return execute(sql, params, many, context)
+
+
+def _instalar_contador(sender=None, connection=None, **kwargs):
+    if _contar_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_contar_query)
+
+
+def _contar_queries():
+    """Activa el conteo en las conexiones actuales y en las que se abran después."""
+    connection_created.connect(_instalar_contador, dispatch_uid='carga_contar_queries')
+    for conexion in connections.all(initialized_only=True):
+        _instalar_contador(connection=conexion)
+
+
+def _cuerpo(datos):
+    return json.dumps(datos) if datos is not None else ''
+
+
+def peticion_wsgi(handler, metodo, ruta, datos=None, headers=None):
+    """
+    Ejecuta una petición en `handler` (WSGIHandler).
+    Devuelve (status, cuerpo en bytes, queries ejecutadas).
+    """
+    environ = RequestFactory().generic(
+        metodo, ruta, _cuerpo(datos), content_type='application/json', headers=headers, SERVER_NAME=HOST
+    ).environ
+    estado, queries = [], [0]
+    marca = _queries_peticion.set(queries)
+    try:
+        partes = handler(environ, lambda status, cabeceras, exc_info=None: estado.append(status))
+        try:
+            cuerpo = b''.join(partes)
+        finally:
+            if hasattr(partes, 'close'):
+                partes.close()
+    finally:
+        _queries_peticion.reset(marca)
+    return int(estado[0].split()[0]), cuerpo, queries[0]
+
+
+async def peticion_asgi(handler, metodo, ruta, datos=None, headers=None):
+    """
+    Ejecuta una petición en `handler` (ASGIHandler).
+    Devuelve (status, cuerpo en bytes, queries ejecutadas).
+    """
+    cuerpo = _cuerpo(datos).encode()
+    scope = AsyncRequestFactory().generic(
+        metodo, ruta, cuerpo, content_type='application/json', headers=headers
+    ).scope
+    scope['headers'] = [(k, v) for k, v in scope['headers'] if k != b'host'] + [(b'host', HOST.encode())]
+    terminada = asyncio.Event()
+    enviado = False
+    mensajes = []
+
+    async def receive():
+        nonlocal enviado
+        if not enviado:
+            enviado = True
+            return {'type': 'http.request', 'body': cuerpo, 'more_body': False}
+        # Django escucha desconexiones mientras corre la vista: el cliente nunca corta antes
+        await terminada.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(mensaje):
+        mensajes.append(mensaje)
+        if mensaje['type'] == 'http.response.body' and not mensaje.get('more_body'):
+            terminada.set()
+
+    queries = [0]
+    marca = _queries_peticion.set(queries)  # sync_to_async copia el contexto al hilo de la vista
+    try:
+        await handler(scope, receive, send)
+    finally:
+        _queries_peticion.reset(marca)
+    estado = next(m['status'] for m in mensajes if m['type'] == 'http.response.start')
+    cuerpo = b''.join(m.get('body', b'') for m in mensajes if m['type'] == 'http.response.body')
+    return estado, cuerpo, queries[0]
+
+
+def percentil(valores, p):
+    """Percentil `p` (0–100) por rango más cercano; valores ya ordenados."""
+    if not valores:
+        return 0.0
+    k = math.ceil(p / 100 * len(valores)) - 1
+    return valores[max(0, min(k, len(valores) - 1))]
+
+
+def _json(cuerpo):
+    try:
+        return json.loads(cuerpo)
+    except ValueError:
+        return None
+
+
+async def _lazo_cerrado(enviar, iteraciones, concurrencia, pasos):
+    """
+    `concurrencia` clientes reparten `iteraciones` del flujo `pasos`, una lista de
+    (nombre, generar). `generar(n, previa)` devuelve (metodo, ruta, datos, headers) del
+    paso para la n-ésima iteración; `previa` es el JSON de la respuesta del paso anterior.
+    Si un paso falla (status >= 400) el resto de esa iteración se omite.
+    Devuelve ({nombre: (latencias_ms, errores, queries)}, segundos).
+    """
+    medidas = {nombre: ([], [], []) for nombre, _ in pasos}
+    restantes = iter(range(iteraciones))
+
+    async def cliente():
+        for n in restantes:
+            previa = None
+            for i, (nombre, generar) in enumerate(pasos):
+                latencias, errores, queries = medidas[nombre]
+                t0 = _time.perf_counter()
+                estado, cuerpo, n_queries = await enviar(*generar(n, previa))
+                latencias.append((_time.perf_counter() - t0) * 1000)
+                queries.append(n_queries)
+                if estado >= 400:
+                    errores.append(estado)
+                    break
+                if i + 1 < len(pasos):
+                    previa = _json(cuerpo)
+
+    t0 = _time.perf_counter()
+    await asyncio.gather(*(cliente() for _ in range(concurrencia)))
+    return medidas, _time.perf_counter() - t0
+
+
+def resumir(latencias, errores, queries, segundos):
+    latencias = sorted(latencias)
+    return {
+        "peticiones": len(latencias),
+        "rps": len(latencias) / segundos if segundos else 0.0,
+        "p50_ms": percentil(latencias, 50),
+        "p95_ms": percentil(latencias, 95),
+        "p99_ms": percentil(latencias, 99),
+        "media_ms": statistics.fmean(latencias) if latencias else 0.0,
+        "errores": len(errores),
+        "estados_error": dict(Counter(str(estado) for estado in errores)),
+        "queries_media": statistics.fmean(queries) if queries else 0.0,
+        "queries_max": max(queries, default=0),
+    }
+
+
+def _resumir_flujo(medidas, segundos):
+    return {nombre: resumir(*medida, segundos) for nombre, medida in medidas.items()}
+
+
+def _en_wsgi(hilos, ejecutar):
+    handler = WSGIHandler()
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        async def enviar(*peticion):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(pool, peticion_wsgi, handler, *peticion)
+        return asyncio.run(ejecutar(enviar))
+
+
+def _en_asgi(ejecutar):
+    handler = ASGIHandler()
+
+    async def enviar(*peticion):
+        return await peticion_asgi(handler, *peticion)
+
+    return asyncio.run(ejecutar(enviar))
+
+
+def flujo_wsgi(pasos, iteraciones, concurrencia, hilos=32):
+    """Flujo de varios pasos (ver `_lazo_cerrado`) contra WSGI. Devuelve {paso: resumen}."""
+    _contar_queries()
+    return _resumir_flujo(*_en_wsgi(hilos, lambda enviar: _lazo_cerrado(enviar, iteraciones, concurrencia, pasos)))
+
+
+def flujo_asgi(pasos, iteraciones, concurrencia):
+    """Flujo de varios pasos (ver `_lazo_cerrado`) contra ASGI. Devuelve {paso: resumen}."""
+    _contar_queries()
+    return _resumir_flujo(*_en_asgi(lambda enviar: _lazo_cerrado(enviar, iteraciones, concurrencia, pasos)))
+
+
+def carga_wsgi(generar, peticiones, concurrencia, hilos=32):
+    """
+    Carga contra un `WSGIHandler` servido por un pool de `hilos`.
+    `generar(n)` devuelve (metodo, ruta, datos, headers) de la n-ésima petición.
+    """
+    return flujo_wsgi([('', lambda n, previa: generar(n))], peticiones, concurrencia, hilos)['']
+
+
+def carga_asgi(generar, peticiones, concurrencia):
+    """Carga contra un `ASGIHandler` en un event loop (las vistas sync usan sync_to_async)."""
+    return flujo_asgi([('', lambda n, previa: generar(n))], peticiones, concurrencia)['']
+
+
+def _recargar_urls():
+    import agendamiento.urls
+    import sithcore.urls
+
+    importlib.reload(agendamiento.urls)
+    importlib.reload(sithcore.urls)
+    clear_url_caches()
+
+
+@contextmanager
+def vistas_async(activas):
+    """Enruta las vistas DRF (sync) o las async nativas, como lo haría AGENDA_VISTAS_ASYNC."""
+    try:
+        with override_settings(AGENDA_VISTAS_ASYNC=activas):
+            _recargar_urls()
+            yield
+    finally:
+        _recargar_urls()
@@ -0,0 +1,29 @@
+"""
+Límites de día en zona horaria local para filtros por fecha "sargables".
+
+Filtrar con `campo__date__gte` envuelve la columna en una función de fecha y
+la BD no puede usar índices; en su lugar se compara la columna contra instantes
+aware: [inicio del día `desde`, inicio del día siguiente a `hasta`).
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def inicio_dia_local(fecha, tz=None):
+    """Instante aware de las 00:00 locales de `fecha`."""
+    tz = tz or timezone.get_current_timezone()
+    return timezone.make_aware(datetime.combine(fecha, time.min), tz)
+
+
+def filtro_rango_dias(campo, desde=None, hasta=None):
+    """
+    kwargs de filtro para `desde <= fecha local(campo) <= hasta` como rango semiabierto:
+    {campo__gte: inicio(desde), campo__lt: inicio(hasta + 1 día)}.
+    """
+    filtro = {}
+    if desde:
+        filtro[f'{campo}__gte'] = inicio_dia_local(desde)
+    if hasta:
+        filtro[f'{campo}__lt'] = inicio_dia_local(hasta + timedelta(days=1))
+    return filtro
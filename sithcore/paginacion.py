@@ -0,0 +1,209 @@
+"""
+Utilidades compartidas de paginación por cursor (keyset) y respuestas JSON en streaming.
+
+El cursor codifica los valores de las columnas de orden de la última fila entregada
+(p. ej. `(fecha_hora, id)`), por lo que es estable aunque se inserten filas nuevas
+y cada página es un seek por índice en vez de un OFFSET creciente.
+"""
+import base64
+import csv
+import json
+from itertools import islice
+
+from django.db.models import Q, QuerySet
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 500
+CHUNK_STREAM = 500
+
+
+def codificar_cursor(valores):
+    crudo = json.dumps(list(valores), cls=JSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, modelo, campos):
+    """Devuelve los valores tipados del cursor; lanza ValueError si es inválido."""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except (ValueError, TypeError):
+        raise ValueError("Cursor inválido.")
+    if not isinstance(valores, list) or len(valores) != len(campos):
+        raise ValueError("Cursor inválido.")
+    try:
+        tipados = [
+            modelo._meta.get_field(campo.lstrip('-')).to_python(valor)
+            for campo, valor in zip(campos, valores)
+        ]
+    except Exception:
+        raise ValueError("Cursor inválido.")
+    # Las columnas de orden no admiten NULL: un null solo puede venir de un cursor adulterado
+    if any(valor is None for valor in tipados):
+        raise ValueError("Cursor inválido.")
+    return tipados
+
+
+def _filtro_despues_de(campos, valores):
+    """
+    Condición "fila > cursor" para un orden compuesto:
+    (a > va) OR (a = va AND b > vb) OR ...   ('-campo' invierte el sentido).
+    """
+    condicion = Q()
+    iguales = {}
+    for campo, valor in zip(campos, valores):
+        nombre = campo.lstrip('-')
+        op = 'lt' if campo.startswith('-') else 'gt'
+        condicion |= Q(**iguales, **{f'{nombre}__{op}': valor})
+        iguales[nombre] = valor
+    return condicion
+
+
+def parsear_limite(valor, por_defecto=LIMITE_POR_DEFECTO, maximo=LIMITE_MAXIMO):
+    """Convierte ?limite= a entero acotado; lanza ValueError si no es un entero positivo."""
+    if valor in (None, ''):
+        return por_defecto
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        limite = 0
+    if limite < 1:
+        raise ValueError("El límite debe ser un entero positivo.")
+    return min(limite, maximo)
+
+
+def _pagina_keyset(qs, campos, cursor, limite):
+    qs = qs.order_by(*campos)
+    if cursor:
+        valores = decodificar_cursor(cursor, qs.model, campos)
+        qs = qs.filter(_filtro_despues_de(campos, valores))
+    return qs[:limite + 1]
+
+
+def _cortar_pagina(filas, campos, limite):
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        siguiente = codificar_cursor(getattr(ultima, c.lstrip('-')) for c in campos)
+    return filas, siguiente
+
+
+def paginar_keyset(qs, campos, cursor=None, limite=LIMITE_POR_DEFECTO):
+    """
+    Devuelve (filas, siguiente_cursor) ordenando `qs` por `campos`.
+    El último campo debe ser único (normalmente 'id') para que el orden sea total.
+    """
+    filas = list(_pagina_keyset(qs, campos, cursor, limite))
+    return _cortar_pagina(filas, campos, limite)
+
+
+async def apaginar_keyset(qs, campos, cursor=None, limite=LIMITE_POR_DEFECTO):
+    """Versión async (ORM async) de `paginar_keyset`."""
+    filas = [fila async for fila in _pagina_keyset(qs, campos, cursor, limite)]
+    return _cortar_pagina(filas, campos, limite)
+
+
+def _en_bloques(iterable, tamano):
+    it = iter(iterable)
+    while True:
+        bloque = list(islice(it, tamano))
+        if not bloque:
+            return
+        yield bloque
+
+
+async def _en_bloques_async(iterable, tamano):
+    bloque = []
+    async for fila in iterable:
+        bloque.append(fila)
+        if len(bloque) == tamano:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def respuesta_json_streaming(qs, serializar, chunk_size=CHUNK_STREAM):
+    """
+    Respuesta con un arreglo JSON escrito fila a fila desde `qs.iterator(chunk_size)`.
+    `serializar(lista_de_objetos)` debe devolver la lista de dicts de ese bloque,
+    así nunca se mantiene el resultado completo en memoria.
+    """
+    encoder = JSONEncoder(ensure_ascii=False)
+
+    def generar():
+        yield '['
+        primero = True
+        for bloque in _en_bloques(qs.iterator(chunk_size=chunk_size), chunk_size):
+            for fila in serializar(bloque):
+                yield encoder.encode(fila) if primero else ',' + encoder.encode(fila)
+                primero = False
+        yield ']'
+
+    return StreamingHttpResponse(generar(), content_type='application/json')
+
+
+def respuesta_json_streaming_async(qs, serializar, chunk_size=CHUNK_STREAM):
+    """
+    Igual que `respuesta_json_streaming` pero con un iterador async (`qs.aiterator`),
+    para servirse desde vistas ASGI sin bloquear el event loop.
+    """
+    encoder = JSONEncoder(ensure_ascii=False)
+
+    async def generar():
+        yield '['
+        primero = True
+        async for bloque in _en_bloques_async(qs.aiterator(chunk_size=chunk_size), chunk_size):
+            for fila in serializar(bloque):
+                yield encoder.encode(fila) if primero else ',' + encoder.encode(fila)
+                primero = False
+        yield ']'
+
+    return StreamingHttpResponse(generar(), content_type='application/json')
+
+
+def _adjunto(respuesta, nombre_archivo):
+    if nombre_archivo:
+        respuesta['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    return respuesta
+
+
+def respuesta_ndjson_streaming(qs, serializar, chunk_size=CHUNK_STREAM, nombre_archivo=None):
+    """
+    Exportación NDJSON (un objeto JSON por línea) desde `qs.iterator(chunk_size)`, o
+    desde cualquier iterable de filas. `serializar` como en `respuesta_json_streaming`;
+    se emite un trozo por bloque.
+    """
+    encoder = JSONEncoder(ensure_ascii=False)
+    filas = qs.iterator(chunk_size=chunk_size) if isinstance(qs, QuerySet) else qs
+
+    def generar():
+        for bloque in _en_bloques(filas, chunk_size):
+            yield ''.join(encoder.encode(fila) + '\n' for fila in serializar(bloque))
+
+    return _adjunto(StreamingHttpResponse(generar(), content_type='application/x-ndjson'), nombre_archivo)
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de acumularla."""
+
+    def write(self, valor):
+        return valor
+
+
+def respuesta_csv_streaming(filas, encabezado, nombre_archivo=None, chunk_size=CHUNK_STREAM):
+    """
+    Exportación CSV por bloques de `chunk_size` filas; `filas` es un iterable de
+    tuplas (p. ej. `qs.values_list(...).iterator(chunk_size)`) que nunca se materializa.
+    """
+    escritor = csv.writer(_Eco())
+
+    def generar():
+        yield escritor.writerow(encabezado)
+        for bloque in _en_bloques(filas, chunk_size):
+            yield ''.join(escritor.writerow(fila) for fila in bloque)
+
+    return _adjunto(StreamingHttpResponse(generar(), content_type='text/csv; charset=utf-8'), nombre_archivo)
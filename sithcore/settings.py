@@ -105,16 +105,22 @@ STATICFILES_DIRS = [
 # Llave primaria por defecto
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# Backend de autenticación
+# Backend de autenticación (ModelBackend con el hash de contraseñas en el pool acotado, ver usuarios/hashing.py)
 AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',
+    'usuarios.hashing.BackendPoolHash',
 ]
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        # TokenAuthentication con cache en memoria y tokens firmados "Bearer" (ver usuarios/autenticacion.py)
+        'usuarios.autenticacion.TokenCacheadoAuthentication',
+        'usuarios.autenticacion.TokenFirmadoAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ]
-}
\ No newline at end of file
+}
+
+# Vistas async nativas para disponibilidad, agendamiento rápido y listados de citas (opcional,
+# desactivado por defecto también bajo ASGI; ver sithcore/asincrono.py). Login y registro siempre usan DRF.
+AGENDA_VISTAS_ASYNC = os.environ.get('AGENDA_VISTAS_ASYNC') == '1'
@@ -0,0 +1,50 @@
+"""
+Arnés de presupuesto de queries para los tests de endpoints.
+
+Cada endpoint de listado declara un máximo de queries; el test falla si un cambio
+lo supera o si la cantidad de queries crece con el número de filas (N+1).
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def consumir(respuesta):
+    """Fuerza la evaluación completa de la respuesta (incluye respuestas en streaming)."""
+    if getattr(respuesta, 'streaming', False):
+        b''.join(respuesta.streaming_content)
+    return respuesta
+
+
+class PresupuestoQueriesMixin:
+    """
+    Mixin para `TestCase`.
+
+        self.assertPresupuestoQueries(3, lambda: self.client.get(url))
+        self.assertQueriesConstantes(3, lambda: self.client.get(url), sembrar=crear_n_filas)
+    """
+
+    def medir_queries(self, funcion):
+        with CaptureQueriesContext(connection) as ctx:
+            consumir(funcion())
+        return len(ctx), [q['sql'] for q in ctx.captured_queries]
+
+    def assertPresupuestoQueries(self, presupuesto, funcion, etiqueta=''):
+        n, sqls = self.medir_queries(funcion)
+        if n > presupuesto:
+            detalle = "\n".join(f"  {i}. {sql}" for i, sql in enumerate(sqls, 1))
+            self.fail(f"{etiqueta or 'endpoint'}: {n} queries, presupuesto {presupuesto}\n{detalle}")
+        return n
+
+    def assertQueriesConstantes(self, presupuesto, funcion, sembrar, tamanos=(1, 5, 20), etiqueta=''):
+        """
+        Llama a `sembrar(n)` para agregar filas hasta cada tamaño y mide `funcion`:
+        todas las mediciones deben respetar el presupuesto y ser iguales entre sí.
+        """
+        conteos, previo = [], 0
+        for tamano in tamanos:
+            sembrar(tamano - previo)
+            previo = tamano
+            conteos.append(self.assertPresupuestoQueries(presupuesto, funcion, etiqueta))
+        if len(set(conteos)) != 1:
+            self.fail(f"{etiqueta or 'endpoint'}: las queries crecen con las filas {dict(zip(tamanos, conteos))}")
+        return conteos[0]
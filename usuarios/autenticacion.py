@@ -0,0 +1,241 @@
+"""
+Autenticación por token con cache en memoria.
+
+`TokenAuthentication` hace un JOIN Token + Usuario en cada request autenticado antes
+de entrar a la vista. `TokenCacheadoAuthentication` guarda, por clave de token, una
+copia del usuario y del token (LRU con TTL) y solo consulta la BD si no están en memoria.
+
+- Invalidación inmediata dentro del proceso por señales (ver `usuarios/signals.py`):
+  guardar o eliminar el usuario (cambio de contraseña, `is_active`, datos del perfil)
+  y eliminar el token (logout) sacan sus entradas.
+- `ttl` acota la desincronización entre procesos (cada worker tiene su propia cache),
+  igual que el índice de disponibilidad; `QuerySet.update()` no dispara señales.
+- Cada request recibe su propia copia superficial: una vista que modifique
+  `request.user` no altera lo cacheado.
+
+Tokens de acceso firmados (opcionales, `Authorization: Bearer ...`): HMAC de
+`django.core.signing` sobre {usuario, versión} con marca de tiempo, así que la firma
+y la expiración se verifican sin BD. El usuario sale de la misma cache (clave
+`('usuario', id)`) y el token vale solo si su versión coincide con
+`Usuario.version_token`: logout y cambio de contraseña la suben y revocan todos
+los tokens firmados del usuario. Renovar (`renovar_token_acceso`) no escribe en la BD.
+Los `Token` de DRF siguen funcionando para los clientes antiguos.
+"""
+import copy
+import threading
+import time as _time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, TokenAuthentication, get_authorization_header
+
+from .models import Usuario
+
+SALT_ACCESO = 'usuarios.token-acceso'
+ACCESO_TTL = getattr(settings, 'AUTH_TOKEN_FIRMADO_TTL', 60 * 60)                  # vigencia de cada token
+RENOVACION_MAX = getattr(settings, 'AUTH_TOKEN_FIRMADO_RENOVACION', 7 * 24 * 3600)  # edad máxima para renovarlo
+
+
+class CacheTokens:
+    """
+    LRU {clave: (usuario, token, cargado_en)} con TTL e índice por usuario.
+    La clave es la de un `Token` de DRF, o `('usuario', id)` (sin token) para los firmados.
+    """
+
+    def __init__(self, max_tokens=10000, ttl=60):
+        self.max_tokens = max_tokens
+        self.ttl = ttl
+        self._tokens = OrderedDict()
+        self._por_usuario = {}          # usuario_id -> {claves}
+        self._lock = threading.Lock()
+        self._generacion = 0            # evita cachear cargas que compitieron con una invalidación
+
+    def obtener(self, clave):
+        """
+        Devuelve ((usuario, token), None) si la clave está vigente en memoria, o
+        (None, generacion) para pasarle a `guardar` tras cargarla desde la BD.
+        """
+        with self._lock:
+            entrada = self._tokens.get(clave)
+            if entrada is not None and (self.ttl is None or _time.monotonic() - entrada[2] < self.ttl):
+                self._tokens.move_to_end(clave)
+                usuario, token = copy.copy(entrada[0]), copy.copy(entrada[1])
+                if token is not None:
+                    token.user = usuario  # enlaza las copias (también `usuario.auth_token`)
+                return (usuario, token), None
+            return None, self._generacion
+
+    def guardar(self, clave, usuario, token, generacion):
+        with self._lock:
+            if generacion != self._generacion:
+                return
+            self._tokens[clave] = (copy.copy(usuario), copy.copy(token), _time.monotonic())
+            self._tokens.move_to_end(clave)
+            self._por_usuario.setdefault(usuario.pk, set()).add(clave)
+            while len(self._tokens) > self.max_tokens:
+                vieja, (u, _t, _c) = self._tokens.popitem(last=False)
+                self._quitar_del_indice(u.pk, vieja)
+
+    def _quitar_del_indice(self, usuario_id, clave):
+        claves = self._por_usuario.get(usuario_id)
+        if claves is not None:
+            claves.discard(clave)
+            if not claves:
+                del self._por_usuario[usuario_id]
+
+    def invalidar_token(self, clave):
+        with self._lock:
+            self._generacion += 1
+            entrada = self._tokens.pop(clave, None)
+            if entrada is not None:
+                self._quitar_del_indice(entrada[0].pk, clave)
+
+    def invalidar_usuario(self, usuario_id):
+        with self._lock:
+            self._generacion += 1
+            for clave in self._por_usuario.pop(usuario_id, ()):
+                self._tokens.pop(clave, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._generacion += 1
+            self._tokens.clear()
+            self._por_usuario.clear()
+
+
+cache_tokens = CacheTokens(
+    max_tokens=getattr(settings, 'AUTH_TOKEN_CACHE_MAX', 10000),
+    ttl=getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 60),
+)
+
+
+def invalidar_al_confirmar(invalidar, valor):
+    """Invalida ahora y de nuevo al confirmar la transacción (no recachear datos sin commit)."""
+    invalidar(valor)
+    transaction.on_commit(lambda: invalidar(valor))
+
+
+class TokenCacheadoAuthentication(TokenAuthentication):
+    """`TokenAuthentication` que resuelve las claves conocidas desde `cache_tokens`."""
+
+    def authenticate_credentials(self, key):
+        cacheado, generacion = cache_tokens.obtener(key)
+        if cacheado is not None:
+            return cacheado
+        usuario, token = super().authenticate_credentials(key)  # 401 si no existe o está inactivo
+        cache_tokens.guardar(key, usuario, token, generacion)
+        return usuario, token
+
+
+# --- Tokens de acceso firmados ---
+
+def emitir_token_acceso(usuario):
+    """Devuelve (token firmado, instante de expiración) para `usuario`, sin escribir en la BD."""
+    token = signing.dumps({'u': usuario.pk, 'v': usuario.version_token}, salt=SALT_ACCESO, compress=False)
+    return token, timezone.now() + timedelta(seconds=ACCESO_TTL)
+
+
+def _leer_token_acceso(valor, max_age):
+    """(usuario_id, versión) del token; AuthenticationFailed si la firma no es válida o expiró."""
+    try:
+        datos = signing.loads(valor, salt=SALT_ACCESO, max_age=max_age)
+        return int(datos['u']), int(datos['v'])
+    except signing.SignatureExpired:
+        raise exceptions.AuthenticationFailed("Token expirado.")
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+
+def _usuario_en_memoria(usuario_id, version):
+    """(usuario cacheado o None, generación para `_guardar_usuario`)."""
+    clave = ('usuario', usuario_id)
+    cacheado, generacion = cache_tokens.obtener(clave)
+    if cacheado is not None and cacheado[0].version_token < version:
+        # Otro proceso subió la versión: la copia en memoria está atrasada
+        cache_tokens.invalidar_usuario(usuario_id)
+        cacheado, generacion = cache_tokens.obtener(clave)
+    return (cacheado[0] if cacheado is not None else None), generacion
+
+
+def _guardar_usuario(usuario_id, usuario, generacion):
+    if usuario is None:
+        raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+    cache_tokens.guardar(('usuario', usuario_id), usuario, None, generacion)
+    return usuario
+
+
+def _vigente(usuario, version):
+    if usuario.version_token != version:
+        raise exceptions.AuthenticationFailed("Token revocado.")
+    return usuario
+
+
+def usuario_de_token_acceso(valor, max_age=None):
+    """
+    Usuario vigente del token firmado (desde la cache; una query solo si no está en memoria).
+    AuthenticationFailed si es inválido, expiró, fue revocado o el usuario está inactivo.
+    """
+    usuario_id, version = _leer_token_acceso(valor, ACCESO_TTL if max_age is None else max_age)
+    usuario, generacion = _usuario_en_memoria(usuario_id, version)
+    if usuario is None:
+        usuario = _guardar_usuario(
+            usuario_id, Usuario.objects.filter(pk=usuario_id, is_active=True).first(), generacion
+        )
+    return _vigente(usuario, version)
+
+
+async def ausuario_de_token_acceso(valor):
+    """Versión async (ORM async) de `usuario_de_token_acceso`."""
+    usuario_id, version = _leer_token_acceso(valor, ACCESO_TTL)
+    usuario, generacion = _usuario_en_memoria(usuario_id, version)
+    if usuario is None:
+        usuario = _guardar_usuario(
+            usuario_id, await Usuario.objects.filter(pk=usuario_id, is_active=True).afirst(), generacion
+        )
+    return _vigente(usuario, version)
+
+
+def renovar_token_acceso(valor):
+    """
+    Nuevo token para uno firmado con menos de RENOVACION_MAX de antigüedad (aunque haya
+    expirado) y no revocado. Solo lectura: renovar no agrega escrituras.
+    """
+    return emitir_token_acceso(usuario_de_token_acceso(valor, max_age=RENOVACION_MAX))
+
+
+def revocar_tokens_acceso(usuario):
+    """Sube la versión del usuario: invalida todos sus tokens firmados (en la BD y en la cache)."""
+    Usuario.objects.filter(pk=usuario.pk).update(version_token=F('version_token') + 1)
+    usuario.refresh_from_db(fields=['version_token'])
+    invalidar_al_confirmar(cache_tokens.invalidar_usuario, usuario.pk)
+
+
+class TokenFirmadoAuthentication(BaseAuthentication):
+    """`Authorization: Bearer <token firmado>`; devuelve (usuario, None)."""
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        partes = get_authorization_header(request).split()
+        if not partes or partes[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(partes) != 2:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+        try:
+            valor = partes[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        return usuario_de_token_acceso(valor), None
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+# Autenticación de la API: tokens de DRF (clientes antiguos) y firmados
+AUTENTICACION_API = [TokenCacheadoAuthentication, TokenFirmadoAuthentication]
@@ -0,0 +1,168 @@
+"""
+Hash de contraseñas fuera del hilo del request, en un pool acotado.
+
+PBKDF2 (el hasher por defecto) tarda cientos de ms por login o registro. Si corre en
+el hilo de cada request, una ráfaga de logins ocupa todos los workers y frena también
+el triaje y la agenda. Aquí el hash corre en `pool_hash`:
+
+- AUTH_HASH_HILOS hilos (por defecto la mitad de los núcleos): techo de CPU para
+  credenciales; `hashlib` libera el GIL, así que el resto de los requests sigue corriendo.
+- Admisión: con AUTH_HASH_MAX_PENDIENTES hashes en cola o en curso, el siguiente se
+  rechaza de inmediato (`Saturado` -> 503 con Retry-After) en vez de sumarse a la cola.
+- Espera máxima en cola (AUTH_HASH_TIMEOUT_COLA segundos): lo que no empezó a tiempo
+  se cancela (503). Un hash que ya empezó se espera hasta que termine.
+- `estado()`: profundidad de la cola, hilos ocupados, rechazos y percentiles de la
+  espera y de la duración de los hashes recientes.
+
+El login sigue pasando por `django.contrib.auth.authenticate()` (AUTHENTICATION_BACKENDS,
+señal `user_login_failed`): `BackendPoolHash` es el ModelBackend del proyecto, con la
+verificación de la contraseña (y el hash de relleno cuando el RUT no existe) en el pool.
+La consulta del usuario y el guardado siguen en el hilo del request. `Saturado` sale de
+`authenticate()` sin tocar la señal y la vista lo convierte en 503.
+"""
+import os
+import threading
+import time as _time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, make_password
+
+from .models import Usuario
+
+
+class Saturado(Exception):
+    """El pool de hash no admite más trabajo (cupo lleno o espera en cola agotada)."""
+
+
+def _percentiles(muestras):
+    if not muestras:
+        return {"p50": None, "p95": None, "p99": None}
+    orden = sorted(muestras)
+    n = len(orden)
+    return {f"p{p}": round(orden[min(n - 1, n * p // 100)] * 1000, 1) for p in (50, 95, 99)}
+
+
+class PoolHash:
+    """ThreadPoolExecutor con cupo de admisión, espera máxima en cola y métricas."""
+
+    def __init__(self, hilos, max_pendientes, timeout_cola, muestras=1000):
+        self.hilos = hilos
+        self.max_pendientes = max_pendientes
+        self.timeout_cola = timeout_cola
+        self._executor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='hash')
+        self._lock = threading.Lock()
+        self._pendientes = 0            # en cola + en curso
+        self._en_curso = 0
+        self._max_pendientes_visto = 0
+        self._esperas = deque(maxlen=muestras)
+        self._duraciones = deque(maxlen=muestras)
+        self.completados = 0
+        self.rechazados = 0
+        self.expirados = 0
+
+    def reconfigurar(self, hilos=None, max_pendientes=None, timeout_cola=None):
+        """Cambia los límites; con `hilos` espera lo que esté en curso y arma un executor nuevo."""
+        if max_pendientes is not None:
+            self.max_pendientes = max_pendientes
+        if timeout_cola is not None:
+            self.timeout_cola = timeout_cola
+        if hilos is not None and hilos != self.hilos:
+            anterior, self.hilos = self._executor, hilos
+            self._executor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='hash')
+            anterior.shutdown(wait=True)
+
+    def _correr(self, encolado, fn, args):
+        inicio = _time.monotonic()
+        with self._lock:
+            self._en_curso += 1
+            self._esperas.append(inicio - encolado)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._en_curso -= 1
+                self._pendientes -= 1
+                self.completados += 1
+                self._duraciones.append(_time.monotonic() - inicio)
+
+    def _enviar(self, fn, args):
+        with self._lock:
+            if self._pendientes >= self.max_pendientes:
+                self.rechazados += 1
+                raise Saturado("Cupo de hash lleno.")
+            self._pendientes += 1
+            self._max_pendientes_visto = max(self._max_pendientes_visto, self._pendientes)
+        return self._executor.submit(self._correr, _time.monotonic(), fn, args)
+
+    def _expirar(self, futuro):
+        """True si el trabajo seguía en cola y se canceló (no alcanzó a empezar)."""
+        if not futuro.cancel():
+            return False
+        with self._lock:
+            self._pendientes -= 1
+            self.expirados += 1
+        return True
+
+    def ejecutar(self, fn, *args):
+        """fn(*args) en el pool, esperando en el hilo actual. Saturado si no hay cupo o no empezó a tiempo."""
+        futuro = self._enviar(fn, args)
+        try:
+            return futuro.result(timeout=self.timeout_cola)
+        except FuturesTimeout:
+            if self._expirar(futuro):
+                raise Saturado("Espera en cola agotada.")
+            return futuro.result()
+
+    def estado(self):
+        with self._lock:
+            return {
+                "hilos": self.hilos,
+                "en_curso": self._en_curso,
+                "en_cola": self._pendientes - self._en_curso,
+                "max_pendientes": self.max_pendientes,
+                "max_pendientes_visto": self._max_pendientes_visto,
+                "completados": self.completados,
+                "rechazados": self.rechazados,
+                "expirados": self.expirados,
+                "espera_ms": _percentiles(self._esperas),
+                "duracion_ms": _percentiles(self._duraciones),
+            }
+
+
+pool_hash = PoolHash(
+    hilos=getattr(settings, 'AUTH_HASH_HILOS', max(1, (os.cpu_count() or 2) // 2)),
+    max_pendientes=getattr(settings, 'AUTH_HASH_MAX_PENDIENTES', 32),
+    timeout_cola=getattr(settings, 'AUTH_HASH_TIMEOUT_COLA', 2.0),
+)
+
+
+def verificar_password(password, codificada):
+    """(válida, hash nuevo o None): el nuevo solo si el hasher de `codificada` quedó obsoleto."""
+    nuevo = []
+    valida = check_password(password, codificada, setter=lambda crudo: nuevo.append(make_password(crudo)))
+    return valida, (nuevo[0] if nuevo else None)
+
+
+class BackendPoolHash(ModelBackend):
+    """`ModelBackend.authenticate` con el hash en `pool_hash`. Saturado si el pool no tiene cupo."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(Usuario.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            usuario = Usuario._default_manager.get_by_natural_key(username)
+        except Usuario.DoesNotExist:
+            pool_hash.ejecutar(make_password, password)  # mismo tiempo que con un RUT existente
+            return None
+        valida, nuevo = pool_hash.ejecutar(verificar_password, password, usuario.password)
+        if not valida or not self.user_can_authenticate(usuario):
+            return None
+        if nuevo is not None:  # el hasher cambió: se guarda el hash nuevo, como check_password
+            usuario.password = nuevo
+            usuario.save(update_fields=['password'])
+        return usuario
@@ -0,0 +1,156 @@
+import random
+import statistics
+import time as _time
+
+from django.contrib.auth.hashers import make_password
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from sithcore.carga import flujo_wsgi, peticion_wsgi, percentil
+from usuarios.autenticacion import (
+    TokenCacheadoAuthentication,
+    TokenFirmadoAuthentication,
+    cache_tokens,
+    emitir_token_acceso,
+)
+from usuarios.hashing import pool_hash
+from usuarios.models import Usuario
+
+
+class Command(BaseCommand):
+    help = (
+        "Costo de autenticación por request: TokenAuthentication (JOIN Token + Usuario) vs. "
+        "TokenCacheadoAuthentication y tokens firmados (Bearer), aislado y de punta a punta en "
+        "GET /api/usuarios/perfil/. Con --rafaga, latencia del perfil durante una ráfaga de "
+        "logins concurrentes con el hash sin límite vs. en el pool acotado (usuarios/hashing.py). "
+        "Usa una BD de prueba."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=1000, help="Usuarios con token sembrados.")
+        parser.add_argument('--peticiones', type=int, default=5000, help="Peticiones por escenario.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--rafaga', type=int, default=0, help="Logins de la ráfaga (0 = omitir).")
+        parser.add_argument('--concurrencia', type=int, default=32, help="Clientes simultáneos en la ráfaga.")
+
+    def handle(self, *args, **opts):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # Como en producción: sin registro de queries ni páginas de error de depuración
+            with override_settings(DEBUG=False):
+                self._ejecutar(opts)
+        finally:
+            cache_tokens.limpiar()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _sembrar(self, n):
+        clave = make_password('bench')  # un solo hash: el costo de PBKDF2 no es parte de la medición
+        Usuario.objects.bulk_create(
+            Usuario(rut=f'7{i:08d}', rut_canonico=f'7{i:08d}', username=f'7{i:08d}', nombre='Paciente', password=clave)
+            for i in range(n)
+        )
+        usuarios = list(Usuario.objects.order_by('id'))
+        Token.objects.bulk_create(Token(user=u, key=Token.generate_key()) for u in usuarios)
+        firmados = {u.pk: emitir_token_acceso(u)[0] for u in usuarios}
+        return [(key, firmados[uid]) for key, uid in Token.objects.values_list('key', 'user_id')]
+
+    def _medir(self, n, peticion):
+        latencias, queries = [], [0]
+
+        def contar(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(contar):
+            for i in range(n):
+                t0 = _time.perf_counter()
+                peticion(i)
+                latencias.append((_time.perf_counter() - t0) * 1e6)
+        latencias.sort()
+        return statistics.fmean(latencias), percentil(latencias, 50), percentil(latencias, 99), queries[0] / n
+
+    def _ejecutar(self, opts):
+        claves = self._sembrar(opts['usuarios'])
+        rnd = random.Random(opts['seed'])
+        orden = [rnd.choice(claves) for _ in range(opts['peticiones'])]
+        factory = RequestFactory()
+        peticiones = [factory.get('/', headers={'Authorization': f'Token {k}'}) for k, _ in orden]
+        peticiones_firmadas = [factory.get('/', headers={'Authorization': f'Bearer {f}'}) for _, f in orden]
+        self.stdout.write(f"Sembrados {len(claves)} usuarios con token; {len(orden)} peticiones por escenario.\n")
+
+        def autenticar(clase, lista=peticiones):
+            autenticador = clase()
+            return lambda i: autenticador.authenticate(lista[i])
+
+        handler = WSGIHandler()
+
+        def perfil(esquema):
+            columna = 0 if esquema == 'Token' else 1
+
+            def peticion(i):
+                headers = {'Authorization': f'{esquema} {orden[i][columna]}'}
+                estado, _, _ = peticion_wsgi(handler, 'GET', '/api/usuarios/perfil/', headers=headers)
+                assert estado == 200, estado
+            return peticion
+
+        ttl = cache_tokens.ttl
+        escenarios = [
+            ("authenticate()  sin cache", autenticar(TokenAuthentication), None),
+            ("authenticate()  con cache", autenticar(TokenCacheadoAuthentication), ttl),
+            ("authenticate()  firmado", autenticar(TokenFirmadoAuthentication, peticiones_firmadas), ttl),
+            ("GET perfil      sin cache", perfil('Token'), 0),
+            ("GET perfil      con cache", perfil('Token'), ttl),
+            ("GET perfil      firmado", perfil('Bearer'), ttl),
+        ]
+        try:
+            for nombre, peticion, ttl_escenario in escenarios:
+                cache_tokens.limpiar()
+                if ttl_escenario is not None:
+                    cache_tokens.ttl = ttl_escenario
+                    # Cache caliente: una pasada previa sobre todas las claves
+                    for i in range(len(orden)):
+                        peticion(i)
+                media, p50, p99, queries = self._medir(len(orden), peticion)
+                self.stdout.write(
+                    f"{nombre:<27} media {media:>8.1f} µs   p50 {p50:>8.1f} µs   p99 {p99:>8.1f} µs   "
+                    f"queries/req {queries:.2f}"
+                )
+        finally:
+            cache_tokens.ttl = ttl
+
+        if opts['rafaga']:
+            self._rafaga(orden, opts['rafaga'], opts['concurrencia'])
+
+    def _rafaga(self, orden, logins, concurrencia):
+        """Cada cliente pide su perfil y luego hace login: los perfiles compiten con los hashes."""
+        ruts = dict(Token.objects.values_list('key', 'user__rut'))
+        pasos = [
+            ('perfil', lambda n, previa: ('GET', '/api/usuarios/perfil/', None,
+                                          {'Authorization': f'Token {orden[n % len(orden)][0]}'})),
+            ('login', lambda n, previa: ('POST', '/api/usuarios/login/',
+                                         {'rut': ruts[orden[n % len(orden)][0]], 'password': 'bench'}, None)),
+        ]
+        limites = (pool_hash.hilos, pool_hash.max_pendientes, pool_hash.timeout_cola)
+        configuraciones = [
+            ("hash sin límite", (concurrencia, 10 ** 6, 3600.0)),  # como authenticate() en cada worker
+            (f"pool {limites[0]} hilo(s)/{limites[1]} pend.", limites),
+        ]
+        self.stdout.write(f"\nRáfaga: {logins} logins, {concurrencia} clientes (perfil + login cada uno).")
+        try:
+            for nombre, (hilos, max_pendientes, timeout_cola) in configuraciones:
+                pool_hash.reconfigurar(hilos, max_pendientes, timeout_cola)
+                cache_tokens.limpiar()
+                resumen = flujo_wsgi(pasos, logins, concurrencia)
+                perfil, login = resumen['perfil'], resumen['login']
+                self.stdout.write(
+                    f"{nombre:<27} perfil p50 {perfil['p50_ms']:>7.1f} ms  p99 {perfil['p99_ms']:>7.1f} ms   "
+                    f"login p50 {login['p50_ms']:>7.1f} ms  p99 {login['p99_ms']:>7.1f} ms  "
+                    f"503: {login['estados_error'].get('503', 0)}"
+                )
+        finally:
+            pool_hash.reconfigurar(*limites)
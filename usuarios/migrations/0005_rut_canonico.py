@@ -0,0 +1,59 @@
+# Generated by Django 5.2 on 2026-10-18 13:28
+
+from django.db import migrations, models
+
+# Separadores congelados al escribir la migración (= usuarios.utils.canonicalizar_rut)
+SEPARADORES = str.maketrans('', '', ' .-\t\r\n')
+LOTE = 2000
+
+
+def poblar_rut_canonico(apps, schema_editor):
+    """
+    Llena rut_canonico por lotes de id antes de crear el índice único.
+    Si dos usuarios tienen el mismo RUT escrito distinto ("12345678-9" y "123456789"),
+    la migración falla (y se revierte) con la lista de ids en conflicto: hay que unificar
+    o corregir esas cuentas a mano antes de volver a correrla.
+    """
+    Usuario = apps.get_model('usuarios', 'Usuario')
+    vistos, repetidos, ultimo = {}, {}, 0
+    while True:
+        lote = list(Usuario.objects.filter(id__gt=ultimo).order_by('id').only('id', 'rut')[:LOTE])
+        if not lote:
+            break
+        ultimo = lote[-1].id
+        for usuario in lote:
+            canonico = (usuario.rut or '').translate(SEPARADORES).upper() or None
+            if canonico in vistos:
+                repetidos.setdefault(canonico, [vistos[canonico]]).append(usuario.id)
+                canonico = None
+            elif canonico:
+                vistos[canonico] = usuario.id
+            usuario.rut_canonico = canonico
+        Usuario.objects.bulk_update([u for u in lote if u.rut_canonico], ['rut_canonico'])
+
+    if repetidos:
+        detalle = '; '.join(f"{canonico}: ids {', '.join(map(str, ids))}" for canonico, ids in repetidos.items())
+        raise RuntimeError(
+            f"{len(repetidos)} RUT repetidos con distinto formato, unifique esas cuentas antes de migrar: {detalle}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0004_version_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='rut_canonico',
+            field=models.CharField(blank=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.RunPython(poblar_rut_canonico, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='usuario',
+            name='rut_canonico',
+            field=models.CharField(blank=True, editable=False, max_length=12, null=True, unique=True),
+        ),
+    ]
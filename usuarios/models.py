@@ -1,15 +1,17 @@
 # usuarios/models.py
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 
+from .utils import canonicalizar_rut
+
 # Manager personalizado para tu modelo de usuario
 class UsuarioManager(BaseUserManager):
-    def create_user(self, rut, password=None, **extra_fields):
-        if not rut:
-            raise ValueError('El RUT es obligatorio')
-        
+    def create_user(self, rut, password=None, password_codificada=None, **extra_fields):
         # Normaliza el RUT para usarlo como username interno
-        rut_normalizado = rut.strip().replace("-", "").upper()
+        rut_normalizado = canonicalizar_rut(rut)
+        if not rut_normalizado:
+            raise ValueError('El RUT es obligatorio')
 
         # Asegúrate de que el username se establezca al RUT normalizado
         extra_fields.setdefault('username', rut_normalizado)
@@ -18,12 +20,19 @@ class UsuarioManager(BaseUserManager):
         user = self.model(rut=rut_normalizado, **extra_fields)
         
         # Hashea la contraseña y la asigna al usuario
-        if password is not None:
+        if password_codificada is not None:
+            # Hash ya calculado fuera del request (ver usuarios/hashing.py)
+            user.password = password_codificada
+        elif password is not None:
             user.set_password(password)
             
         user.save(using=self._db)
         return user
 
+    # Login (hashing.BackendPoolHash) y createsuperuser: búsqueda exacta por el índice único
+    def get_by_natural_key(self, rut):
+        return self.get(rut_canonico=canonicalizar_rut(rut))
+
     def create_superuser(self, rut, password=None, **extra_fields):
         extra_fields.setdefault('is_staff', True)
         extra_fields.setdefault('is_superuser', True)
@@ -39,12 +48,17 @@ class UsuarioManager(BaseUserManager):
 # Tu modelo de usuario personalizado
 class Usuario(AbstractUser):
     rut = models.CharField(max_length=12, unique=True, null=True, blank=True)
+    # RUT canónico (utils.canonicalizar_rut), lo llena save(): toda búsqueda por RUT va por este índice
+    rut_canonico = models.CharField(max_length=12, unique=True, null=True, blank=True, editable=False)
     nombre = models.CharField(max_length=100, null=True, blank=True)
     telefono = models.CharField(max_length=15, null=True, blank=True)
     
     # ⚠️ Nuevos campos agregados
     enfermedades_sistemicas = models.TextField(null=True, blank=True)
     tipo_de_sangre = models.CharField(max_length=3, null=True, blank=True)
+
+    # Versión de los tokens de acceso firmados: subirla los revoca todos (ver usuarios/autenticacion.py)
+    version_token = models.PositiveIntegerField(default=0)
     
     # Define 'rut' como el campo principal para la autenticación
     USERNAME_FIELD = 'rut'
@@ -57,9 +71,19 @@ class Usuario(AbstractUser):
     def __str__(self):
         return f'{self.nombre or "N/A"} ({self.rut})'
 
+    def clean(self):
+        super().clean()
+        # rut_canonico no está en los formularios: "12345678-9" y "123456789" son el mismo RUT
+        canonico = canonicalizar_rut(self.rut)
+        if canonico and Usuario.objects.filter(rut_canonico=canonico).exclude(pk=self.pk).exists():
+            raise ValidationError({'rut': "Ya existe un usuario con este RUT."})
+
     def save(self, *args, **kwargs):
         if self.rut:
             self.rut = self.rut.strip().replace(" ", "").upper()
+        self.rut_canonico = canonicalizar_rut(self.rut)
+        if kwargs.get('update_fields') is not None and 'rut' in kwargs['update_fields']:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'rut_canonico'}
         if not self.username:
             self.username = self.rut
         super().save(*args, **kwargs)
\ No newline at end of file
@@ -3,6 +3,7 @@ from rest_framework import serializers
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import get_user_model
 from chatbot.models import Sintoma 
+from .utils import canonicalizar_rut
 
 Usuario = get_user_model()
 
@@ -21,8 +22,10 @@ class UsuarioSerializer(serializers.ModelSerializer):
         fields = ('id', 'rut', 'nombre', 'telefono', 'password', 'email') 
 
     def validate_rut(self, value):
-        normalized_rut = value.strip().replace("-", "").upper()
-        if Usuario.objects.filter(rut__iexact=normalized_rut).exists():
+        normalized_rut = canonicalizar_rut(value)
+        if not normalized_rut:
+            raise serializers.ValidationError("El RUT es obligatorio.")
+        if Usuario.objects.filter(rut_canonico=normalized_rut).exists():
             raise serializers.ValidationError("Ya existe un usuario con este RUT.")
         return normalized_rut
 
@@ -42,10 +45,11 @@ class UsuarioSerializer(serializers.ModelSerializer):
         return cleaned
 
     def create(self, validated_data):
-        rut = validated_data.pop('rut').strip().replace("-", "").upper()
+        rut = validated_data.pop('rut')  # ya canónico (validate_rut)
         nombre = validated_data.pop('nombre')
         telefono = validated_data.pop('telefono')
         password = validated_data.pop('password')
+        password_codificada = validated_data.pop('password_codificada', None)  # save(password_codificada=...)
         email = validated_data.pop('email', '')
 
         username = rut 
@@ -53,6 +57,7 @@ class UsuarioSerializer(serializers.ModelSerializer):
         user = get_user_model().objects.create_user(
             username=username, 
             password=password,
+            password_codificada=password_codificada,
             rut=rut, 
             nombre=nombre,
             telefono=telefono,
@@ -73,7 +78,7 @@ class UsuarioReadSerializer(serializers.ModelSerializer):
 
     def get_rut(self, obj):
         if obj.rut:
-            normalized_rut = obj.rut.strip().replace("-", "").upper()
+            normalized_rut = obj.rut_canonico or canonicalizar_rut(obj.rut)
             return f"{normalized_rut[:2]}*****{normalized_rut[-2:]}"
         return None
 
@@ -89,6 +94,11 @@ class UsuarioReadSerializer(serializers.ModelSerializer):
             return obj.telefono[:6] + "****"
         return None
 
+class UsuarioListadoSerializer(UsuarioReadSerializer):
+    """UsuarioReadSerializer con los síntomas precargados en `sintomas_listado` (ver views.listarUsuarios)."""
+    sintomas = SintomaSerializer(source='sintomas_listado', many=True, read_only=True)
+
+
 class UsuarioUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Usuario
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .autenticacion import cache_tokens, invalidar_al_confirmar
+from .models import Usuario
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def usuario_modificado(sender, instance, **kwargs):
+    # Contraseña, is_active o datos del perfil: la copia cacheada ya no sirve
+    invalidar_al_confirmar(cache_tokens.invalidar_usuario, instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def token_eliminado(sender, instance, **kwargs):
+    # Logout (o borrado en cascada del usuario)
+    invalidar_al_confirmar(cache_tokens.invalidar_token, instance.key)
@@ -1,3 +1,273 @@
+import importlib
+import threading
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.signals import user_login_failed
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from sithcore.testing import PresupuestoQueriesMixin
+from chatbot.models import Sintoma
+from . import autenticacion
+from .autenticacion import cache_tokens
+from .hashing import PoolHash, Saturado, pool_hash
+from .models import Usuario
+from .utils import canonicalizar_rut, validar_formato_rut
+
+# Máximo de queries por endpoint (sin contar autenticación)
+PRESUPUESTOS = {
+    'listar_sintomas': 1,
+    'listar_usuarios': 2,  # usuarios + síntomas (prefetch)
+}
+
+
+class PresupuestoQueriesUsuariosTests(PresupuestoQueriesMixin, TestCase):
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(rut='111111111', password='x', nombre='Ana')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.creados = 0
+
+    def test_listar_sintomas_por_usuario(self):
+        def sembrar(n):
+            Sintoma.objects.bulk_create(Sintoma(usuario=self.usuario, descripcion='tos') for _ in range(n))
+
+        self.assertQueriesConstantes(
+            PRESUPUESTOS['listar_sintomas'],
+            lambda: self.client.get(reverse('listar_sintomas', args=[self.usuario.id])),
+            sembrar
+        )
+
+    def test_listar_usuarios(self):
+        def sembrar(n):
+            for _ in range(n):
+                u = Usuario.objects.create_user(rut=f'4{self.creados:08d}', password=None, nombre='Paciente')
+                Sintoma.objects.create(usuario=u, descripcion='tos')
+                self.creados += 1
+
+        for params in ({}, {'limite': 100}, {'limite': 100, 'max_sintomas': 1}):
+            with self.subTest(params=params):
+                self.assertQueriesConstantes(
+                    PRESUPUESTOS['listar_usuarios'],
+                    lambda: self.client.get(reverse('listar_usuarios'), params),
+                    sembrar,
+                    etiqueta=f'listar_usuarios {params}'
+                )
+
+    def test_listar_usuarios_por_cursor_con_tope_de_sintomas(self):
+        otro = Usuario.objects.create_user(rut='222222222', password=None, nombre='Beto Soto')
+        for descripcion in ('tos', 'fiebre', 'dolor'):
+            Sintoma.objects.create(usuario=otro, descripcion=descripcion)
+        url = reverse('listar_usuarios')
+
+        r = self.client.get(url, {'limite': 1})
+        self.assertEqual([u['id'] for u in r.data['resultados']], [self.usuario.id])
+        r = self.client.get(url, {'limite': 1, 'cursor': r.data['siguiente'], 'max_sintomas': 2})
+        beto = r.data['resultados'][0]
+        self.assertEqual((beto['nombre'], beto['rut']), ('B*** S***', '22*****22'))
+        self.assertEqual([s['descripcion'] for s in beto['sintomas']], ['dolor', 'fiebre'])
+        self.assertIsNone(r.data['siguiente'])
+        self.assertEqual(self.client.get(url, {'limite': 1, 'max_sintomas': 0}).status_code, 400)
+
+        # Sin parámetros: primera página con el mismo esquema anonimizado
+        r = self.client.get(url)
+        self.assertEqual([u['rut'] for u in r.data['resultados']], ['11*****11', '22*****22'])
+        self.assertIsNone(r.data['siguiente'])
+
+
+class CacheTokensTests(TestCase):
+
+    def setUp(self):
+        cache_tokens.limpiar()
+        self.addCleanup(cache_tokens.limpiar)
+        self.usuario = Usuario.objects.create_user(rut='111111111', password='clave-1', nombre='Ana')
+        self.token = Token.objects.create(user=self.usuario)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.url = reverse('obtener_perfil_con_cita')
+
+    def test_segunda_peticion_sin_query_de_autenticacion(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        with self.assertNumQueries(1):  # solo la próxima cita
+            r = self.client.get(self.url)
+        self.assertEqual(r.data['nombre'], 'Ana')
+
+    def test_invalidacion(self):
+        self.client.get(self.url)
+        self.usuario.nombre = 'Ana María'
+        self.usuario.save()
+        self.assertEqual(self.client.get(self.url).data['nombre'], 'Ana María')
+
+        r = self.client.post(reverse('cambiar_password'), {'old_password': 'clave-1', 'new_password': 'clave-2'})
+        self.assertEqual(r.status_code, 200)
+        self.assertIsNone(cache_tokens.obtener(self.token.key)[0])
+
+        self.client.get(self.url)
+        usuario = Usuario.objects.get(pk=self.usuario.pk)
+        usuario.is_active = False
+        usuario.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        usuario.is_active = True
+        usuario.save()
+
+        self.assertEqual(self.client.post(reverse('logout_usuario')).status_code, 200)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+        otro = Token.objects.create(user=self.usuario)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {otro.key}')
+        self.client.get(self.url)
+        self.usuario.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+
+class TokensFirmadosTests(TestCase):
+
+    def setUp(self):
+        cache_tokens.limpiar()
+        self.addCleanup(cache_tokens.limpiar)
+        Usuario.objects.create_user(rut='111111111', password='clave-1', nombre='Ana')
+        self.client = APIClient()
+        r = self.client.post(reverse('login_usuario'), {'rut': '111111111', 'password': 'clave-1'})
+        self.token_drf, self.token_acceso = r.data['token'], r.data['token_acceso']
+        self.url = reverse('obtener_perfil_con_cita')
+
+    def get(self, token, esquema='Bearer'):
+        self.client.credentials(HTTP_AUTHORIZATION=f'{esquema} {token}')
+        return self.client.get(self.url)
+
+    def test_verificacion_en_memoria_y_token_drf(self):
+        self.assertEqual(self.get(self.token_acceso).status_code, 200)
+        with self.assertNumQueries(1):  # solo la próxima cita
+            self.assertEqual(self.get(self.token_acceso).status_code, 200)
+        self.assertEqual(self.get(self.token_drf, 'Token').status_code, 200)
+        self.assertEqual(self.get(self.token_acceso[:-2] + 'xx').status_code, 401)
+
+    def test_expiracion_y_renovacion(self):
+        with mock.patch.object(autenticacion, 'ACCESO_TTL', -1):
+            r = self.get(self.token_acceso)
+            self.assertEqual((r.status_code, str(r.data['detail'])), (401, 'Token expirado.'))
+            r = self.client.post(reverse('renovar_token_acceso'), {'token_acceso': self.token_acceso})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.get(r.data['token_acceso']).status_code, 200)
+
+    def test_revocacion(self):
+        self.get(self.token_acceso)
+        r = self.client.post(reverse('cambiar_password'), {'old_password': 'clave-1', 'new_password': 'clave-2'})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.get(self.token_acceso).status_code, 401)
+        nuevo = r.data['token_acceso']
+        self.assertEqual(self.get(nuevo).status_code, 200)
+
+        self.assertEqual(self.client.post(reverse('logout_usuario')).status_code, 200)
+        self.assertEqual(self.get(nuevo).status_code, 401)
+        self.assertEqual(self.get(self.token_drf, 'Token').status_code, 401)
+        r = self.client.post(reverse('renovar_token_acceso'), {'token_acceso': nuevo})
+        self.assertEqual(r.status_code, 401)
+
+
+class PoolHashTests(TestCase):
+
+    def setUp(self):
+        Usuario.objects.create_user(rut='111111111', password='clave-1', nombre='Ana')
+        self.client = APIClient()
+        self.credenciales = {'rut': '11111111-1', 'password': 'clave-1'}
+
+    def test_login_y_registro_usan_el_pool(self):
+        completados = pool_hash.completados
+        r = self.client.post(reverse('login_usuario'), self.credenciales)
+        self.assertEqual(r.status_code, 200)
+        r = self.client.post(reverse('login_usuario'), {**self.credenciales, 'password': 'otra'})
+        self.assertEqual(r.status_code, 401)
+        r = self.client.post(reverse('registrar_usuario'), {
+            'rut': '22222222-2', 'nombre': 'Beto', 'telefono': '912345678', 'password': 'clave-2',
+        })
+        self.assertEqual(r.status_code, 201)
+        self.assertTrue(Usuario.objects.get(rut='222222222').check_password('clave-2'))
+        self.assertEqual(pool_hash.completados, completados + 3)
+
+    def test_login_por_authenticate(self):
+        fallidos = []
+
+        def registrar(sender, credentials, **kwargs):
+            fallidos.append(credentials['username'])
+
+        user_login_failed.connect(registrar)
+        self.addCleanup(user_login_failed.disconnect, registrar)
+        self.client.post(reverse('login_usuario'), {**self.credenciales, 'password': 'otra'})
+        self.client.post(reverse('login_usuario'), {'rut': '22222222-2', 'password': 'x'})
+        self.assertEqual(fallidos, ['111111111', '222222222'])
+        # AUTHENTICATION_BACKENDS se respeta: sin un backend por contraseña nadie entra
+        with self.settings(AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.RemoteUserBackend']):
+            self.assertEqual(self.client.post(reverse('login_usuario'), self.credenciales).status_code, 401)
+
+    def test_sin_cupo_responde_503(self):
+        with mock.patch.object(pool_hash, 'max_pendientes', 0):
+            r = self.client.post(reverse('login_usuario'), self.credenciales)
+        self.assertEqual(r.status_code, 503)
+        self.assertIn('Retry-After', r)
+
+    def test_espera_en_cola_agotada(self):
+        pool = PoolHash(hilos=1, max_pendientes=2, timeout_cola=0.05)
+        liberar = threading.Event()
+        ocupado = threading.Thread(target=pool.ejecutar, args=(liberar.wait,))
+        ocupado.start()
+        while pool.estado()['en_curso'] == 0:  # el único hilo queda tomado
+            liberar.wait(0.001)
+        with self.assertRaises(Saturado):
+            pool.ejecutar(make_password, 'x')  # no alcanza a empezar: se cancela
+        liberar.set()
+        ocupado.join()
+        estado = pool.estado()
+        self.assertEqual((estado['expirados'], estado['completados'], estado['en_cola']), (1, 1, 0))
+
+
+
+class RutCanonicoTests(TestCase):
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(rut='12.345.678-k', password='clave-1', nombre='Ana')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def test_canonicalizar(self):
+        self.assertEqual(canonicalizar_rut(' 12.345.678-k '), '12345678K')
+        self.assertIsNone(canonicalizar_rut(' - '))
+        self.assertTrue(validar_formato_rut('1234567-9'))
+        self.assertFalse(validar_formato_rut('12345-6'))
+        self.assertEqual(self.usuario.rut_canonico, '12345678K')
+
+    def test_busquedas_exactas_por_el_indice(self):
+        with CaptureQueriesContext(connection) as consultas:
+            r = self.client.post(reverse('chatbot_inicio'), {'rut': '12345678-K'})
+        self.assertEqual(r.status_code, 200)
+        sql = consultas[0]['sql']
+        self.assertIn('"rut_canonico" = ', sql)
+        self.assertNotIn('LIKE', sql)
+
+        r = APIClient().post(reverse('login_usuario'), {'rut': '12.345.678-K', 'password': 'clave-1'})
+        self.assertEqual(r.status_code, 200)
+
+        r = APIClient().post(reverse('registrar_usuario'), {
+            'rut': '12345678k', 'nombre': 'Otra', 'telefono': '912345678', 'password': 'x',
+        })
+        self.assertEqual(r.status_code, 400)
+        self.assertIn('rut', r.data)
 
-# Create your tests here.
+    def test_migracion_falla_con_ruts_repetidos(self):
+        poblar = importlib.import_module('usuarios.migrations.0005_rut_canonico').poblar_rut_canonico
+        Usuario.objects.bulk_create([
+            Usuario(rut='9.876.543-2', username='a', nombre='A'),
+            Usuario(rut='98765432', username='b', nombre='B'),
+            Usuario(rut='98.765.432', username='c', nombre='C'),
+            Usuario(rut='11.111.111-1', username='d', nombre='D'),
+        ])
+        ids = list(Usuario.objects.filter(username__in=['a', 'b', 'c']).order_by('id').values_list('id', flat=True))
+        with self.assertRaisesMessage(RuntimeError, f"98765432: ids {ids[0]}, {ids[1]}, {ids[2]}"):
+            poblar(apps, None)
@@ -3,6 +3,8 @@ from .views import (
     registrarUsuario,
     loginUsuario,
     logoutUsuario,
+    renovarTokenAcceso,
+    estadoPoolHash,
     cambiarPassword,
     chatbot_inicio,
     registrarSintoma,
@@ -20,13 +22,14 @@ from .views import (
 
 from django.views.generic import TemplateView
 
-
 urlpatterns = [
     # Auth
     path('registrar/', registrarUsuario, name='registrar_usuario'),
     path('login/', loginUsuario, name='login_usuario'),
     path('logout/', logoutUsuario, name='logout_usuario'),
+    path('token/renovar/', renovarTokenAcceso, name='renovar_token_acceso'),
     path('cambiar-password/', cambiarPassword, name='cambiar_password'),
+    path('hash/estado/', estadoPoolHash, name='estado_pool_hash'),
 
     # Perfil (Vistas API)
     path('perfil/', obtener_perfil_con_cita_view, name='obtener_perfil_con_cita'),
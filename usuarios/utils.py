@@ -1,5 +1,21 @@
 import re
 
+# Separadores que los usuarios escriben en un RUT: "12.345.678-k", " 12345678-9 "
+_SEPARADORES_RUT = str.maketrans('', '', ' .-\t\r\n')
+_RUT_CANONICO = re.compile(r'\d{7,8}[\dK]')
+
+
+def canonicalizar_rut(rut):
+    """
+    Forma canónica del RUT, la de `Usuario.rut_canonico`: sin puntos, guion ni espacios
+    y con K mayúscula ("12.345.678-k" -> "12345678K"). None si viene vacío.
+    """
+    if not rut:
+        return None
+    return str(rut).translate(_SEPARADORES_RUT).upper() or None
+
+
 def validar_formato_rut(rut):
-    # Acepta 7 u 8 dígitos, guión, y dígito verificador (numérico o K/k)
-    return bool(re.fullmatch(r'\d{7,8}-[\dkK]', rut))
\ No newline at end of file
+    # Acepta 7 u 8 dígitos y dígito verificador (numérico o K/k), con o sin puntos y guion
+    canonico = canonicalizar_rut(rut)
+    return bool(canonico and _RUT_CANONICO.fullmatch(canonico))
@@ -3,19 +3,30 @@ from rest_framework.decorators import api_view, authentication_classes, permissi
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.authtoken.models import Token
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from .autenticacion import (
+    AUTENTICACION_API,
+    emitir_token_acceso,
+    renovar_token_acceso,
+    revocar_tokens_acceso,
+)
+from .hashing import Saturado, pool_hash, verificar_password
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from django.contrib.auth import authenticate
-from datetime import datetime
-from .utils import validar_formato_rut
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+from .utils import canonicalizar_rut, validar_formato_rut
+from django.db.models import Prefetch
 from .models import Usuario
 from chatbot.models import Sintoma
+from sithcore.paginacion import paginar_keyset, parsear_limite
 from agendamiento.models import Cita
 from .serializers import (
     UsuarioSerializer,
     SintomaSerializer,
     UsuarioUpdateSerializer,
     UsuarioReadSerializer,
+    UsuarioListadoSerializer,
     UsuarioProfileSerializer,
 )
 from django.shortcuts import render
@@ -31,16 +42,14 @@ def registrarUsuario(request):
             return Response({"error": "La contraseña es obligatoria."}, status=status.HTTP_400_BAD_REQUEST)
         serializer = UsuarioSerializer(data=data)
         serializer.is_valid(raise_exception=True)
-        user = serializer.save()
+        # El hash corre en el pool acotado (ver hashing.py), no en el hilo del request
+        user = serializer.save(password_codificada=pool_hash.ejecutar(make_password, data["password"]))
         token = Token.objects.get(user=user)
-        return Response({
-            "id": user.id,
-            "nombre": user.nombre,
-            "rut": user.rut,
-            "telefono": user.telefono,
-            "token": token.key,
-            "username": user.username
-        }, status=status.HTTP_201_CREATED)
+        return Response(_datos_registro(user, token), status=status.HTTP_201_CREATED)
+    except ValidationError:
+        raise  # 400 con los errores del serializer (antes caía en el 500 genérico)
+    except Saturado:
+        return _saturado()
     except IntegrityError:
         return Response({"error": "El RUT ya está registrado."}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
@@ -51,32 +60,104 @@ def registrarUsuario(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def loginUsuario(request):
-    rut = request.data.get('rut')
-    password = request.data.get('password')
-    if not rut or not password:
-        return Response({"error": "Debes enviar rut y contraseña."}, status=status.HTTP_400_BAD_REQUEST)
-    rut_normalizado = rut.strip().replace("-", "").upper()
-    user = authenticate(request, username=rut_normalizado, password=password)
+    rut_normalizado, error = _credenciales(request.data)
+    if error:
+        return Response(error, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        # Backends de AUTHENTICATION_BACKENDS y señal user_login_failed; el hash va en el pool
+        user = authenticate(request, username=rut_normalizado, password=request.data['password'])
+    except Saturado:
+        return _saturado()
     if user is None:
-        return Response({"error": "Credenciales inválidas."}, status=status.HTTP_401_UNAUTHORIZED)
+        return Response(ERROR_CREDENCIALES, status=status.HTTP_401_UNAUTHORIZED)
     token, _ = Token.objects.get_or_create(user=user)
-    return Response({
+    return Response(_datos_login(user, token), status=status.HTTP_200_OK)
+
+
+ERROR_CREDENCIALES = {"error": "Credenciales inválidas."}
+ERROR_SATURADO = {"error": "Hay demasiados inicios de sesión en curso. Intenta de nuevo en unos segundos."}
+
+
+def _credenciales(data):
+    """(RUT normalizado, None) o (None, cuerpo del 400)."""
+    rut = data.get('rut')
+    if not rut or not data.get('password'):
+        return None, {"error": "Debes enviar rut y contraseña."}
+    return canonicalizar_rut(rut), None
+
+
+def _saturado():
+    """503 cuando el pool de hash no tiene cupo: el cliente reintenta en vez de hacer cola."""
+    respuesta = Response(ERROR_SATURADO, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    respuesta['Retry-After'] = str(max(1, round(pool_hash.timeout_cola)))
+    return respuesta
+
+
+def _datos_registro(user, token):
+    return {
+        "id": user.id,
+        "nombre": user.nombre,
+        "rut": user.rut,
+        "telefono": user.telefono,
+        "token": token.key,
+        "username": user.username,
+        **_acceso(user),
+    }
+
+
+def _datos_login(user, token):
+    return {
         "token": token.key,
         "user_id": user.id,
-        "username": user.username
-    }, status=status.HTTP_200_OK)
+        "username": user.username,
+        **_acceso(user),
+    }
+
+
+def _acceso(user):
+    """Token de acceso firmado (opcional para los clientes: `Authorization: Bearer ...`)."""
+    token_acceso, expira_en = emitir_token_acceso(user)
+    return {"token_acceso": token_acceso, "expira_en": expira_en}
+
+
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def renovarTokenAcceso(request):
+    """
+    Cambia un token firmado (vigente o expirado hace poco) por uno nuevo, sin escribir en la BD.
+    Body: {"token_acceso": "..."}
+    """
+    valor = request.data.get('token_acceso')
+    if not valor:
+        return Response({"error": "Debes enviar 'token_acceso'."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        token_acceso, expira_en = renovar_token_acceso(valor)
+    except AuthenticationFailed as e:
+        return Response({"error": str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+    return Response({"token_acceso": token_acceso, "expira_en": expira_en}, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@authentication_classes(AUTENTICACION_API)
+@permission_classes([IsAdminUser])
+def estadoPoolHash(request):
+    """Métricas del pool de hash de contraseñas de este proceso (cola, rechazos, latencias en ms)."""
+    return Response(pool_hash.estado(), status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes(AUTENTICACION_API)
 @permission_classes([IsAuthenticated])
 def logoutUsuario(request):
-    request.user.auth_token.delete()
+    # Revoca los tokens firmados (versión) y elimina el Token de DRF si lo hay
+    revocar_tokens_acceso(request.user)
+    Token.objects.filter(user=request.user).delete()
     return Response({"mensaje": "Logout exitoso. Token eliminado."}, status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes(AUTENTICACION_API)
 @permission_classes([IsAuthenticated])
 def cambiarPassword(request):
     user = request.user
@@ -84,11 +165,17 @@ def cambiarPassword(request):
     new_password = request.data.get('new_password')
     if not old_password or not new_password:
         return Response({"error": "Debes enviar 'old_password' y 'new_password'."}, status=status.HTTP_400_BAD_REQUEST)
-    if not user.check_password(old_password):
-        return Response({"error": "La contraseña actual es incorrecta."}, status=status.HTTP_400_BAD_REQUEST)
-    user.set_password(new_password)
-    user.save()
-    return Response({"mensaje": "Contraseña cambiada exitosamente."}, status=status.HTTP_200_OK)
+    try:
+        valida, _ = pool_hash.ejecutar(verificar_password, old_password, user.password)
+        if not valida:
+            return Response({"error": "La contraseña actual es incorrecta."}, status=status.HTTP_400_BAD_REQUEST)
+        user.password = pool_hash.ejecutar(make_password, new_password)
+    except Saturado:
+        return _saturado()
+    user.save(update_fields=['password'])  # request.user puede ser una copia en cache: solo la contraseña
+    # Los tokens firmados emitidos antes del cambio dejan de valer; este reemplaza al del request
+    revocar_tokens_acceso(user)
+    return Response({"mensaje": "Contraseña cambiada exitosamente.", **_acceso(user)}, status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
@@ -98,10 +185,9 @@ def chatbot_inicio(request):
     telefono = request.data.get('telefono')
     if not rut:
         return Response({"error": "El campo 'rut' es obligatorio."}, status=status.HTTP_400_BAD_REQUEST)
-    rut_normalizado = rut.strip().replace(" ", "").upper()
-    print(f"Intentando con RUT normalizado: {rut_normalizado}")
+    rut_normalizado = canonicalizar_rut(rut)
     try:
-        usuario_existente = Usuario.objects.get(rut__iexact=rut_normalizado)
+        usuario_existente = Usuario.objects.get(rut_canonico=rut_normalizado)
         serializer = UsuarioReadSerializer(usuario_existente)
         return Response({"mensaje": "Usuario encontrado", "usuario": serializer.data}, status=status.HTTP_200_OK)
     except Usuario.DoesNotExist:
@@ -145,11 +231,10 @@ def registrarSintoma(request):
     descripcion = request.data.get('descripcion')
     if not rut or not descripcion:
         return Response({"error": "Debes enviar 'usuario' (RUT) y 'descripcion'."}, status=status.HTTP_400_BAD_REQUEST)
-    rut_normalizado = rut.strip().replace("-", "").upper()
-    if not validar_formato_rut(rut_normalizado):
+    if not validar_formato_rut(rut):
         return Response({"error": "Formato de RUT inválido. Usa el formato 12345678-9 o 12345678-K."}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        usuario = Usuario.objects.get(rut__iexact=rut_normalizado)
+        usuario = Usuario.objects.get(rut_canonico=canonicalizar_rut(rut))
     except Usuario.DoesNotExist:
         return Response({"error": "El usuario especificado no existe."}, status=status.HTTP_404_NOT_FOUND)
     sintoma = Sintoma.objects.create(usuario=usuario, descripcion=descripcion)
@@ -164,11 +249,58 @@ def listar_sintomas_por_usuario(request, usuario_id):
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+ORDEN_USUARIOS = ('id',)
+# Columnas que usa UsuarioReadSerializer: no se leen contraseña, perfil clínico, etc.
+CAMPOS_LISTADO_USUARIOS = ('id', 'username', 'rut', 'rut_canonico', 'nombre', 'telefono', 'email')
+ORDEN_SINTOMAS = ('-fecha_registro', '-id')
+
+
+def _parsear_max_sintomas(valor):
+    if valor in (None, ''):
+        return None
+    try:
+        maximo = int(valor)
+    except (TypeError, ValueError):
+        maximo = 0
+    if maximo < 1:
+        raise ValueError("max_sintomas debe ser un entero positivo.")
+    return maximo
+
+
+def _usuarios_con_sintomas(max_sintomas=None):
+    """
+    Usuarios con sus síntomas (recientes primero) en 2 queries por página, sin importar
+    cuántos haya. Con `max_sintomas` el prefetch corta con ROW_NUMBER() por usuario en la BD.
+    """
+    sintomas = Sintoma.objects.order_by(*ORDEN_SINTOMAS)
+    if max_sintomas is not None:
+        sintomas = sintomas[:max_sintomas]
+    # to_attr: Django no admite un prefetch con slice sobre el atributo del manager
+    return Usuario.objects.only(*CAMPOS_LISTADO_USUARIOS).prefetch_related(
+        Prefetch('sintomas', queryset=sintomas, to_attr='sintomas_listado')
+    )
+
+
 @api_view(['GET'])
 def listarUsuarios(request):
-    usuarios = Usuario.objects.all().order_by('id')
-    serializer = UsuarioSerializer(usuarios, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    """
+    Lista usuarios por páginas (cursor sobre id), con datos anonimizados y síntomas
+    anidados (UsuarioListadoSerializer).
+      ?limite=N    tamaño de página (por defecto LIMITE_POR_DEFECTO, tope LIMITE_MAXIMO)
+      ?cursor=...  el "siguiente" de la página anterior
+      ?max_sintomas=N  deja solo los N síntomas más recientes de cada usuario
+    Sin parámetros devuelve la primera página (ya no la tabla completa).
+    """
+    try:
+        limite = parsear_limite(request.GET.get('limite'))
+        qs = _usuarios_con_sintomas(_parsear_max_sintomas(request.GET.get('max_sintomas')))
+        filas, siguiente = paginar_keyset(qs, ORDEN_USUARIOS, request.GET.get('cursor'), limite)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        "resultados": UsuarioListadoSerializer(filas, many=True).data,
+        "siguiente": siguiente
+    }, status=status.HTTP_200_OK)
 
 
 @api_view(['PATCH'])
@@ -220,7 +352,7 @@ def editar_sintoma(request, sintoma_id):
 
 
 @api_view(['GET'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes(AUTENTICACION_API)
 @permission_classes([IsAuthenticated])
 def obtener_perfil_con_cita_view(request):
     """
@@ -232,7 +364,7 @@ def obtener_perfil_con_cita_view(request):
     try:
         proxima_cita = Cita.objects.filter(
             usuario=usuario,
-            fecha_hora__gte=datetime.now()
+            fecha_hora__gte=timezone.now()
         ).order_by('fecha_hora').first()
         cita_data = None
         if proxima_cita:
@@ -250,7 +382,7 @@ def obtener_perfil_con_cita_view(request):
         )
 
 @api_view(['PUT'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes(AUTENTICACION_API)
 @permission_classes([IsAuthenticated])
 @csrf_exempt
 def editar_perfil_view(request, usuario_id):